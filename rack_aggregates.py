@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Rack Aggregates - Fused single-pass report aggregation over a RackCorpus
+
+Every aggregate is computed from one CorpusPass: the intermediate arrays that
+the individual analyses used to re-derive on their own (top-level devices,
+adjacent device pairs, devices per rack, named macros) are built once and
+shared. Each aggregate produces a state, usually a Counter, and a finalize
+function turns that state into the view RackAnalyzer returns.
+
+Custom aggregates can be registered alongside the built-in ones:
+
+    engine.register('on_ratio', lambda p: Counter(on=int(p.top_is_on.sum()),
+                                                  total=len(p.top_is_on)))
+
+States made of Counters, numbers and dicts of those are mergeable, which is
+what lets RackAnalyzer.add_rack/remove_rack update a result incrementally by
+running the engine on a single-rack corpus and adding or subtracting it.
+"""
+
+import copy
+from collections import Counter
+
+import numpy as np
+
+
+def _counter(codes, labels):
+    """Counter over integer codes, keys inserted in first-occurrence order"""
+    counter = Counter()
+    if len(codes) == 0:
+        return counter
+    unique, first_seen, counts = np.unique(codes, return_index=True, return_counts=True)
+    for i in np.argsort(first_seen, kind='stable'):
+        counter[labels(int(unique[i]))] = int(counts[i])
+    return counter
+
+
+class CorpusPass:
+    """Shared intermediate arrays for one aggregation pass over a corpus"""
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        top_level = corpus.top_level_devices()
+        self.top_types = corpus.device_type[top_level]
+        self.top_is_on = corpus.device_is_on[top_level]
+        self.top_chain = corpus.device_chain[top_level]
+        self.rack_devices = np.bincount(corpus.chain_rack[self.top_chain],
+                                        minlength=corpus.num_racks)
+
+        # Top-level chains are contiguous, so neighbours in the filtered
+        # arrays that share a chain are adjacent devices in that chain.
+        same_chain = self.top_chain[:-1] == self.top_chain[1:]
+        self.pair_first = self.top_types[:-1][same_chain]
+        self.pair_second = self.top_types[1:][same_chain]
+
+        self.named_macros = corpus.macro_name[corpus.macro_name >= 0]
+
+
+def device_popularity(p):
+    return _counter(p.top_types, lambda code: p.corpus.device_types[code])
+
+
+def device_combinations(p):
+    num_types = len(p.corpus.device_types)
+    types = p.corpus.device_types
+    codes = p.pair_first.astype(np.int64) * num_types + p.pair_second
+    return _counter(codes, lambda code: f"{types[code // num_types]} → {types[code % num_types]}")
+
+
+def complexity_by_category(p):
+    """Per category: Counter of rack device totals -> number of racks"""
+    width = int(p.rack_devices.max()) + 1 if len(p.rack_devices) else 1
+    codes = p.corpus.rack_category.astype(np.int64) * width + p.rack_devices
+    histogram = {}
+    for (category, device_count), racks in _counter(codes, lambda code: divmod(code, width)).items():
+        histogram.setdefault(p.corpus.categories[category], Counter())[device_count] = racks
+    return histogram
+
+
+def macro_patterns(p):
+    total = len(p.corpus.macro_name)
+    return {
+        'names': _counter(p.named_macros, lambda code: p.corpus.macro_names[code]),
+        'empty': total - len(p.named_macros),
+        'total': total
+    }
+
+
+def _finalize_complexity(histogram):
+    category_averages = {}
+    for category, device_counts in histogram.items():
+        rack_count = sum(device_counts.values())
+        if rack_count:  # Avoid division by zero
+            present = [count for count, racks in device_counts.items() if racks > 0]
+            category_averages[category] = {
+                'avg_devices': sum(count * racks for count, racks in device_counts.items()) / rack_count,
+                'max_devices': max(present),
+                'min_devices': min(present),
+                'rack_count': rack_count
+            }
+    return category_averages
+
+
+def _finalize_macros(state):
+    total_macros = state['total']
+    return {
+        'most_common_names': state['names'].most_common(20),
+        'empty_macro_percentage': (state['empty'] / total_macros * 100) if total_macros > 0 else 0,
+        'total_macros': total_macros
+    }
+
+
+BUILTIN_AGGREGATES = {
+    'device_popularity': (device_popularity, lambda state: state.most_common()),
+    'device_combinations': (device_combinations, lambda state: state.most_common(20)),
+    'complexity_by_category': (complexity_by_category, _finalize_complexity),
+    'macro_patterns': (macro_patterns, _finalize_macros),
+}
+
+
+def merge_state(state, delta, sign=1):
+    """Add (sign=1) or subtract (sign=-1) delta into state in place; returns the merged state"""
+    if isinstance(state, Counter):
+        for key, count in delta.items():
+            state[key] += sign * count
+            if state[key] <= 0:
+                del state[key]
+        return state
+    if isinstance(state, dict):
+        for key, value in delta.items():
+            if key in state:
+                state[key] = merge_state(state[key], value, sign)
+            else:
+                state[key] = merge_state(_zero_like(value), value, sign)
+        return state
+    if isinstance(state, (int, float)) and not isinstance(state, bool):
+        return state + sign * delta
+    raise TypeError(f"aggregate state of type {type(state).__name__} is not mergeable")
+
+
+def _zero_like(value):
+    if isinstance(value, Counter):
+        return Counter()
+    if isinstance(value, dict):
+        return {}
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return 0
+    return copy.deepcopy(value)
+
+
+class AggregateResult:
+    """Aggregate states from one pass; indexing returns the finalized view"""
+
+    def __init__(self, engine, states):
+        self.engine = engine
+        self.states = states
+
+    def __getitem__(self, name):
+        return self.engine.finalize(name, self.states[name])
+
+    def __contains__(self, name):
+        return name in self.states
+
+    def merge(self, other, sign=1):
+        """Fold another result (e.g. of a single rack) into this one; TypeError if not mergeable"""
+        for name, delta in other.states.items():
+            self.states[name] = merge_state(self.states[name], delta, sign)
+
+
+class AggregationEngine:
+    def __init__(self):
+        self.aggregates = dict(BUILTIN_AGGREGATES)
+
+    def register(self, name, compute, finalize=None):
+        """Register an aggregate: compute(CorpusPass) -> state, finalize(state) -> view"""
+        self.aggregates[name] = (compute, finalize)
+
+    def unregister(self, name):
+        self.aggregates.pop(name, None)
+
+    def finalize(self, name, state):
+        finalize = self.aggregates[name][1]
+        return finalize(state) if finalize is not None else state
+
+    def run(self, corpus):
+        """Compute every registered aggregate in a single pass over the corpus"""
+        p = CorpusPass(corpus)
+        return AggregateResult(self, {name: compute(p) for name, (compute, _) in self.aggregates.items()})
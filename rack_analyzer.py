@@ -5,152 +5,326 @@ Rack Data Analyzer - Extract insights from Ableton rack JSON data
 
 import json
 import os
-from collections import Counter, defaultdict
+from collections import defaultdict
+from collections.abc import Sequence
 from pathlib import Path
 
+import numpy as np
+
+from rack_aggregates import BUILTIN_AGGREGATES, AggregationEngine
+from rack_chain_search import ChainSearchIndex
+from rack_index import DeviceIndex
+from rack_corpus import RackCorpus
+from rack_itemsets import mine_device_sets
+from rack_loader import read_json
+from rack_ngrams import mine_device_ngrams
+from rack_snapshot import load_corpus
+
+class RackList(Sequence):
+    """The loaded racks plus added ones, with O(1) append and removal
+
+    Loaded racks are never copied (a snapshot's racks stay lazily decoded).
+    Removal moves the last rack into the freed position, so the order of the
+    remaining racks is not preserved.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.order = None  # per position: base index (>= 0) or ~index into added; None until changed
+        self.added = []
+
+    def __len__(self):
+        return len(self.base) if self.order is None else len(self.order)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if self.order is None:
+            return self.base[index]
+        ref = self.order[index]
+        return self.base[ref] if ref >= 0 else self.added[~ref]
+
+    def _ensure_order(self):
+        if self.order is None:
+            self.order = list(range(len(self.base)))
+
+    def append(self, rack):
+        self._ensure_order()
+        self.added.append(rack)
+        self.order.append(~(len(self.added) - 1))
+
+    def swap_remove(self, position):
+        """Remove the rack at position, moving the last rack into its place; returns the removed rack"""
+        self._ensure_order()
+        rack = self[position]
+        ref = self.order[position]
+        last = self.order.pop()
+        if position < len(self.order):
+            self.order[position] = last
+        if ref < 0:
+            self.added[~ref] = None  # leave the slot so other positions' refs stay valid
+        return rack
+
+
 class RackAnalyzer:
-    def __init__(self, json_folder_path):
+    def __init__(self, json_folder_path, use_snapshot=True, snapshot_path=None):
         self.json_folder = Path(json_folder_path)
-        self.racks = []
+        self.use_snapshot = use_snapshot
+        self.snapshot_path = snapshot_path
+        self.racks = RackList([])
+        self.use_cases = []
+        self.version = 0  # bumped whenever the set of racks changes
+        self.aggregator = AggregationEngine()
+        self._positions = None  # use case -> positions in self.racks, built on first add/remove
+        self._base_corpus = None
+        self._corpus = None
+        self._device_index = None
+        self._chain_search = None
+        self._aggregates = None
         self.load_rack_data()
     
-    def load_rack_data(self):
-        """Load all JSON rack files"""
-        json_files = list(self.json_folder.glob("*_analysis.json"))
-        print(f"Found {len(json_files)} rack files")
+    def load_rack_data(self, max_workers=None, progress=None):
+        """Load all JSON rack files (through the corpus snapshot when it is up to date)"""
+        snapshot = load_corpus(self.json_folder, snapshot_path=self.snapshot_path,
+                               use_snapshot=self.use_snapshot,
+                               max_workers=max_workers, progress=progress)
+        source = " (from snapshot)" if snapshot.from_snapshot else ""
+        print(f"Found {len(snapshot.racks) + len(snapshot.errors)} rack files{source}")
         
-        for file_path in json_files:
-            try:
-                with open(file_path, 'r') as f:
-                    rack_data = json.load(f)
-                    self.racks.append(rack_data)
-            except Exception as e:
-                print(f"Error loading {file_path}: {e}")
+        for file_name, e in snapshot.errors:
+            print(f"Error loading {self.json_folder / file_name}: {e}")
+        self.racks = RackList(snapshot.racks)
+        self.use_cases = list(snapshot.corpus.use_cases)
+        self._positions = None
+        self._base_corpus = snapshot.corpus
+        self._corpus = snapshot.corpus
+        self._device_index = DeviceIndex(self._corpus)
+        self._chain_search = None
+        self._aggregates = None
+        self.version += 1
         
         print(f"Successfully loaded {len(self.racks)} racks")
     
-    def analyze_device_popularity(self):
-        """Find most popular devices across all racks"""
-        device_counter = Counter()
+    @property
+    def corpus(self):
+        """Columnar view of self.racks, brought up to date on demand after add_rack/remove_rack
+
+        The loaded corpus is reused: only added racks are converted, then
+        the racks are put in their current order with array operations
+        (RackCorpus.concat/take), without re-reading the loaded racks.
+        """
+        if self._corpus is None:
+            refs = np.array(self.racks.order, dtype=np.int64)
+            added = ~refs[refs < 0]
+            rack_ids = refs.copy()
+            rack_ids[refs < 0] = self._base_corpus.num_racks + np.arange(len(added))
+            added_corpus = RackCorpus.from_racks([self.racks.added[i] for i in added.tolist()])
+            self._corpus = self._base_corpus.concat(added_corpus).take(rack_ids)
+        return self._corpus
+    
+    @property
+    def device_index(self):
+        if self._device_index is None:
+            self._device_index = DeviceIndex(self.corpus)
+        return self._device_index
+    
+    @property
+    def chain_search(self):
+        if self._chain_search is None:
+            self._chain_search = ChainSearchIndex(self.corpus, self.device_index)
+        return self._chain_search
+    
+    @property
+    def positions(self):
+        """use case -> positions of its racks in self.racks"""
+        if self._positions is None:
+            self._positions = defaultdict(list)
+            for position, use_case in enumerate(self.use_cases):
+                self._positions[use_case].append(position)
+        return self._positions
+    
+    def has_rack(self, use_case):
+        return bool(self.positions.get(use_case))
+    
+    def add_rack(self, rack_data):
+        """Add one rack (a rack dict or the path of its analysis JSON) and update reports in O(rack size)"""
+        if isinstance(rack_data, (str, Path)):
+            rack_data = read_json(rack_data)
         
-        for rack in self.racks:
-            for chain in rack.get('chains', []):
-                for device in chain.get('devices', []):
-                    device_counter[device['type']] += 1
+        use_case = rack_data.get('use_case', 'Unknown')
+        self.positions[use_case].append(len(self.racks))
+        self.racks.append(rack_data)
+        self.use_cases.append(use_case)
+        self._apply_rack_delta(rack_data, sign=1)
+        return len(self.racks) - 1
+    
+    def remove_rack(self, use_case):
+        """Remove a rack with the given use case and update reports in O(rack size)
+
+        The last rack takes the removed rack's position.
+        """
+        positions = self.positions.get(use_case)
+        if not positions:
+            return None
+        position = min(positions)
+        positions.remove(position)
+        if not positions:
+            del self.positions[use_case]
         
-        return device_counter.most_common()
+        last = len(self.racks) - 1
+        if position != last:
+            moved = self.use_cases[last]
+            self.positions[moved][self.positions[moved].index(last)] = position
+            self.use_cases[position] = moved
+        self.use_cases.pop()
+        rack_data = self.racks.swap_remove(position)
+        self._apply_rack_delta(rack_data, sign=-1)
+        return rack_data
+    
+    def _apply_rack_delta(self, rack_data, sign):
+        if self._aggregates is not None:
+            try:
+                self._aggregates.merge(self.aggregator.run(RackCorpus.from_racks([rack_data])), sign)
+            except TypeError:
+                # A custom aggregate can't be updated incrementally; recompute on next use
+                self._aggregates = None
+        # Report aggregates are updated in place above; the corpus is brought up to
+        # date (without re-reading loaded racks) and the device and chain-search
+        # indexes are rebuilt from it, the next time they are needed
+        self._corpus = None
+        self._device_index = None
+        self._chain_search = None
+        self.version += 1
+    
+    def aggregate(self):
+        """Compute all report aggregates in a single pass (cached until the data changes)"""
+        if self._aggregates is None:
+            self._aggregates = self.aggregator.run(self.corpus)
+        return self._aggregates
+    
+    def register_aggregate(self, name, compute, finalize=None):
+        """Add a custom aggregate to the single-pass report computation"""
+        self.aggregator.register(name, compute, finalize)
+        self._aggregates = None
+    
+    def analyze_device_popularity(self):
+        """Find most popular devices across all racks"""
+        return self.aggregate()['device_popularity']
     
     def analyze_device_combinations(self):
         """Find common device combinations"""
-        combinations = Counter()
-        
-        for rack in self.racks:
-            for chain in rack.get('chains', []):
-                devices = [d['type'] for d in chain.get('devices', [])]
-                # Look at 2-device combinations
-                for i in range(len(devices) - 1):
-                    combo = f"{devices[i]} → {devices[i+1]}"
-                    combinations[combo] += 1
-        
-        return combinations.most_common(20)
+        return self.aggregate()['device_combinations']
     
     def analyze_complexity_by_category(self):
         """Analyze rack complexity by use case category"""
-        category_stats = defaultdict(list)
-        
-        for rack in self.racks:
-            use_case = rack.get('use_case', 'Unknown')
-            category = use_case.split(' - ')[0] if ' - ' in use_case else use_case.split()[0]
-            
-            total_devices = sum(len(chain.get('devices', [])) for chain in rack.get('chains', []))
-            category_stats[category].append(total_devices)
-        
-        # Calculate averages
-        category_averages = {}
-        for category, device_counts in category_stats.items():
-            if device_counts:  # Avoid division by zero
-                category_averages[category] = {
-                    'avg_devices': sum(device_counts) / len(device_counts),
-                    'max_devices': max(device_counts),
-                    'min_devices': min(device_counts),
-                    'rack_count': len(device_counts)
-                }
-        
-        return category_averages
+        return self.aggregate()['complexity_by_category']
     
     def analyze_macro_patterns(self):
         """Analyze macro control naming patterns"""
-        macro_names = Counter()
-        empty_macros = 0
-        total_macros = 0
-        
-        for rack in self.racks:
-            for macro in rack.get('macro_controls', []):
-                total_macros += 1
-                name = macro.get('name', '').strip()
-                if name:
-                    macro_names[name] += 1
-                else:
-                    empty_macros += 1
-        
+        return self.aggregate()['macro_patterns']
+    
+    def analyze_device_ngrams(self, min_n=3, max_n=6, min_support=2, limit=20, include_nested=True):
+        """Find common device sequences of length min_n..max_n, nested chains included"""
+        ngrams = mine_device_ngrams(self.corpus, min_n=min_n, max_n=max_n,
+                                    min_support=min_support, include_nested=include_nested)
+        return {n: found[:limit] for n, found in ngrams.items()}
+    
+    def analyze_device_sets(self, min_support=0.05, min_confidence=0.6, max_len=4, limit=20):
+        """Find device sets that co-occur in racks (any order) and rules between them"""
+        mined = mine_device_sets(self.corpus, min_support=min_support,
+                                 min_confidence=min_confidence, max_len=max_len)
         return {
-            'most_common_names': macro_names.most_common(20),
-            'empty_macro_percentage': (empty_macros / total_macros * 100) if total_macros > 0 else 0,
-            'total_macros': total_macros
+            'itemsets': [s for s in mined['itemsets'] if len(s['devices']) > 1][:limit],
+            'rules': mined['rules'][:limit]
         }
     
     def find_racks_with_device(self, device_type):
-        """Find all racks containing a specific device"""
+        """Find all racks containing a specific device (one entry per chain, nested chains included)"""
         matching_racks = []
         
-        for rack in self.racks:
-            for chain in rack.get('chains', []):
-                for device in chain.get('devices', []):
-                    if device['type'] == device_type:
-                        matching_racks.append({
-                            'use_case': rack.get('use_case'),
-                            'chain_name': chain.get('name'),
-                            'total_devices': len(chain.get('devices', []))
-                        })
-                        break
+        devices = self.device_index.devices(device_type)
+        chains, first_hit = np.unique(self.corpus.device_chain[devices], return_index=True)
+        for chain, device in zip(chains, devices[first_hit]):
+            matching_racks.append({
+                'use_case': self.corpus.use_cases[self.corpus.chain_rack[chain]],
+                'chain_name': self.corpus.chain_names[chain],
+                'total_devices': int(self.corpus.chain_offsets[chain + 1] - self.corpus.chain_offsets[chain]),
+                'chain_path': self.device_index.chain_path(chain),
+                'position': int(self.device_index.device_position[device])
+            })
         
         return matching_racks
     
+    def find_racks_with_devices(self, all_of=(), any_of=(), none_of=()):
+        """Find racks matching a device query, e.g. all_of=['Gate', 'Reverb'], any_of=['Delay', 'Echo']"""
+        rack_ids = self.device_index.query(all_of=all_of, any_of=any_of, none_of=none_of)
+        device_counts = self.corpus.devices_per_rack(include_nested=True)
+        return [{
+            'use_case': self.corpus.use_cases[rack],
+            'total_devices': int(device_counts[rack])
+        } for rack in rack_ids]
+    
+    def find_similar_chains(self, device_types, k=10, max_distance=None, include_nested=True):
+        """Find the k chains whose device sequence is closest (edit distance) to device_types"""
+        similar_chains = []
+        
+        for chain, distance in self.chain_search.search(device_types, k=k, max_distance=max_distance,
+                                                        include_nested=include_nested):
+            similar_chains.append({
+                'use_case': self.corpus.use_cases[self.corpus.chain_rack[chain]],
+                'chain_name': self.corpus.chain_names[chain],
+                'chain_path': self.device_index.chain_path(chain),
+                'distance': distance,
+                'devices': [self.corpus.device_types[code] for code in self.chain_search.sequence(chain)]
+            })
+        
+        return similar_chains
+    
     def generate_report(self):
         """Generate comprehensive analysis report"""
         print("\n" + "="*60)
         print("🎛️  ABLETON RACK ANALYSIS REPORT")
         print("="*60)
         
+        # One pass over the corpus computes every section below
+        aggregates = self.aggregate()
+        
         print(f"\n📊 Dataset Overview:")
         print(f"   Total Racks Analyzed: {len(self.racks)}")
         
         # Device popularity
         print(f"\n🏆 Most Popular Devices:")
-        device_popularity = self.analyze_device_popularity()
+        device_popularity = aggregates['device_popularity']
         for i, (device, count) in enumerate(device_popularity[:10], 1):
             print(f"   {i:2d}. {device}: {count} racks")
         
         # Device combinations
         print(f"\n🔗 Common Device Combinations:")
-        combinations = self.analyze_device_combinations()
+        combinations = aggregates['device_combinations']
         for i, (combo, count) in enumerate(combinations[:5], 1):
             print(f"   {i}. {combo}: {count} times")
         
         # Complexity by category
         print(f"\n📈 Complexity by Category:")
-        complexity = self.analyze_complexity_by_category()
+        complexity = aggregates['complexity_by_category']
         sorted_complexity = sorted(complexity.items(), key=lambda x: x[1]['avg_devices'], reverse=True)
         for category, stats in sorted_complexity[:10]:
             print(f"   {category}: {stats['avg_devices']:.1f} avg devices ({stats['rack_count']} racks)")
         
         # Macro patterns
         print(f"\n🎚️  Macro Control Patterns:")
-        macro_analysis = self.analyze_macro_patterns()
+        macro_analysis = aggregates['macro_patterns']
         print(f"   Empty macros: {macro_analysis['empty_macro_percentage']:.1f}%")
         print(f"   Most common macro names:")
         for name, count in macro_analysis['most_common_names'][:5]:
             print(f"     '{name}': {count} times")
+        
+        # Custom aggregates registered with register_aggregate()
+        custom = [name for name in aggregates.states if name not in BUILTIN_AGGREGATES]
+        if custom:
+            print(f"\n🧩 Custom Aggregates:")
+            for name in custom:
+                print(f"   {name}: {aggregates[name]}")
 
 if __name__ == "__main__":
     # Run analysis on the generated rack data
@@ -164,3 +338,9 @@ if __name__ == "__main__":
     
     compressor_racks = analyzer.find_racks_with_device('Compressor2')
     print(f"   Racks with Compressor2: {len(compressor_racks)}")
+    
+    similar_chains = analyzer.find_similar_chains(['Eq8', 'Compressor2', 'Limiter'], k=3)
+    print(f"   Chains closest to Eq8 → Compressor2 → Limiter:")
+    for chain in similar_chains:
+        print(f"     {chain['use_case']} {chain['chain_path']}: {' → '.join(chain['devices'])} "
+              f"(distance {chain['distance']})")
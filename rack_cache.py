@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Rack Cache - Size-bounded LRU cache for query results
+
+cached_method() memoizes a method on (method name, arguments, corpus
+version). The version is the owner's analyzer.version, which RackAnalyzer
+bumps whenever racks are loaded, added or removed, so stale entries are
+never returned and simply age out of the LRU.
+
+cached_method() stores and hands out deep copies, so a caller that edits a
+result can't change what later callers get. LRUCache itself stores values
+as given.
+"""
+
+import copy
+import functools
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+def _freeze(value):
+    """Hashable form of an argument (lists, dicts and sets included)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    return value
+
+
+_IMMUTABLE = (str, int, float, bool, type(None))
+
+
+def _copy(value):
+    """Deep copy of a result; much cheaper than copy.deepcopy for the usual lists of dicts"""
+    if isinstance(value, _IMMUTABLE):
+        return value
+    if isinstance(value, list):
+        return [v if isinstance(v, _IMMUTABLE) else _copy(v) for v in value]
+    if isinstance(value, dict):
+        return {k: v if isinstance(v, _IMMUTABLE) else _copy(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return tuple(_copy(v) for v in value)
+    return copy.deepcopy(value)
+
+
+class LRUCache:
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+
+def cached_method(method):
+    """Memoize a method in self.cache, keyed on its arguments and self.analyzer.version"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            key = (method.__name__, _freeze(args), _freeze(kwargs), self.analyzer.version)
+            hash(key)
+        except TypeError:  # unhashable argument: just compute
+            return method(self, *args, **kwargs)
+        cached = self.cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            return _copy(cached)
+        result = method(self, *args, **kwargs)
+        self.cache.put(key, _copy(result))
+        return result
+    return wrapper
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Rack Chain Search - Nearest chains by device-sequence edit distance
+
+Chains are integer sequences of device type codes. Computing the edit
+distance to every chain in the corpus is far too slow, so each query first
+computes a cheap lower bound for every chain at once:
+
+    ED(a, b) >= ceil((L1(hist(a), hist(b)) + |len(a) - len(b)|) / 2)
+
+(an insertion or deletion moves the histogram L1 and the length difference
+by at most one each, a substitution moves the L1 by at most two). Chains are
+then visited in order of that bound, and the exact distance is only computed
+with a banded DP (cells within the current k-th best distance of the
+diagonal, abandoned as soon as a whole row exceeds it). The scan stops when
+the next bound is worse than the k-th best distance found so far.
+"""
+
+import heapq
+
+import numpy as np
+
+from rack_index import DeviceIndex
+
+
+def banded_edit_distance(a, b, max_distance):
+    """Levenshtein distance of two sequences, or max_distance + 1 if it exceeds max_distance"""
+    if len(a) > len(b):
+        a, b = b, a
+    la, lb = len(a), len(b)
+    big = max_distance + 1
+    if lb - la > max_distance:
+        return big
+
+    previous = [j if j <= max_distance else big for j in range(lb + 1)]
+    for i in range(1, la + 1):
+        lo, hi = max(1, i - max_distance), min(lb, i + max_distance)
+        current = [big] * (lb + 1)
+        current[0] = best = i if i <= max_distance else big
+        ai = a[i - 1]
+        for j in range(lo, hi + 1):
+            cost = previous[j - 1] + (ai != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost if cost < big else big
+            if cost < best:
+                best = cost
+        if best > max_distance:
+            return big
+        previous = current
+    return previous[lb]
+
+
+class ChainSearchIndex:
+    def __init__(self, corpus, device_index=None):
+        self.corpus = corpus
+        self.device_index = device_index or DeviceIndex(corpus)
+        self.lengths = np.diff(corpus.chain_offsets)
+
+    def encode(self, device_types):
+        """Type codes of a device sequence; unknown types get distinct negative codes"""
+        codes, unknown = [], {}
+        for device_type in device_types:
+            code = self.corpus.type_ids.get(device_type)
+            if code is None:
+                code = unknown.setdefault(device_type, -1 - len(unknown))
+            codes.append(code)
+        return codes
+
+    def sequence(self, chain):
+        start, end = self.corpus.chain_offsets[chain], self.corpus.chain_offsets[chain + 1]
+        return self.corpus.device_type[start:end].tolist()
+
+    def lower_bounds(self, query):
+        """Edit distance lower bound from the query to every chain"""
+        # sum over types of min(query count, chain count), from the type postings
+        overlap = np.zeros(self.corpus.num_chains, dtype=np.int64)
+        codes, counts = np.unique(np.asarray(query, dtype=np.int64), return_counts=True)
+        for code, count in zip(codes, counts):
+            if code < 0:
+                continue
+            devices = self.device_index.postings[self.device_index.offsets[code]:
+                                                 self.device_index.offsets[code + 1]]
+            in_chain = np.bincount(self.corpus.device_chain[devices], minlength=self.corpus.num_chains)
+            overlap += np.minimum(in_chain, count)
+        l1 = len(query) + self.lengths - 2 * overlap
+        return (l1 + np.abs(self.lengths - len(query)) + 1) // 2
+
+    def search(self, device_types, k=10, max_distance=None, include_nested=True):
+        """The k chains nearest to a device sequence: [(chain, distance), ...], ties by lower chain id"""
+        if k <= 0:
+            return []
+        query = self.encode(device_types)
+        bounds = self.lower_bounds(query)
+        candidates = np.arange(self.corpus.num_chains)
+        if not include_nested:
+            candidates = candidates[self.corpus.chain_parent < 0]
+        if max_distance is not None:
+            candidates = candidates[bounds[candidates] <= max_distance]
+        candidates = candidates[np.argsort(bounds[candidates], kind='stable')]
+
+        limit = max_distance if max_distance is not None else max(len(query), int(self.lengths.max(initial=0)))
+        best = []  # max-heap of (-distance, -chain)
+        for chain in candidates.tolist():
+            if len(best) == k:
+                limit = -best[0][0]
+                if bounds[chain] > limit:
+                    break
+            distance = banded_edit_distance(query, self.sequence(chain), limit)
+            if distance > limit:
+                continue
+            entry = (-distance, -chain)
+            if len(best) < k:
+                heapq.heappush(best, entry)
+            elif entry > best[0]:
+                heapq.heapreplace(best, entry)
+        return sorted(((-c, -d) for d, c in best), key=lambda item: (item[1], item[0]))
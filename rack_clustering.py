@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Rack Clustering - Mini-batch k-means over per-rack device-count features
+
+Each rack is described by log(1 + count) of every device type it uses
+(nested chains included) plus a few structural features: top-level chains,
+total chains, nesting depth, total devices and named macros. Features are
+standardised, then clustered with mini-batch k-means (Sculley, 2010): each
+step assigns a random batch to its nearest centres and moves every centre
+towards the mean of its batch points with a per-centre learning rate of
+1 / (points seen), all as array operations.
+
+The fitted model serialises to JSON, so racks added later can be labelled
+(predict) or folded in (partial_fit) without refitting the whole library.
+"""
+
+import json
+
+import numpy as np
+
+STRUCTURAL_FEATURES = ('top_level_chains', 'chains', 'max_depth', 'devices', 'named_macros')
+
+
+def rack_features(corpus, device_types=None):
+    """(racks x features) matrix; device_types fixes the device columns (e.g. a fitted model's)"""
+    if device_types is None:
+        device_types = list(corpus.device_types)
+    column = np.full(len(corpus.device_types), -1, dtype=np.int64)
+    positions = {device_type: i for i, device_type in enumerate(device_types)}
+    for code, device_type in enumerate(corpus.device_types):
+        column[code] = positions.get(device_type, -1)
+
+    num_racks = corpus.num_racks
+    counts = np.zeros((num_racks, len(device_types) + len(STRUCTURAL_FEATURES)))
+    device_rack = corpus.chain_rack[corpus.device_chain]
+    known = column[corpus.device_type] >= 0
+    np.add.at(counts, (device_rack[known], column[corpus.device_type[known]]), 1)
+
+    structure = counts[:, len(device_types):]
+    structure[:, 0] = np.bincount(corpus.chain_rack[corpus.chain_parent < 0], minlength=num_racks)
+    structure[:, 1] = np.diff(corpus.rack_chain_offsets)
+    if corpus.num_chains:
+        np.maximum.at(structure[:, 2], corpus.chain_rack, corpus.chain_depth)
+    structure[:, 3] = corpus.devices_per_rack(include_nested=True)
+    structure[:, 4] = corpus.named_macros_per_rack()
+    return np.log1p(counts)
+
+
+class MiniBatchKMeans:
+    def __init__(self, n_clusters=8, batch_size=1024, max_iter=100, tol=1e-4, seed=0):
+        self.n_clusters = n_clusters
+        self.batch_size = batch_size
+        self.max_iter = max_iter
+        self.tol = tol
+        self.rng = np.random.default_rng(seed)
+        self.centers = None
+        self.counts = None
+
+    @staticmethod
+    def _distances(X, centers):
+        """Squared Euclidean distances, (points x centres)"""
+        d = (X * X).sum(axis=1)[:, None] - 2 * X @ centers.T + (centers * centers).sum(axis=1)[None, :]
+        return np.maximum(d, 0)
+
+    def _init_centers(self, X):
+        """k-means++ seeding on a sample of X"""
+        sample = X[self.rng.choice(len(X), size=min(len(X), 20 * self.n_clusters), replace=False)]
+        centers = [sample[self.rng.integers(len(sample))]]
+        closest = self._distances(sample, centers[0][None, :])[:, 0]
+        for _ in range(1, min(self.n_clusters, len(sample))):
+            total = closest.sum()
+            pick = self.rng.choice(len(sample), p=closest / total) if total > 0 else self.rng.integers(len(sample))
+            centers.append(sample[pick])
+            closest = np.minimum(closest, self._distances(sample, sample[pick][None, :])[:, 0])
+        self.centers = np.array(centers)
+        self.counts = np.zeros(len(self.centers))
+
+    def partial_fit(self, X):
+        """One mini-batch k-means step on X (all of it is one batch); returns the centre shift"""
+        if self.centers is None:
+            self._init_centers(X)
+        labels = self._distances(X, self.centers).argmin(axis=1)
+        sums = np.zeros_like(self.centers)
+        np.add.at(sums, labels, X)
+        batch_counts = np.bincount(labels, minlength=len(self.centers))
+
+        self.counts += batch_counts
+        moved = batch_counts > 0
+        previous = self.centers.copy()
+        self.centers[moved] += (sums[moved] - batch_counts[moved, None] * self.centers[moved]) / \
+            self.counts[moved, None]
+        return float(np.sqrt(((self.centers - previous) ** 2).sum(axis=1)).max())
+
+    def fit(self, X):
+        self.centers = None
+        if len(X) == 0:
+            return self
+        for _ in range(self.max_iter):
+            batch = X[self.rng.choice(len(X), size=min(self.batch_size, len(X)), replace=False)]
+            if self.partial_fit(batch) < self.tol:
+                break
+        return self
+
+    def predict(self, X):
+        """(labels, distances to the assigned centre)"""
+        distances = self._distances(X, self.centers)
+        labels = distances.argmin(axis=1)
+        return labels, np.sqrt(distances[np.arange(len(X)), labels])
+
+
+class RackClusterModel:
+    """Feature scaling + mini-batch k-means, bound to a fixed device-type vocabulary"""
+
+    def __init__(self, n_clusters=8, seed=0, **kmeans_params):
+        self.n_clusters = n_clusters
+        self.kmeans = MiniBatchKMeans(n_clusters=n_clusters, seed=seed, **kmeans_params)
+        self.device_types = None
+        self.mean = None
+        self.scale = None
+
+    @property
+    def feature_names(self):
+        return list(self.device_types) + list(STRUCTURAL_FEATURES)
+
+    def _scaled(self, corpus):
+        return (rack_features(corpus, self.device_types) - self.mean) / self.scale
+
+    def fit(self, corpus):
+        self.device_types = list(corpus.device_types)
+        features = rack_features(corpus, self.device_types)
+        self.mean = features.mean(axis=0) if len(features) else np.zeros(features.shape[1])
+        std = features.std(axis=0) if len(features) else np.ones(features.shape[1])
+        self.scale = np.where(std > 0, std, 1.0)
+        self.kmeans.fit((features - self.mean) / self.scale)
+        return self
+
+    def partial_fit(self, corpus):
+        """Fold the racks of corpus into the existing clusters (new device types are ignored)"""
+        if self.device_types is None:
+            return self.fit(corpus)
+        self.kmeans.partial_fit(self._scaled(corpus))
+        return self
+
+    def predict(self, corpus):
+        """(cluster labels, distances) for every rack in corpus"""
+        return self.kmeans.predict(self._scaled(corpus))
+
+    def describe(self, limit=5):
+        """Per cluster: the features that are most above average in its centre"""
+        clusters = []
+        names = self.feature_names
+        for cluster, center in enumerate(self.kmeans.centers):
+            top = np.argsort(-center, kind='stable')[:limit]
+            clusters.append({
+                'cluster': cluster,
+                'top_features': [names[i] for i in top if center[i] > 0]
+            })
+        return clusters
+
+    def to_json(self):
+        return json.dumps({
+            'n_clusters': self.n_clusters,
+            'device_types': self.device_types,
+            'mean': self.mean.tolist(),
+            'scale': self.scale.tolist(),
+            'centers': self.kmeans.centers.tolist(),
+            'counts': self.kmeans.counts.tolist()
+        })
+
+    @classmethod
+    def from_json(cls, text):
+        state = json.loads(text)
+        model = cls(n_clusters=state['n_clusters'])
+        model.device_types = state['device_types']
+        model.mean = np.array(state['mean'])
+        model.scale = np.array(state['scale'])
+        model.kmeans.centers = np.array(state['centers']).reshape(-1, len(model.feature_names))
+        model.kmeans.counts = np.array(state['counts'])
+        return model
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Rack Corpus - Columnar, NumPy-backed representation of the rack JSON data
+
+Every rack, chain, device and macro is flattened into parallel arrays so the
+analyses in RackAnalyzer (see rack_aggregates.py) can run as vectorized
+operations instead of nested Python loops:
+
+    racks   --rack_chain_offsets-->  chains  --chain_offsets-->  devices
+    racks   --macro_offsets------->  macros
+
+Chains are stored breadth-first per rack: a rack's top-level chains come first
+(in file order), followed by the chains of any nested racks. Each chain's
+devices are contiguous, so chain_offsets is a plain CSR offset array.
+"""
+
+import numpy as np
+
+
+def rack_category(use_case):
+    """Derive the category of a rack from its use case ("Category - Name"); 'Unknown' if blank"""
+    if ' - ' in use_case:
+        return use_case.split(' - ')[0]
+    words = use_case.split()
+    return words[0] if words else 'Unknown'
+
+
+class RackCorpus:
+    # Constructor fields, split by storage kind (used by rack_snapshot.py)
+    ARRAY_FIELDS = ('rack_category', 'rack_chain_offsets', 'chain_offsets', 'chain_rack',
+                    'chain_parent', 'chain_depth', 'device_type', 'device_is_on',
+                    'macro_offsets', 'macro_name', 'macro_value')
+    STRING_FIELDS = ('use_cases', 'categories', 'chain_names', 'device_types', 'macro_names')
+
+    def __init__(self, use_cases, categories, rack_category, rack_chain_offsets,
+                 chain_names, chain_offsets, chain_rack, chain_parent, chain_depth,
+                 device_types, device_type, device_is_on,
+                 macro_names, macro_offsets, macro_name, macro_value):
+        # Racks
+        self.use_cases = use_cases
+        self.categories = categories
+        self.rack_category = rack_category
+        self.rack_chain_offsets = rack_chain_offsets
+        # Chains
+        self.chain_names = chain_names
+        self.chain_offsets = chain_offsets
+        self.chain_rack = chain_rack
+        self.chain_parent = chain_parent
+        self.chain_depth = chain_depth
+        # Devices
+        self.device_types = device_types
+        self.type_ids = {device_type: i for i, device_type in enumerate(device_types)}
+        self.device_type = device_type
+        self.device_is_on = device_is_on
+        self.device_chain = np.repeat(
+            np.arange(len(chain_names), dtype=np.int32), np.diff(chain_offsets)
+        )
+        # Macros (macro_name is -1 for empty names)
+        self.macro_names = macro_names
+        self.macro_offsets = macro_offsets
+        self.macro_name = macro_name
+        self.macro_value = macro_value
+
+    @classmethod
+    def from_racks(cls, racks):
+        """Build a corpus from a list of rack JSON dicts"""
+        type_ids = {}
+        macro_ids = {}
+        category_ids = {}
+
+        use_cases = []
+        rack_category_codes = []
+        rack_chain_offsets = [0]
+        chain_names = []
+        chain_offsets = [0]
+        chain_rack = []
+        chain_parent = []
+        chain_depth = []
+        device_type = []
+        device_is_on = []
+        macro_offsets = [0]
+        macro_name = []
+        macro_value = []
+
+        for rack_id, rack in enumerate(racks):
+            use_case = rack.get('use_case', 'Unknown')
+            use_cases.append(use_case)
+            category = rack_category(use_case)
+            rack_category_codes.append(category_ids.setdefault(category, len(category_ids)))
+
+            # Breadth-first so every chain's devices stay contiguous
+            pending = [(chain, -1, 0) for chain in rack.get('chains', [])]
+            while pending:
+                next_level = []
+                for chain, parent, depth in pending:
+                    chain_names.append(chain.get('name', ''))
+                    chain_rack.append(rack_id)
+                    chain_parent.append(parent)
+                    chain_depth.append(depth)
+                    for device in chain.get('devices', []):
+                        device_id = len(device_type)
+                        device_type.append(type_ids.setdefault(device['type'], len(type_ids)))
+                        device_is_on.append(device.get('is_on', True))
+                        for nested_chain in device.get('chains', []):
+                            next_level.append((nested_chain, device_id, depth + 1))
+                    chain_offsets.append(len(device_type))
+                pending = next_level
+            rack_chain_offsets.append(len(chain_names))
+
+            for macro in rack.get('macro_controls', []):
+                name = macro.get('name', '').strip()
+                macro_name.append(macro_ids.setdefault(name, len(macro_ids)) if name else -1)
+                macro_value.append(macro.get('value', 0.0))
+            macro_offsets.append(len(macro_name))
+
+        return cls(
+            use_cases=use_cases,
+            categories=list(category_ids),
+            rack_category=np.array(rack_category_codes, dtype=np.int32),
+            rack_chain_offsets=np.array(rack_chain_offsets, dtype=np.int64),
+            chain_names=chain_names,
+            chain_offsets=np.array(chain_offsets, dtype=np.int64),
+            chain_rack=np.array(chain_rack, dtype=np.int32),
+            chain_parent=np.array(chain_parent, dtype=np.int32),
+            chain_depth=np.array(chain_depth, dtype=np.int32),
+            device_types=list(type_ids),
+            device_type=np.array(device_type, dtype=np.int32),
+            device_is_on=np.array(device_is_on, dtype=bool),
+            macro_names=list(macro_ids),
+            macro_offsets=np.array(macro_offsets, dtype=np.int64),
+            macro_name=np.array(macro_name, dtype=np.int32),
+            macro_value=np.array(macro_value, dtype=np.float64),
+        )
+
+    def take(self, racks):
+        """Corpus of the given racks, in the given order (vocabularies are kept as they are)"""
+        racks = np.asarray(racks, dtype=np.int64)
+        chain_counts = self.rack_chain_offsets[racks + 1] - self.rack_chain_offsets[racks]
+        chains = _gather(self.rack_chain_offsets[racks], chain_counts)
+        device_counts = self.chain_offsets[chains + 1] - self.chain_offsets[chains]
+        devices = _gather(self.chain_offsets[chains], device_counts)
+        macro_counts = self.macro_offsets[racks + 1] - self.macro_offsets[racks]
+        macros = _gather(self.macro_offsets[racks], macro_counts)
+
+        # chain_parent holds the id of the device a nested chain belongs to
+        new_device_ids = np.full(self.num_devices, -1, dtype=np.int32)
+        new_device_ids[devices] = np.arange(len(devices), dtype=np.int32)
+        parents = self.chain_parent[chains]
+        parents = np.where(parents >= 0, new_device_ids[np.maximum(parents, 0)], -1).astype(np.int32)
+
+        return RackCorpus(
+            use_cases=[self.use_cases[rack] for rack in racks.tolist()],
+            categories=self.categories,
+            rack_category=self.rack_category[racks],
+            rack_chain_offsets=_offsets(chain_counts),
+            chain_names=[self.chain_names[chain] for chain in chains.tolist()],
+            chain_offsets=_offsets(device_counts),
+            chain_rack=np.repeat(np.arange(len(racks), dtype=np.int32), chain_counts),
+            chain_parent=parents,
+            chain_depth=self.chain_depth[chains],
+            device_types=self.device_types,
+            device_type=self.device_type[devices],
+            device_is_on=self.device_is_on[devices],
+            macro_names=self.macro_names,
+            macro_offsets=_offsets(macro_counts),
+            macro_name=self.macro_name[macros],
+            macro_value=self.macro_value[macros],
+        )
+
+    def concat(self, other):
+        """Corpus of this corpus's racks followed by other's (vocabularies merged)"""
+        categories, category_codes = _merge_vocabulary(self.categories, other.categories)
+        device_types, type_codes = _merge_vocabulary(self.device_types, other.device_types)
+        macro_names, macro_codes = _merge_vocabulary(self.macro_names, other.macro_names)
+        other_parent = np.where(other.chain_parent >= 0, other.chain_parent + self.num_devices, -1)
+        other_macro = np.where(other.macro_name >= 0, macro_codes[np.maximum(other.macro_name, 0)], -1)
+
+        return RackCorpus(
+            use_cases=list(self.use_cases) + list(other.use_cases),
+            categories=categories,
+            rack_category=np.concatenate([self.rack_category, category_codes[other.rack_category]]).astype(np.int32),
+            rack_chain_offsets=np.concatenate([self.rack_chain_offsets,
+                                               other.rack_chain_offsets[1:] + self.num_chains]),
+            chain_names=list(self.chain_names) + list(other.chain_names),
+            chain_offsets=np.concatenate([self.chain_offsets, other.chain_offsets[1:] + self.num_devices]),
+            chain_rack=np.concatenate([self.chain_rack, other.chain_rack + self.num_racks]).astype(np.int32),
+            chain_parent=np.concatenate([self.chain_parent, other_parent]).astype(np.int32),
+            chain_depth=np.concatenate([self.chain_depth, other.chain_depth]),
+            device_types=device_types,
+            device_type=np.concatenate([self.device_type, type_codes[other.device_type]]).astype(np.int32),
+            device_is_on=np.concatenate([self.device_is_on, other.device_is_on]),
+            macro_names=macro_names,
+            macro_offsets=np.concatenate([self.macro_offsets, other.macro_offsets[1:] + len(self.macro_name)]),
+            macro_name=np.concatenate([self.macro_name, other_macro]).astype(np.int32),
+            macro_value=np.concatenate([self.macro_value, other.macro_value]),
+        )
+
+    @property
+    def num_racks(self):
+        return len(self.use_cases)
+
+    @property
+    def num_chains(self):
+        return len(self.chain_names)
+
+    @property
+    def num_devices(self):
+        return len(self.device_type)
+
+    def top_level_devices(self):
+        """Boolean mask of devices that sit directly in a rack's top-level chains"""
+        return self.chain_depth[self.device_chain] == 0
+
+    def devices_per_rack(self, include_nested=False):
+        """Number of devices in each rack"""
+        mask = slice(None) if include_nested else self.top_level_devices()
+        device_rack = self.chain_rack[self.device_chain[mask]]
+        return np.bincount(device_rack, minlength=self.num_racks)
+
+    def named_macros_per_rack(self):
+        """Number of macros with a non-empty name in each rack"""
+        macro_rack = np.repeat(np.arange(self.num_racks), np.diff(self.macro_offsets))
+        return np.bincount(macro_rack[self.macro_name >= 0], minlength=self.num_racks)
+
+
+def _offsets(counts):
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
+
+
+def _gather(starts, counts):
+    """Concatenated ranges starts[i] .. starts[i] + counts[i] as one index array"""
+    offsets = _offsets(counts)
+    return np.repeat(starts - offsets[:-1], counts) + np.arange(offsets[-1], dtype=np.int64)
+
+
+def _merge_vocabulary(vocabulary, other):
+    """(merged vocabulary, codes of other's entries in it)"""
+    merged = list(vocabulary)
+    ids = {value: i for i, value in enumerate(merged)}
+    codes = np.array([ids.setdefault(value, len(ids)) for value in other], dtype=np.int64)
+    merged.extend(list(ids)[len(merged):])
+    return merged, codes
@@ -3,11 +3,19 @@
 Rack Database API - Practical web application structure
 """
 
+import hashlib
 import json
 import sqlite3
 from pathlib import Path
 from datetime import datetime
 
+import numpy as np
+
+from rack_clustering import RackClusterModel
+from rack_corpus import rack_category
+from rack_similarity import DeviceBitsetIndex, blocked_top_k, similarity_rows
+from rack_snapshot import load_corpus
+
 class RackDatabase:
     def __init__(self, db_path="racks.db", json_folder="alltheracks_analysis"):
         self.db_path = db_path
@@ -58,34 +66,77 @@ class RackDatabase:
             )
         ''')
         
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS corpus_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+        
+        # Precomputed top-k neighbours per rack (see refresh_similar_racks)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS similar_racks (
+                use_case TEXT,
+                rank INTEGER,
+                neighbor_use_case TEXT,
+                similarity REAL,
+                PRIMARY KEY (use_case, rank)
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS similarity_signatures (
+                use_case TEXT PRIMARY KEY,
+                signature TEXT
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rack_clusters (
+                use_case TEXT PRIMARY KEY,
+                cluster INTEGER,
+                distance REAL
+            )
+        ''')
+        
         # Create indexes for better performance
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_device_type ON devices (device_type)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_category ON racks (category)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_complexity ON racks (complexity_score)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_cluster ON rack_clusters (cluster)')
         
         conn.commit()
         conn.close()
     
-    def populate_from_json(self):
-        """Populate database from JSON files"""
+    def populate_from_json(self, force=False):
+        """Populate database from JSON files (skipped when the folder is unchanged)"""
+        snapshot = load_corpus(self.json_folder)
+        self.corpus = snapshot.corpus
+        fingerprint = hashlib.sha1(json.dumps(snapshot.manifest).encode()).hexdigest()
+        
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        cursor.execute("SELECT value FROM corpus_meta WHERE key = 'fingerprint'")
+        row = cursor.fetchone()
+        if not force and row and row[0] == fingerprint:
+            conn.close()
+            print(f"Database up to date with {len(snapshot.racks)} racks")
+            return
+        
         # Clear existing data
         cursor.execute('DELETE FROM macro_controls')
         cursor.execute('DELETE FROM devices')
         cursor.execute('DELETE FROM racks')
         
-        json_files = list(self.json_folder.glob("*_analysis.json"))
+        for file_name, e in snapshot.errors:
+            print(f"Error processing {self.json_folder / file_name}: {e}")
         
-        for file_path in json_files:
+        for rack_data in snapshot.racks:
             try:
-                with open(file_path, 'r') as f:
-                    rack_data = json.load(f)
-                
                 # Extract category from use_case
                 use_case = rack_data.get('use_case', 'Unknown')
-                category = use_case.split(' - ')[0] if ' - ' in use_case else use_case.split()[0]
+                category = rack_category(use_case)
                 
                 # Calculate metrics
                 total_devices = sum(len(chain.get('devices', [])) for chain in rack_data.get('chains', []))
@@ -118,18 +169,208 @@ class RackDatabase:
                     ''', (rack_id, macro.get('name', ''), macro.get('value', 0.0), macro.get('index', 0)))
                 
             except Exception as e:
-                print(f"Error processing {file_path}: {e}")
+                print(f"Error processing {rack_data.get('use_case')}: {e}")
+        
+        cursor.execute("INSERT OR REPLACE INTO corpus_meta (key, value) VALUES ('fingerprint', ?)",
+                       (fingerprint,))
+        has_similarity_table, has_cluster_model = self._derived_tables(cursor)
+        conn.commit()
+        conn.close()
+        print(f"Database populated with {len(snapshot.racks)} racks")
+        
+        # Keep the precomputed neighbour table and cluster labels current once built
+        if has_similarity_table:
+            self.refresh_similar_racks()
+        if has_cluster_model and snapshot.racks:
+            self.cluster_racks()
+    
+    @staticmethod
+    def _derived_tables(cursor):
+        """(similar_racks table built, cluster model stored)"""
+        cursor.execute("SELECT COUNT(*) FROM similarity_signatures")
+        has_similarity_table = cursor.fetchone()[0] > 0
+        cursor.execute("SELECT COUNT(*) FROM corpus_meta WHERE key = 'cluster_model'")
+        has_cluster_model = cursor.fetchone()[0] > 0
+        return has_similarity_table, has_cluster_model
+    
+    def build_derived_tables(self):
+        """Build the similar_racks table and cluster labels if they haven't been built yet
+        
+        Once built, populate_from_json keeps both current when the folder changes.
+        """
+        conn = sqlite3.connect(self.db_path)
+        has_similarity_table, has_cluster_model = self._derived_tables(conn.cursor())
+        conn.close()
+        if self.corpus.num_racks == 0:
+            return
+        if not has_similarity_table:
+            self.refresh_similar_racks()
+        if not has_cluster_model:
+            self.cluster_racks()
+    
+    def refresh_similar_racks(self, k=None, block_size=None, full=False):
+        """Batch-compute top-k similar racks into the similar_racks table
+        
+        Only racks whose device set changed, racks that listed a changed rack as a
+        neighbour, and racks a changed rack now reaches the k-th neighbour of are
+        recomputed, unless full=True. k defaults to the value of the last refresh (10).
+        """
+        bitsets = DeviceBitsetIndex(self.corpus)
+        use_cases = self.corpus.use_cases
+        device_types = self.corpus.device_types
+        
+        signatures = {}
+        for use_case, rack in bitsets.rack_ids.items():
+            types = ",".join(sorted(device_types[code] for code in np.flatnonzero(bitsets.membership[rack])))
+            signatures[use_case] = hashlib.sha1(types.encode()).hexdigest()
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT value FROM corpus_meta WHERE key = 'similar_k'")
+        row = cursor.fetchone()
+        stored_k = int(row[0]) if row else None
+        k = k or stored_k or 10
+        full = full or k != stored_k
         
+        cursor.execute("SELECT use_case, signature FROM similarity_signatures")
+        stored = dict(cursor.fetchall())
+        
+        changed = {u for u, signature in signatures.items() if stored.get(u) != signature}
+        removed = set(stored) - set(signatures)
+        
+        if full:
+            affected = set(signatures)
+        else:
+            affected = set(changed)
+            stale = changed | removed
+            if stale:
+                # Racks that currently list a changed or removed rack
+                cursor.execute("SELECT use_case, neighbor_use_case FROM similar_racks")
+                affected.update(u for u, neighbor in cursor.fetchall() if neighbor in stale)
+            
+            changed_rows = [bitsets.rack_ids[u] for u in changed]
+            if changed_rows:
+                # Racks whose k-th neighbour a changed rack now reaches (ties go by rack order)
+                thresholds = np.zeros(len(use_cases))
+                cursor.execute("""
+                    SELECT use_case, MIN(similarity), COUNT(*) FROM similar_racks GROUP BY use_case
+                """)
+                for use_case, kth, count in cursor.fetchall():
+                    if use_case in bitsets.rack_ids and count >= k:
+                        thresholds[bitsets.rack_ids[use_case]] = kth
+                for _, similarity in similarity_rows(bitsets, changed_rows, block_size):
+                    affected.update(use_cases[r] for r in np.flatnonzero((similarity > 0) & (similarity >= thresholds)))
+        
+        affected = [u for u in affected if u in bitsets.rack_ids]
+        for use_case in list(removed) + affected:
+            cursor.execute("DELETE FROM similar_racks WHERE use_case = ?", (use_case,))
+        for use_case in removed:
+            cursor.execute("DELETE FROM similarity_signatures WHERE use_case = ?", (use_case,))
+        
+        rows = [bitsets.rack_ids[u] for u in affected]
+        for rack, neighbors in blocked_top_k(bitsets, k, rows=rows, block_size=block_size):
+            cursor.executemany('''
+                INSERT INTO similar_racks (use_case, rank, neighbor_use_case, similarity)
+                VALUES (?, ?, ?, ?)
+            ''', [(use_cases[rack], rank, use_cases[n], sim) for rank, (n, sim) in enumerate(neighbors, 1)])
+        cursor.executemany("INSERT OR REPLACE INTO similarity_signatures (use_case, signature) VALUES (?, ?)",
+                           list(signatures.items()))
+        cursor.execute("INSERT OR REPLACE INTO corpus_meta (key, value) VALUES ('similar_k', ?)", (str(k),))
+        
+        conn.commit()
+        conn.close()
+        print(f"Similar racks refreshed for {len(affected)} of {len(signatures)} racks")
+        return len(affected)
+    
+    def cluster_racks(self, n_clusters=None, refit=False, update=False):
+        """Assign racks to device-usage clusters and store the labels in rack_clusters
+        
+        The fitted model is kept in corpus_meta, so later calls only label racks that
+        have no label yet, with the same clusters (labels of racks that are gone are
+        dropped); update=True also folds those new racks into the centres. refit=True
+        (or a different n_clusters) fits a new model and relabels every rack.
+        n_clusters defaults to the stored model's, or 8. Returns the model (None if
+        there is none and no racks to fit).
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT value FROM corpus_meta WHERE key = 'cluster_model'")
+        row = cursor.fetchone()
+        cursor.execute("SELECT use_case FROM rack_clusters")
+        labelled = {use_case for use_case, in cursor.fetchall()}
+        
+        model = RackClusterModel.from_json(row[0]) if row and not refit else None
+        if model is not None and model.n_clusters != (n_clusters or model.n_clusters):
+            model = None
+        current = set(self.corpus.use_cases)
+        cursor.executemany("DELETE FROM rack_clusters WHERE use_case = ?",
+                           [(use_case,) for use_case in labelled - current])
+        
+        if self.corpus.num_racks == 0:
+            conn.commit()
+            conn.close()
+            self.cluster_model = model
+            return model
+        
+        if model is None:
+            model = RackClusterModel(n_clusters=n_clusters or 8).fit(self.corpus)
+            cursor.execute("DELETE FROM rack_clusters")
+            new_racks = self.corpus
+        else:
+            new_racks = self.corpus.take([rack for rack, use_case in enumerate(self.corpus.use_cases)
+                                          if use_case not in labelled])
+            if update and new_racks.num_racks:
+                model.partial_fit(new_racks)
+        
+        if new_racks.num_racks:
+            labels, distances = model.predict(new_racks)
+            cursor.executemany("INSERT OR REPLACE INTO rack_clusters (use_case, cluster, distance) VALUES (?, ?, ?)",
+                               zip(new_racks.use_cases, labels.tolist(), distances.tolist()))
+        cursor.execute("INSERT OR REPLACE INTO corpus_meta (key, value) VALUES ('cluster_model', ?)",
+                       (model.to_json(),))
         conn.commit()
         conn.close()
-        print(f"Database populated with {len(json_files)} racks")
+        
+        self.cluster_model = model
+        return model
+    
+    def get_clusters(self):
+        """Clusters with their size and the features that characterise them"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT cluster, COUNT(*) FROM rack_clusters GROUP BY cluster")
+        sizes = dict(cursor.fetchall())
+        cursor.execute("SELECT value FROM corpus_meta WHERE key = 'cluster_model'")
+        row = cursor.fetchone()
+        conn.close()
+        
+        if not row:
+            return []
+        clusters = RackClusterModel.from_json(row[0]).describe()
+        for cluster in clusters:
+            cluster['rack_count'] = sizes.get(cluster['cluster'], 0)
+        return clusters
     
-    def search_racks(self, **filters):
-        """Search racks with various filters"""
+    def get_similar_racks(self, use_case, limit=10):
+        """Precomputed similar racks for a use case (single indexed lookup)"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
+        cursor.execute("""
+            SELECT neighbor_use_case, similarity
+            FROM similar_racks
+            WHERE use_case = ?
+            ORDER BY rank
+            LIMIT ?
+        """, (use_case, limit))
+        results = cursor.fetchall()
+        conn.close()
         
-        query = "SELECT * FROM racks WHERE 1=1"
+        return [{'use_case': neighbor, 'similarity': similarity} for neighbor, similarity in results]
+    
+    @staticmethod
+    def _search_filters(filters):
+        """WHERE clause and parameters for the search_racks filters"""
+        query = "WHERE 1=1"
         params = []
         
         if 'category' in filters:
@@ -152,7 +393,23 @@ class RackDatabase:
             query += " AND id IN (SELECT DISTINCT rack_id FROM macro_controls WHERE name LIKE ?)"
             params.append(f"%{filters['macro_name']}%")
         
-        query += " ORDER BY complexity_score DESC"
+        if 'cluster' in filters:
+            query += " AND use_case IN (SELECT use_case FROM rack_clusters WHERE cluster = ?)"
+            params.append(filters['cluster'])
+        
+        return query, params
+    
+    def search_racks(self, limit=None, offset=0, **filters):
+        """Search racks with various filters (one page of results with limit/offset)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        where, params = self._search_filters(filters)
+        # id breaks ties so pages don't overlap
+        query = f"SELECT * FROM racks {where} ORDER BY complexity_score DESC, id"
+        if limit is not None or offset:
+            query += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else limit, offset]
         
         cursor.execute(query, params)
         results = cursor.fetchall()
@@ -162,6 +419,16 @@ class RackDatabase:
         columns = ['id', 'use_case', 'category', 'total_devices', 'total_chains', 'active_macros', 'complexity_score', 'created_at']
         return [dict(zip(columns, row)) for row in results]
     
+    def count_racks(self, **filters):
+        """Number of racks matching the search_racks filters"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        where, params = self._search_filters(filters)
+        cursor.execute(f"SELECT COUNT(*) FROM racks {where}", params)
+        count = cursor.fetchone()[0]
+        conn.close()
+        return count
+    
     def get_rack_details(self, rack_id):
         """Get full details for a specific rack"""
         conn = sqlite3.connect(self.db_path)
@@ -284,6 +551,21 @@ def demo_database():
     print(f"\n📂 Top Categories:")
     for category, count in stats['category_distribution'][:5]:
         print(f"   {category}: {count} racks")
+    
+    # Precomputed similar racks
+    db.refresh_similar_racks()
+    if db.corpus.num_racks:
+        use_case = db.corpus.use_cases[0]
+        print(f"\n🔗 Racks similar to '{use_case}':")
+        for similar in db.get_similar_racks(use_case, limit=5):
+            print(f"   {similar['use_case']}: {similar['similarity']:.2f}")
+    
+    # Device-usage clusters
+    if db.corpus.num_racks:
+        db.cluster_racks()
+        print(f"\n🧬 Rack Clusters:")
+        for cluster in db.get_clusters():
+            print(f"   #{cluster['cluster']}: {cluster['rack_count']} racks - {', '.join(cluster['top_features'][:3])}")
 
 if __name__ == "__main__":
     demo_database()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Rack Index - Inverted index from device type to the places it is used
+
+Built once from a RackCorpus: device ids are grouped by type (CSR postings),
+so "which racks/chains use X" is a slice instead of a scan, and multi-device
+AND/OR/NOT queries are sorted-array intersections and unions.
+
+A location is (rack, chain path, position). The chain path walks down from
+the rack: (top-level chain, device position, nested chain, device position,
+nested chain, ...), so (1,) is the rack's second chain and (1, 3, 0) is the
+first chain of the nested rack at position 3 of that chain.
+"""
+
+from functools import reduce
+
+import numpy as np
+
+
+class DeviceIndex:
+    def __init__(self, corpus):
+        self.corpus = corpus
+        num_types = len(corpus.device_types)
+
+        # Postings: device ids grouped by type, ascending within each type
+        self.postings = np.argsort(corpus.device_type, kind='stable').astype(np.int64)
+        self.offsets = np.zeros(num_types + 1, dtype=np.int64)
+        np.cumsum(np.bincount(corpus.device_type, minlength=num_types), out=self.offsets[1:])
+
+        self.device_rack = corpus.chain_rack[corpus.device_chain]
+        self.device_position = np.arange(corpus.num_devices) - corpus.chain_offsets[corpus.device_chain]
+
+        # Ordinal of each chain among its siblings (same rack at top level, same parent device below)
+        siblings = np.where(corpus.chain_parent < 0,
+                            -1 - corpus.chain_rack.astype(np.int64), corpus.chain_parent)
+        group_start = np.ones(corpus.num_chains, dtype=bool)
+        group_start[1:] = siblings[1:] != siblings[:-1]
+        starts = np.flatnonzero(group_start)
+        self.chain_ordinal = np.arange(corpus.num_chains) - starts[np.cumsum(group_start) - 1]
+
+    def devices(self, device_type):
+        """Ids of every device of the given type"""
+        code = self.corpus.type_ids.get(device_type)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        return self.postings[self.offsets[code]:self.offsets[code + 1]]
+
+    def racks(self, device_type):
+        """Sorted ids of racks that contain the device type anywhere"""
+        return np.unique(self.device_rack[self.devices(device_type)])
+
+    def query(self, all_of=(), any_of=(), none_of=()):
+        """Rack ids containing every type in all_of, at least one of any_of and none of none_of"""
+        result = None
+        if all_of:
+            result = reduce(np.intersect1d, (self.racks(t) for t in all_of))
+        if any_of:
+            union = reduce(np.union1d, (self.racks(t) for t in any_of))
+            result = union if result is None else np.intersect1d(result, union)
+        if result is None:
+            result = np.arange(self.corpus.num_racks)
+        for device_type in none_of:
+            result = np.setdiff1d(result, self.racks(device_type), assume_unique=True)
+        return result
+
+    def chain_path(self, chain):
+        """Path from the rack down to a chain (see module docstring)"""
+        path = []
+        while True:
+            path.append(int(self.chain_ordinal[chain]))
+            parent = self.corpus.chain_parent[chain]
+            if parent < 0:
+                break
+            path.append(int(self.device_position[parent]))
+            chain = self.corpus.device_chain[parent]
+        return tuple(reversed(path))
+
+    def locations(self, device_type):
+        """Every (rack, chain path, position) where the device type is used"""
+        return [(int(self.device_rack[d]), self.chain_path(self.corpus.device_chain[d]),
+                 int(self.device_position[d]))
+                for d in self.devices(device_type)]
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Rack Itemsets - Frequent device-set mining (FP-growth) and association rules
+
+Each rack is treated as the set of device types it contains, regardless of
+order or chain. FP-growth compresses those sets into a prefix tree ordered by
+device frequency and mines it recursively, so the library is read once and
+no candidate sets are ever enumerated.
+"""
+
+from collections import defaultdict
+from itertools import combinations
+
+import numpy as np
+
+
+class _FPNode:
+    __slots__ = ('item', 'count', 'parent', 'children')
+
+    def __init__(self, item, parent):
+        self.item = item
+        self.count = 0
+        self.parent = parent
+        self.children = {}
+
+
+def _build_tree(transactions, rank):
+    """FP-tree over (items, count) transactions; items already filtered to frequent ones"""
+    root = _FPNode(None, None)
+    header = defaultdict(list)
+    for items, count in transactions:
+        node = root
+        for item in sorted(items, key=rank.__getitem__):
+            child = node.children.get(item)
+            if child is None:
+                child = node.children[item] = _FPNode(item, node)
+                header[item].append(child)
+            child.count += count
+            node = child
+    return header
+
+
+def _mine(header, rank, suffix, min_count, max_len, itemsets):
+    # Least frequent items first, so conditional trees stay small
+    for item in sorted(header, key=rank.__getitem__, reverse=True):
+        nodes = header[item]
+        itemset = suffix | {item}
+        itemsets[itemset] = sum(node.count for node in nodes)
+        if max_len is not None and len(itemset) >= max_len:
+            continue
+
+        # Conditional pattern base: the prefix path above every occurrence of item
+        base = []
+        item_counts = defaultdict(int)
+        for node in nodes:
+            path = []
+            parent = node.parent
+            while parent.item is not None:
+                path.append(parent.item)
+                parent = parent.parent
+            if path:
+                base.append((path, node.count))
+                for path_item in path:
+                    item_counts[path_item] += node.count
+
+        keep = {path_item for path_item, count in item_counts.items() if count >= min_count}
+        if keep:
+            conditional = [([i for i in path if i in keep], count) for path, count in base]
+            _mine(_build_tree(conditional, rank), rank, itemset, min_count, max_len, itemsets)
+
+
+def mine_frequent_itemsets(transactions, min_count, max_len=None):
+    """FP-growth over an iterable of item collections.
+
+    Returns:
+        dict: frozenset of items -> number of transactions containing it
+    """
+    grouped = defaultdict(int)
+    for items in transactions:
+        grouped[frozenset(items)] += 1
+
+    item_counts = defaultdict(int)
+    for items, count in grouped.items():
+        for item in items:
+            item_counts[item] += count
+    frequent = {item for item, count in item_counts.items() if count >= min_count}
+    rank = {item: i for i, item in enumerate(sorted(frequent, key=lambda i: (-item_counts[i], i)))}
+
+    filtered = [(items & frequent, count) for items, count in grouped.items()]
+    header = _build_tree([(items, count) for items, count in filtered if items], rank)
+
+    itemsets = {}
+    _mine(header, rank, frozenset(), min_count, max_len, itemsets)
+    return itemsets
+
+
+def rack_device_sets(corpus, include_nested=True):
+    """Per-rack sets of device type codes"""
+    device_mask = slice(None) if include_nested else corpus.top_level_devices()
+    device_rack = corpus.chain_rack[corpus.device_chain[device_mask]].astype(np.int64)
+    num_types = max(len(corpus.device_types), 1)
+    pairs = np.unique(device_rack * num_types + corpus.device_type[device_mask])
+    racks, types = np.divmod(pairs, num_types)
+    bounds = np.searchsorted(racks, np.arange(corpus.num_racks + 1))
+    types = types.tolist()
+    return [types[bounds[r]:bounds[r + 1]] for r in range(corpus.num_racks)]
+
+
+def association_rules(itemsets, num_transactions, min_confidence=0.6):
+    """Rules antecedent -> consequent from frequent itemsets (as returned by mine_frequent_itemsets)"""
+    rules = []
+    for itemset, count in itemsets.items():
+        if len(itemset) < 2:
+            continue
+        for size in range(1, len(itemset)):
+            for antecedent in combinations(sorted(itemset), size):
+                antecedent = frozenset(antecedent)
+                consequent = itemset - antecedent
+                confidence = count / itemsets[antecedent]
+                if confidence >= min_confidence:
+                    rules.append({
+                        'antecedent': antecedent,
+                        'consequent': consequent,
+                        'support': count / num_transactions,
+                        'confidence': confidence,
+                        'lift': confidence / (itemsets[consequent] / num_transactions)
+                    })
+    rules.sort(key=lambda r: (-r['confidence'], -r['lift'], -r['support']))
+    return rules
+
+
+def mine_device_sets(corpus, min_support=0.05, min_confidence=0.6, max_len=4, include_nested=True):
+    """Frequent device-type sets across racks plus the association rules between them.
+
+    Args:
+        corpus: RackCorpus to mine
+        min_support (float): Minimum fraction of racks containing the set
+        min_confidence (float): Minimum confidence for reported rules
+        max_len (int): Largest set size to mine (None for no limit)
+        include_nested (bool): Count devices inside nested racks
+
+    Returns:
+        dict: {'itemsets': [...], 'rules': [...]} with device type names
+    """
+    num_racks = corpus.num_racks
+    if num_racks == 0:
+        return {'itemsets': [], 'rules': []}
+    min_count = max(1, int(np.ceil(min_support * num_racks)))
+    itemsets = mine_frequent_itemsets(rack_device_sets(corpus, include_nested), min_count, max_len)
+
+    def names(items):
+        return sorted((corpus.device_types[i] for i in items))
+
+    ranked = sorted(itemsets.items(), key=lambda kv: (-kv[1], -len(kv[0]), names(kv[0])))
+    return {
+        'itemsets': [{
+            'devices': names(items),
+            'name': " + ".join(names(items)),
+            'support': count / num_racks,
+            'racks': count
+        } for items, count in ranked],
+        'rules': [{
+            'antecedent': names(rule['antecedent']),
+            'consequent': names(rule['consequent']),
+            'support': rule['support'],
+            'confidence': rule['confidence'],
+            'lift': rule['lift']
+        } for rule in association_rules(itemsets, num_racks, min_confidence)]
+    }
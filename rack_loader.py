@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Rack Loader - Parallel loading of *_analysis.json rack files
+
+Files are read on a thread pool so file opens and reads overlap, and parsed
+with orjson when it is installed (falling back to the standard json module).
+Per-file failures are collected instead of aborting the whole load.
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:  # optional faster backend
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+def loads(data):
+    """Parse JSON bytes with the fastest available backend"""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def read_json(path):
+    """Read and parse a single JSON file with the fastest available backend"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def _load_batch(paths):
+    results = []
+    for path in paths:
+        try:
+            results.append((read_json(path), None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+
+def print_progress(done, total):
+    """Default progress reporter: one line per 10% of the folder"""
+    step = max(total // 10, 1)
+    if done == total or done // step != (done - 1) // step:
+        print(f"   Loaded {done}/{total} files ({done / total * 100:.0f}%)")
+
+
+class LoadResult:
+    def __init__(self, paths, racks, errors, elapsed):
+        self.paths = paths        # paths of the successfully loaded files, in rack order
+        self.racks = racks
+        self.errors = errors      # list of (path, exception)
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return (f"LoadResult(racks={len(self.racks)}, errors={len(self.errors)}, "
+                f"elapsed={self.elapsed:.3f}s)")
+
+
+def load_json_folder(json_folder, pattern="*_analysis.json", max_workers=None, progress=None,
+                     batch_size=128):
+    """Load every JSON file matching pattern in json_folder.
+
+    Args:
+        json_folder: Folder containing the analysis JSON files
+        pattern (str): Glob pattern for the files to load
+        max_workers (int): Thread pool size (None picks a default, 1 loads sequentially)
+        progress: Optional callable(done, total) called as files complete
+        batch_size (int): Files handed to a worker at a time
+
+    Returns:
+        LoadResult: racks in glob order plus the aggregated per-file errors
+    """
+    start = time.perf_counter()
+    paths = list(Path(json_folder).glob(pattern))
+    total = len(paths)
+
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+
+    batches = [paths[i:i + batch_size] for i in range(0, total, batch_size)]
+    if max_workers <= 1 or len(batches) < 2:
+        executor = None
+        results = map(_load_batch, batches)
+    else:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        results = executor.map(_load_batch, batches)
+
+    loaded_paths, racks, errors = [], [], []
+    done = 0
+    try:
+        for batch, batch_results in zip(batches, results):
+            for path, (rack, error) in zip(batch, batch_results):
+                if error is None:
+                    loaded_paths.append(path)
+                    racks.append(rack)
+                else:
+                    errors.append((path, error))
+            done += len(batch)
+            if progress is not None:
+                progress(done, total)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return LoadResult(loaded_paths, racks, errors, time.perf_counter() - start)
+
+
+def _load_baseline(json_folder, pattern="*_analysis.json"):
+    """The original loader: sequential open + json.load per file"""
+    start = time.perf_counter()
+    racks = []
+    for file_path in Path(json_folder).glob(pattern):
+        try:
+            with open(file_path, 'r') as f:
+                racks.append(json.load(f))
+        except Exception:
+            pass
+    return time.perf_counter() - start
+
+
+def benchmark(json_folder, repeats=3):
+    """Compare the original sequential json loader with load_json_folder"""
+    print(f"\n⏱️  LOAD BENCHMARK: {json_folder} (backend: {JSON_BACKEND}, {os.cpu_count()} CPUs)")
+    print("=" * 50)
+
+    timings = {'baseline': min(_load_baseline(json_folder) for _ in range(repeats))}
+    for label, workers in (("sequential", 1), ("parallel", None)):
+        timings[label] = min(load_json_folder(json_folder, max_workers=workers).elapsed
+                             for _ in range(repeats))
+
+    for label, elapsed in timings.items():
+        speedup = timings['baseline'] / elapsed if elapsed > 0 else float('inf')
+        print(f"   {label:>10}: {elapsed * 1000:8.1f} ms  ({speedup:.2f}x)")
+
+    result = load_json_folder(json_folder)
+    print(f"   Files: {len(result.racks)} loaded, {len(result.errors)} errors")
+    return timings
+
+
+if __name__ == "__main__":
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else "alltheracks_analysis")
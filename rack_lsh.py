@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Rack LSH - MinHash / banded LSH index for approximate rack similarity
+
+Each rack is reduced to a set of shingles, its top-level device types plus
+the adjacent device bigrams of each chain, and summarized by a MinHash
+signature of num_perm values. Signatures are cut into bands; racks that
+agree on every value of at least one band land in the same bucket and become
+candidates. Candidates are then re-ranked by exact device-type Jaccard, the
+same score RackRecommendationEngine uses, so only recall is approximate.
+
+With b bands of r rows, two racks with shingle-Jaccard s become candidates
+with probability 1 - (1 - s**r)**b.
+"""
+
+import json
+import sys
+import time
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+_PRIME = np.uint64((1 << 61) - 1)
+
+
+def rack_shingles(rack):
+    """Device types and in-chain device bigrams of a rack's top-level chains"""
+    shingles = set()
+    for chain in rack.get('chains', []):
+        devices = [d['type'] for d in chain.get('devices', [])]
+        shingles.update(devices)
+        shingles.update(f"{a}→{b}" for a, b in zip(devices, devices[1:]))
+    return shingles
+
+
+def rack_device_types(rack):
+    return frozenset(d['type'] for chain in rack.get('chains', []) for d in chain.get('devices', []))
+
+
+def _jaccard(a, b):
+    union = len(a | b)
+    return len(a & b) / union if union else 0.0
+
+
+class MinHashLSHIndex:
+    # Removed rows are dropped once there are more of them than this and than live rows
+    COMPACT_MIN_REMOVED = 64
+
+    def __init__(self, num_perm=128, bands=32, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        # a * x + b stays below 2**64 for 32-bit shingle ids and 31-bit a, b
+        self._a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, num_perm, dtype=np.uint64)
+
+        self.keys = []             # use_case per row (None once removed)
+        self.device_sets = []      # exact device-type set per row, for re-ranking
+        self._signatures = []
+        self._row_ids = {}
+        self._buckets = [defaultdict(list) for _ in range(bands)]
+
+    def __len__(self):
+        return len(self._row_ids)
+
+    def __contains__(self, use_case):
+        return use_case in self._row_ids
+
+    def device_types(self, use_case):
+        """Exact device-type set of an indexed rack"""
+        return self.device_sets[self._row_ids[use_case]]
+
+    def signature(self, shingles):
+        """MinHash signature (num_perm uint64 values) of a set of shingle strings"""
+        if not shingles:
+            return np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        ids = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles),
+                          dtype=np.uint64, count=len(shingles))
+        hashes = (np.outer(ids, self._a) + self._b) % _PRIME
+        return hashes.min(axis=0)
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, use_case, rack=None, shingles=None, device_types=None):
+        """Insert (or replace) one rack; pass the rack dict or precomputed shingles/device types"""
+        if use_case in self._row_ids:
+            self.remove(use_case)
+        if shingles is None:
+            shingles = rack_shingles(rack)
+        if device_types is None:
+            device_types = rack_device_types(rack)
+
+        row = len(self.keys)
+        signature = self.signature(shingles)
+        self.keys.append(use_case)
+        self.device_sets.append(frozenset(device_types))
+        self._signatures.append(signature)
+        self._row_ids[use_case] = row
+        if device_types:  # racks without devices are never similar to anything
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band][key].append(row)
+        return row
+
+    def remove(self, use_case):
+        row = self._row_ids.pop(use_case, None)
+        if row is None:
+            return False
+        for band, key in enumerate(self._band_keys(self._signatures[row])):
+            bucket = self._buckets[band].get(key)
+            if bucket and row in bucket:
+                bucket.remove(row)
+        self.keys[row] = None
+        self.device_sets[row] = None
+        removed = len(self.keys) - len(self._row_ids)
+        if removed > max(self.COMPACT_MIN_REMOVED, len(self._row_ids)):
+            self.compact()
+        return True
+
+    def compact(self):
+        """Drop removed rows and renumber the rest (relative order, and so tie-breaks, kept)"""
+        live = [row for row, key in enumerate(self.keys) if key is not None]
+        self.keys = [self.keys[row] for row in live]
+        self.device_sets = [self.device_sets[row] for row in live]
+        self._signatures = [self._signatures[row] for row in live]
+        self._row_ids = {key: row for row, key in enumerate(self.keys)}
+        self._buckets = [defaultdict(list) for _ in range(self.bands)]
+        for row, signature in enumerate(self._signatures):
+            if self.device_sets[row]:
+                for band, key in enumerate(self._band_keys(signature)):
+                    self._buckets[band][key].append(row)
+
+    def candidates(self, signature):
+        """Rows sharing at least one band with the signature"""
+        rows = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            rows.update(self._buckets[band].get(key, ()))
+        return rows
+
+    def query(self, use_case=None, rack=None, limit=5):
+        """Approximate top-k racks by device-type Jaccard: [(use_case, similarity), ...]
+
+        Query by the use_case of an indexed rack, or by an arbitrary rack dict.
+        """
+        if rack is None:
+            row = self._row_ids.get(use_case)
+            if row is None:
+                return None
+            signature, device_types = self._signatures[row], self.device_sets[row]
+        else:
+            signature = self.signature(rack_shingles(rack))
+            device_types = rack_device_types(rack)
+            use_case = rack.get('use_case', use_case)
+        if not device_types:
+            return []
+
+        scored = []
+        for row in self.candidates(signature):
+            key = self.keys[row]
+            if key is None or key == use_case:
+                continue
+            similarity = _jaccard(device_types, self.device_sets[row])
+            if similarity > 0:
+                scored.append((similarity, row, key))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(key, similarity) for similarity, row, key in scored[:limit]]
+
+    @classmethod
+    def from_racks(cls, racks, **params):
+        index = cls(**params)
+        for rack in racks:
+            index.add(rack.get('use_case', 'Unknown'), rack)
+        return index
+
+    def save(self, path):
+        """Persist the index (signatures and metadata; buckets are rebuilt on load)"""
+        live = [row for row, key in enumerate(self.keys) if key is not None]
+        signatures = (np.stack([self._signatures[row] for row in live]) if live
+                      else np.empty((0, self.num_perm), dtype=np.uint64))
+        meta = {
+            'num_perm': self.num_perm, 'bands': self.bands, 'seed': self.seed,
+            'keys': [self.keys[row] for row in live],
+            'device_sets': [sorted(self.device_sets[row]) for row in live],
+        }
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, signatures=signatures,
+                                meta=np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            signatures = data['signatures']
+            meta = json.loads(data['meta'].tobytes().decode('utf-8'))
+        index = cls(num_perm=meta['num_perm'], bands=meta['bands'], seed=meta['seed'])
+        for key, device_types, signature in zip(meta['keys'], meta['device_sets'], signatures):
+            row = len(index.keys)
+            index.keys.append(key)
+            index.device_sets.append(frozenset(device_types))
+            index._signatures.append(signature)
+            index._row_ids[key] = row
+            if device_types:
+                for band, band_key in enumerate(index._band_keys(signature)):
+                    index._buckets[band][band_key].append(row)
+        return index
+
+
+def benchmark(json_folder, queries=200, limit=10, configs=((128, 16), (128, 32), (128, 64))):
+    """Recall@limit and per-query latency of LSH versus the exact bitset scan"""
+    from rack_recommendations import RackRecommendationEngine
+
+    engine = RackRecommendationEngine(json_folder)
+    racks = engine.analyzer.racks
+    bitsets = engine.bitsets
+    rng = np.random.default_rng(0)
+    sample = [engine.analyzer.use_cases[i]
+              for i in rng.choice(len(racks), size=min(queries, len(racks)), replace=False)]
+
+    start = time.perf_counter()
+    exact = {use_case: bitsets.most_similar(use_case, limit) for use_case in sample}
+    exact_ms = (time.perf_counter() - start) * 1000 / len(sample)
+
+    print(f"\n📐 LSH BENCHMARK: {len(racks)} racks, {len(sample)} queries, top {limit}")
+    print("=" * 60)
+    print(f"   {'exact':>14}: {exact_ms:7.3f} ms/query   recall 1.000")
+
+    for num_perm, bands in configs:
+        start = time.perf_counter()
+        index = MinHashLSHIndex.from_racks(racks, num_perm=num_perm, bands=bands)
+        build_s = time.perf_counter() - start
+
+        hits = total = 0
+        start = time.perf_counter()
+        for use_case in sample:
+            found = {key for key, _ in index.query(use_case, limit=limit)}
+            # Ties at the cut-off are interchangeable: count by similarity threshold
+            expected = exact[use_case]
+            if expected:
+                cutoff = expected[-1][1]
+                hits += sum(1 for key in found
+                            if _jaccard(index.device_sets[index._row_ids[key]],
+                                        index.device_sets[index._row_ids[use_case]]) >= cutoff)
+                total += len(expected)
+        lsh_ms = (time.perf_counter() - start) * 1000 / len(sample)
+        recall = hits / total if total else 1.0
+        label = f"lsh {num_perm}/{bands}"
+        print(f"   {label:>14}: {lsh_ms:7.3f} ms/query   recall {recall:.3f}   (build {build_s:.1f}s)")
+
+
+if __name__ == "__main__":
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else "alltheracks_analysis")
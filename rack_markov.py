@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Rack Markov - Next-device prediction from device transition tables
+
+For every order n = 1..max_order the corpus's chains (nested chains
+included) are scanned for n devices followed by one more, all in the same
+chain. The counts are stored per order as a compact CSR table:
+
+    contexts[n][context_key] -> row       (dict, O(1) lookup)
+    offsets[n][row]:offsets[n][row + 1]   slice of next_types / next_counts
+
+with each row's next devices sorted by descending count, so the top
+suggestions are a slice prefix. A context key is the context's device type
+codes read as a base-V number (V = number of device types).
+
+Lookups back off from the longest known context to shorter ones, then to the
+distribution of first devices (empty context) or overall device frequency.
+"""
+
+import numpy as np
+
+
+class DeviceTransitionModel:
+    def __init__(self, corpus, max_order=3):
+        self.corpus = corpus
+        self.max_order = max_order
+        self.num_types = max(len(corpus.device_types), 1)
+        types = corpus.device_type.astype(np.int64)
+        chains = corpus.device_chain
+
+        self.contexts, self.offsets, self.next_types, self.next_counts, self.totals = {}, {}, {}, {}, {}
+        for n in range(1, max_order + 1):
+            valid = np.flatnonzero(chains[:-n] == chains[n:]) if len(types) > n else np.empty(0, np.int64)
+            keys = np.zeros(len(valid), dtype=np.int64)
+            for j in range(n):
+                keys = keys * self.num_types + types[valid + j]
+            self._store(n, keys, types[valid + n])
+
+        # Order 0: first devices of chains, and overall device frequency
+        starts = corpus.chain_offsets[:-1][np.diff(corpus.chain_offsets) > 0]
+        self._store(0, np.zeros(len(starts), dtype=np.int64), types[starts])
+        self.frequency = np.bincount(types, minlength=self.num_types)
+
+    def _store(self, n, keys, next_types):
+        combined, counts = np.unique(keys * self.num_types + next_types, return_counts=True)
+        keys, next_types = combined // self.num_types, combined % self.num_types
+        order = np.lexsort((next_types, -counts, keys))
+        keys, next_types, counts = keys[order], next_types[order], counts[order]
+
+        row_start = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.empty(0, np.int64)
+        self.contexts[n] = dict(zip(keys[row_start].tolist(), range(len(row_start))))
+        self.offsets[n] = np.append(row_start, len(keys)).astype(np.int64)
+        self.next_types[n] = next_types.astype(np.int32)
+        self.next_counts[n] = counts.astype(np.int32)
+        self.totals[n] = np.add.reduceat(counts, row_start) if len(row_start) else np.empty(0, np.int64)
+
+    def _key(self, codes):
+        key = 0
+        for code in codes:
+            key = key * self.num_types + code
+        return key
+
+    def _row(self, previous_devices):
+        """(order, row) of the longest known context ending the given device sequence, or None"""
+        codes = [self.corpus.type_ids.get(t) for t in previous_devices]
+        if not codes:
+            row = self.contexts[0].get(0)
+            return (0, row) if row is not None else None
+        for n in range(min(self.max_order, len(codes)), 0, -1):
+            context = codes[-n:]
+            if None in context:
+                continue
+            row = self.contexts[n].get(self._key(context))
+            if row is not None:
+                return n, row
+        return None
+
+    def next_devices(self, previous_devices, limit=5):
+        """Most likely next devices: ([(device type, probability), ...], context order used)
+
+        Order -1 means no context matched and overall device frequency was used.
+        """
+        found = self._row(previous_devices)
+        if found is None:
+            total = self.frequency.sum()
+            top = np.argsort(-self.frequency, kind='stable')[:limit]
+            return [(self.corpus.device_types[t], float(self.frequency[t] / total))
+                    for t in top if self.frequency[t]], -1
+        n, row = found
+        start = self.offsets[n][row]
+        end = min(self.offsets[n][row + 1], start + limit)
+        total = self.totals[n][row]
+        return [(self.corpus.device_types[t], float(c / total))
+                for t, c in zip(self.next_types[n][start:end], self.next_counts[n][start:end])], n
+
+    def probability(self, previous_devices, device_type):
+        """P(device_type | previous_devices) under the backed-off context"""
+        found = self._row(previous_devices)
+        code = self.corpus.type_ids.get(device_type)
+        if code is None:
+            return 0.0
+        if found is None:
+            total = self.frequency.sum()
+            return float(self.frequency[code] / total) if total else 0.0
+        n, row = found
+        start, end = self.offsets[n][row], self.offsets[n][row + 1]
+        hit = np.flatnonzero(self.next_types[n][start:end] == code)
+        return float(self.next_counts[n][start + hit[0]] / self.totals[n][row]) if len(hit) else 0.0
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Rack N-grams - Frequent device sequence mining over a RackCorpus
+
+Counts every run of n consecutive devices (n = min_n..max_n) in every chain,
+nested chains included, without building strings. Each window is reduced to
+an integer with a rolling hash, h(n) = h(n-1) * base + type, using base =
+number of device types + 1, so the hash is an exact encoding as long as
+base**n fits in 64 bits (n up to ~9 for 100 device types) and degrades to a
+regular 64-bit hash beyond that.
+
+Level n only looks at windows whose (n-1)-prefix and (n-1)-suffix were both
+frequent at level n-1 (Apriori pruning), so the working set shrinks quickly
+and memory stays O(number of devices).
+"""
+
+import numpy as np
+
+
+def mine_device_ngrams(corpus, min_n=2, max_n=6, min_support=2, include_nested=True):
+    """Find device sequences that occur at least min_support times.
+
+    Args:
+        corpus: RackCorpus to mine
+        min_n (int): Shortest sequence length to report
+        max_n (int): Longest sequence length to mine
+        min_support (int): Minimum number of occurrences
+        include_nested (bool): Also mine chains inside nested racks
+
+    Returns:
+        dict: n -> list of {'devices', 'workflow', 'occurrences', 'racks'},
+              most frequent first
+    """
+    num_devices = corpus.num_devices
+    base = np.uint64(len(corpus.device_types) + 1)
+    codes = corpus.device_type.astype(np.uint64) + np.uint64(1)
+    chain = corpus.device_chain
+    device_rack = corpus.chain_rack[chain].astype(np.int64)
+
+    # Level 1: every single device is a candidate
+    frequent = np.ones(num_devices, dtype=bool)
+    if not include_nested:
+        frequent &= corpus.chain_depth[chain] == 0
+    hashes = codes.copy()
+
+    results = {}
+    for n in range(2, max_n + 1):
+        starts = num_devices - n + 1
+        if starts <= 0:
+            break
+
+        # Window i..i+n-1 lies in one chain, and both of its (n-1)-grams are frequent
+        candidates = (chain[:starts] == chain[n - 1:]) & frequent[:starts] & frequent[1:starts + 1]
+        hashes = hashes[:starts] * base + codes[n - 1:]
+        positions = np.flatnonzero(candidates)
+        if len(positions) == 0:
+            break
+
+        unique, first_seen, inverse, counts = np.unique(
+            hashes[positions], return_index=True, return_inverse=True, return_counts=True
+        )
+        keep = counts >= min_support
+        frequent = np.zeros(starts, dtype=bool)
+        frequent[positions] = keep[inverse]
+        if not keep.any():
+            break
+
+        if n >= min_n:
+            results[n] = _describe(corpus, codes, positions, unique, first_seen, inverse,
+                                   counts, keep, device_rack, n)
+
+    return results
+
+
+def _describe(corpus, codes, positions, unique, first_seen, inverse, counts, keep, device_rack, n):
+    """Decode the frequent n-grams of one level into report entries"""
+    # Distinct racks per n-gram: unique (n-gram, rack) pairs
+    surviving = keep[inverse]
+    num_racks = corpus.num_racks
+    pairs = np.unique(inverse[surviving].astype(np.int64) * num_racks
+                      + device_rack[positions[surviving]])
+    rack_counts = np.bincount(pairs // num_racks, minlength=len(unique))
+
+    frequent_ids = np.flatnonzero(keep)
+    order = frequent_ids[np.lexsort((first_seen[frequent_ids], -counts[frequent_ids]))]
+
+    ngrams = []
+    for gram in order:
+        start = positions[first_seen[gram]]
+        devices = [corpus.device_types[int(code) - 1] for code in codes[start:start + n]]
+        ngrams.append({
+            'devices': devices,
+            'workflow': " → ".join(devices),
+            'occurrences': int(counts[gram]),
+            'racks': int(rack_counts[gram])
+        })
+    return ngrams
@@ -4,79 +4,231 @@ Rack Recommendation Engine - Practical applications of the rack data
 """
 
 import json
+import threading
 from pathlib import Path
 from collections import defaultdict
 import random
 
+import numpy as np
+
 # Import the analyzer class
 from rack_analyzer import RackAnalyzer
+from rack_cache import LRUCache, cached_method
+from rack_lsh import MinHashLSHIndex
+from rack_markov import DeviceTransitionModel
+from rack_similarity import DeviceBitsetIndex
+from rack_text_index import RackTextIndex
+from rack_tfidf import TfidfIndex
 
 class RackRecommendationEngine:
-    def __init__(self, json_folder_path):
+    def __init__(self, json_folder_path, lsh_path=None, cache_size=256):
         self.analyzer = RackAnalyzer(json_folder_path)
+        self.cache = LRUCache(maxsize=cache_size)  # results keyed on analyzer.version
+        self.lsh_path = Path(lsh_path) if lsh_path else None
+        self._indexes = {}  # name -> (index, analyzer version it was built for)
+        self._lsh_index = None
+        self._lsh_version = None
+        self._lock = threading.RLock()  # lazy indexes are built once even with concurrent readers
     
-    def recommend_similar_racks(self, target_use_case, limit=5):
-        """Recommend racks similar to a given use case"""
-        target_rack = None
-        for rack in self.analyzer.racks:
-            if rack['use_case'] == target_use_case:
-                target_rack = rack
-                break
+    def _index(self, name, build):
+        """Index built by build(corpus) on first use and again whenever the analyzer's racks change"""
+        with self._lock:
+            index, version = self._indexes.get(name, (None, None))
+            if index is None or version != self.analyzer.version:
+                index = build(self.analyzer.corpus)
+                self._indexes[name] = (index, self.analyzer.version)
+            return index
+    
+    @property
+    def bitsets(self):
+        """Packed device bitsets"""
+        return self._index('bitsets', DeviceBitsetIndex)
+    
+    @property
+    def text_index(self):
+        """Token/prefix index over use case, chain and macro names"""
+        return self._index('text', RackTextIndex)
+    
+    @property
+    def transitions(self):
+        """Order 1-3 device transition tables over every chain, nested chains included"""
+        return self._index('transitions', DeviceTransitionModel)
+    
+    def tfidf(self, level='rack'):
+        """Sparse TF-IDF vectors per rack or per chain"""
+        return self._index(('tfidf', level), lambda corpus: TfidfIndex(corpus, level=level))
+    
+    @property
+    def lsh_index(self):
+        """MinHash/LSH index for approximate similarity (loaded from lsh_path or built on first use)"""
+        with self._lock:
+            if self._lsh_index is None and self.lsh_path and self.lsh_path.exists():
+                self._lsh_index = MinHashLSHIndex.load(self.lsh_path)
+                # Only trust the saved index if it covers exactly the loaded racks
+                if set(self._lsh_index.keys) == set(self.analyzer.use_cases):
+                    self._lsh_version = self.analyzer.version
+            if self._lsh_index is None or self._lsh_version != self.analyzer.version:
+                self._lsh_index = MinHashLSHIndex.from_racks(self.analyzer.racks)
+                self._lsh_version = self.analyzer.version
+            return self._lsh_index
+    
+    def build_indexes(self):
+        """Build every lazy index now, e.g. before serving queries from several threads; returns them"""
+        with self._lock:
+            return (self.analyzer.positions, self.analyzer.chain_search, self.bitsets, self.text_index,
+                    self.transitions, self.tfidf('rack'), self.tfidf('chain'), self.lsh_index)
+    
+    def save_lsh_index(self, path=None):
+        """Persist the LSH index so later engines can load it instead of rebuilding"""
+        path = Path(path) if path else self.lsh_path
+        self.lsh_index.save(path)
+        return path
+    
+    def add_rack(self, rack_data):
+        """Add a rack to the analyzer and insert it into the LSH index incrementally"""
+        with self._lock:
+            in_sync = self._lsh_index is not None and self._lsh_version == self.analyzer.version
+            position = self.analyzer.add_rack(rack_data)
+            if in_sync:
+                rack = self.analyzer.racks[position]
+                self._lsh_index.add(rack.get('use_case', 'Unknown'), rack)
+                self._lsh_version = self.analyzer.version
+            return position
+    
+    def remove_rack(self, use_case):
+        """Remove a rack from the analyzer and the LSH index"""
+        with self._lock:
+            in_sync = self._lsh_index is not None and self._lsh_version == self.analyzer.version
+            removed = self.analyzer.remove_rack(use_case)
+            if in_sync and removed is not None:
+                if not self.analyzer.has_rack(use_case):
+                    self._lsh_index.remove(use_case)
+                self._lsh_version = self.analyzer.version
+            return removed
+    
+    @cached_method
+    def recommend_similar_racks(self, target_use_case, limit=5, scorer='jaccard'):
+        """Recommend racks similar to a given use case
         
-        if not target_rack:
+        scorer: 'jaccard' for the exact scan, 'lsh' for the approximate MinHash index,
+        'tfidf' for cosine over TF-IDF weighted device types and device bigrams
+        """
+        if scorer == 'lsh':
+            # Answered from the index alone, so it stays incremental across add_rack/remove_rack
+            index = self.lsh_index
+            if target_use_case not in index:
+                return f"Rack '{target_use_case}' not found"
+            target_devices = index.device_types(target_use_case)
+            similar_racks = []
+            for use_case, similarity in index.query(target_use_case, limit=limit):
+                rack = self.analyzer.racks[self.analyzer.positions[use_case][0]]
+                similar_racks.append({
+                    'use_case': use_case,
+                    'similarity': similarity,
+                    'shared_devices': sorted(target_devices & index.device_types(use_case)),
+                    'device_count': sum(len(chain.get('devices', [])) for chain in rack.get('chains', []))
+                })
+            return similar_racks
+        
+        bitsets = self.bitsets
+        if target_use_case not in bitsets.rack_ids:
             return f"Rack '{target_use_case}' not found"
         
-        # Get devices from target rack
-        target_devices = set()
-        for chain in target_rack.get('chains', []):
-            for device in chain.get('devices', []):
-                target_devices.add(device['type'])
+        if scorer == 'jaccard':
+            matches = bitsets.most_similar(target_use_case, limit)
+        elif scorer == 'tfidf':
+            target = bitsets.rack_ids[target_use_case]
+            matches = self.tfidf('rack').most_similar(target, limit,
+                                                      exclude=bitsets.use_case_codes == target)
+        else:
+            raise ValueError(f"Unknown scorer: {scorer}")
         
-        # Find racks with similar devices
+        device_types = self.analyzer.corpus.device_types
+        target = bitsets.rack_ids[target_use_case]
         similar_racks = []
-        for rack in self.analyzer.racks:
-            if rack['use_case'] == target_use_case:
-                continue
-                
-            rack_devices = set()
-            for chain in rack.get('chains', []):
-                for device in chain.get('devices', []):
-                    rack_devices.add(device['type'])
-            
-            # Calculate similarity (Jaccard index)
-            if target_devices and rack_devices:
-                intersection = len(target_devices & rack_devices)
-                union = len(target_devices | rack_devices)
-                similarity = intersection / union
-                
-                if similarity > 0:
-                    similar_racks.append({
-                        'use_case': rack['use_case'],
-                        'similarity': similarity,
-                        'shared_devices': list(target_devices & rack_devices),
-                        'device_count': sum(len(chain.get('devices', [])) for chain in rack.get('chains', []))
-                    })
-        
-        # Sort by similarity and return top results
-        similar_racks.sort(key=lambda x: x['similarity'], reverse=True)
-        return similar_racks[:limit]
+        for rack, similarity in matches:
+            similar_racks.append({
+                'use_case': self.analyzer.corpus.use_cases[rack],
+                'similarity': similarity,
+                'shared_devices': [device_types[code] for code in bitsets.shared_types(target, rack)],
+                'device_count': int(bitsets.device_counts[rack])
+            })
+        
+        return similar_racks
     
+    def recommend_similar_chains(self, target_use_case, chain=0, limit=5):
+        """Chains anywhere in the corpus most similar (TF-IDF cosine) to a top-level chain of a rack"""
+        bitsets = self.bitsets
+        if target_use_case not in bitsets.rack_ids:
+            return f"Rack '{target_use_case}' not found"
+        
+        corpus = self.analyzer.corpus
+        rack = bitsets.rack_ids[target_use_case]
+        target = int(corpus.rack_chain_offsets[rack]) + chain
+        if chain < 0 or target >= corpus.rack_chain_offsets[rack + 1] or corpus.chain_parent[target] >= 0:
+            return f"Rack '{target_use_case}' has no chain {chain}"
+        
+        index = self.tfidf('chain')
+        same_rack = corpus.chain_rack == rack
+        similar_chains = []
+        for other, similarity in index.most_similar(target, limit, exclude=same_rack):
+            start, end = corpus.chain_offsets[other], corpus.chain_offsets[other + 1]
+            similar_chains.append({
+                'use_case': corpus.use_cases[corpus.chain_rack[other]],
+                'chain_name': corpus.chain_names[other],
+                'chain_path': self.analyzer.device_index.chain_path(other),
+                'similarity': similarity,
+                'devices': [corpus.device_types[code] for code in corpus.device_type[start:end]]
+            })
+        
+        return similar_chains
+    
+    def suggest_next_devices(self, previous_devices, limit=5):
+        """Autocomplete: the devices most likely to follow a partial chain
+        
+        Uses the longest matching context of up to three previous devices.
+        """
+        suggestions, order = self.transitions.next_devices(previous_devices, limit)
+        return [{
+            'device': device,
+            'probability': probability,
+            'context': list(previous_devices[len(previous_devices) - order:]) if order > 0 else []
+        } for device, probability in suggestions]
+    
+    @cached_method
     def find_racks_for_genre(self, genre_keywords):
         """Find racks suitable for a specific genre"""
         matching_racks = []
         
-        for rack in self.analyzer.racks:
-            use_case = rack['use_case'].lower()
-            if any(keyword.lower() in use_case for keyword in genre_keywords):
-                device_count = sum(len(chain.get('devices', [])) for chain in rack.get('chains', []))
-                matching_racks.append({
-                    'use_case': rack['use_case'],
-                    'device_count': device_count,
-                    'macro_controls': len([m for m in rack.get('macro_controls', []) if m.get('name', '').strip()])
-                })
+        corpus = self.analyzer.corpus
+        matches = [self.text_index.contains(keyword) for keyword in genre_keywords]
+        racks = np.unique(np.concatenate(matches)) if matches else np.empty(0, dtype=np.int64)
+        device_counts = corpus.devices_per_rack()[racks].tolist()
+        macro_counts = corpus.named_macros_per_rack()[racks].tolist()
+        for rack, device_count, macro_count in zip(racks.tolist(), device_counts, macro_counts):
+            matching_racks.append({
+                'use_case': corpus.use_cases[rack],
+                'device_count': device_count,
+                'macro_controls': macro_count
+            })
         
         return sorted(matching_racks, key=lambda x: x['device_count'], reverse=True)
     
+    @cached_method
+    def search(self, query, mode='and', fields=('use_case', 'chain', 'macro'), prefix=True, limit=None):
+        """Keyword search over rack, chain and macro names
+        
+        mode='and' requires every token, mode='or' any; with prefix=True "comp"
+        matches "compressor". Results are in corpus order.
+        """
+        corpus = self.analyzer.corpus
+        device_counts = corpus.devices_per_rack()
+        return [{
+            'use_case': corpus.use_cases[rack],
+            'device_count': int(device_counts[rack])
+        } for rack in self.text_index.search(query, mode=mode, fields=fields, prefix=prefix)[:limit]]
+    
+    @cached_method
     def create_learning_path(self, start_simple=True):
         """Create a learning path from simple to complex racks"""
         rack_complexity = []
@@ -97,6 +249,7 @@ class RackRecommendationEngine:
         
         return rack_complexity
     
+    @cached_method
     def analyze_device_workflows(self):
         """Analyze common device workflow patterns"""
         workflows = defaultdict(list)
@@ -139,6 +292,13 @@ def main():
     else:
         print(f"   {similar}")
     
+    # Same query, weighting rare devices and device order with TF-IDF
+    print("\n   TF-IDF weighted:")
+    similar = engine.recommend_similar_racks("Channel Strip - Drumkit Pumpit", scorer='tfidf')
+    if isinstance(similar, list):
+        for i, rack in enumerate(similar, 1):
+            print(f"   {i}. {rack['use_case']} ({rack['similarity']:.2f})")
+    
     # Example 2: Genre-specific racks
     print("\n2️⃣ Racks for Electronic/Dance music:")
     electronic_racks = engine.find_racks_for_genre(['dance', 'electronic', 'beat', 'bass', 'drum'])
@@ -164,6 +324,11 @@ def main():
         print(f"      Used in {workflow['frequency']} racks")
         print(f"      Examples: {', '.join(workflow['example_racks'])}")
         print()
+    
+    # Example 5: Workflow autocomplete
+    print("\n5️⃣ After AutoFilter → Frequency, usually comes:")
+    for suggestion in engine.suggest_next_devices(['AutoFilter', 'Frequency'], limit=3):
+        print(f"   {suggestion['device']}: {suggestion['probability']:.0%}")
 
 if __name__ == "__main__":
     main()
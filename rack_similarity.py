@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Rack Similarity - Vectorized Jaccard similarity over packed device bitsets
+
+Each rack's set of (top-level) device types is stored as one row of a packed
+bit matrix, padded to whole 64-bit words. Similarity of one rack to every
+other rack is a single AND + popcount over the matrix:
+
+    |A ∩ B| = popcount(A & B)      |A ∪ B| = |A| + |B| - |A ∩ B|
+
+and the top-k rows are picked with a partial sort. blocked_top_k() does the
+same for every rack at once, a block of rows at a time, as matrix products.
+"""
+
+import numpy as np
+
+if hasattr(np, 'bitwise_count'):  # NumPy >= 2.0
+    def _popcount_rows(words):
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int64)
+else:
+    _POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount_rows(words):
+        return _POPCOUNT8[words.view(np.uint8)].sum(axis=1, dtype=np.int64)
+
+
+def top_k(scores, candidates, k):
+    """Indices from candidates with the k highest scores, ties broken by lower index"""
+    values = scores[candidates]
+    if k is not None and len(candidates) > k:
+        threshold = np.partition(values, len(values) - k)[len(values) - k]
+        above = candidates[values > threshold]
+        tied = candidates[values == threshold][:k - len(above)]
+        candidates = np.concatenate([above, tied])
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+class DeviceBitsetIndex:
+    def __init__(self, corpus):
+        self.corpus = corpus
+        num_racks = corpus.num_racks
+        num_types = len(corpus.device_types)
+
+        top_level = corpus.top_level_devices()
+        device_rack = corpus.chain_rack[corpus.device_chain[top_level]]
+        membership = np.zeros((num_racks, max(num_types, 1)), dtype=bool)
+        membership[device_rack, corpus.device_type[top_level]] = True
+
+        packed = np.packbits(membership, axis=1)
+        padded = np.zeros((num_racks, -(-packed.shape[1] // 8) * 8), dtype=np.uint8)
+        padded[:, :packed.shape[1]] = packed
+        self.membership = membership                     # (racks, types) bool
+        self.words = padded.view(np.uint64)              # (racks, words)
+        self.set_sizes = membership.sum(axis=1, dtype=np.int64)
+        self.device_counts = corpus.devices_per_rack()
+
+        self.rack_ids = {}
+        for rack, use_case in enumerate(corpus.use_cases):
+            self.rack_ids.setdefault(use_case, rack)
+        self.use_case_codes = np.array([self.rack_ids[u] for u in corpus.use_cases], dtype=np.int64)
+
+    def shared_types(self, rack, other):
+        """Device type codes present in both racks"""
+        shared = (self.words[rack] & self.words[other]).view(np.uint8)
+        return np.flatnonzero(np.unpackbits(shared)[:len(self.corpus.device_types)])
+
+    def jaccard(self, rack):
+        """Jaccard similarity between one rack and every rack"""
+        intersection = _popcount_rows(self.words & self.words[rack])
+        union = self.set_sizes + self.set_sizes[rack] - intersection
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(union > 0, intersection / np.maximum(union, 1), 0.0)
+
+    def most_similar(self, use_case, limit=5):
+        """(rack, similarity) pairs for the racks most similar to use_case, or None if unknown"""
+        rack = self.rack_ids.get(use_case)
+        if rack is None:
+            return None
+        if self.set_sizes[rack] == 0:
+            return []
+        scores = self.jaccard(rack)
+        candidates = np.flatnonzero((scores > 0) & (self.use_case_codes != rack))
+        return [(int(r), float(scores[r])) for r in top_k(scores, candidates, limit)]
+
+
+def _block_similarity(bitsets, membership, batch):
+    """Jaccard of the racks in batch against every rack, self/same-use-case pairs zeroed"""
+    intersection = (membership[batch] @ membership.T).astype(np.float64)
+    sizes = bitsets.set_sizes
+    union = sizes[batch, None] + sizes[None, :] - intersection
+    similarity = np.where(union > 0, intersection / np.maximum(union, 1), 0.0)
+    similarity[bitsets.use_case_codes[batch, None] == bitsets.use_case_codes[None, :]] = 0.0
+    similarity[sizes[batch] == 0] = 0.0
+    return similarity
+
+
+def _block_rows(num_racks, block_size, max_block_entries):
+    return block_size or max(1, max_block_entries // max(num_racks, 1))
+
+
+def similarity_rows(bitsets, rows, block_size=None, max_block_entries=1 << 24):
+    """Yield (rack, similarities to every rack) for the given racks, in bounded-memory blocks"""
+    membership = bitsets.membership.astype(np.float32)
+    rows = np.asarray(rows, dtype=np.int64)
+    block = _block_rows(len(membership), block_size, max_block_entries)
+    for start in range(0, len(rows), block):
+        batch = rows[start:start + block]
+        similarity = _block_similarity(bitsets, membership, batch)
+        for i, rack in enumerate(batch):
+            yield int(rack), similarity[i]
+
+
+def blocked_top_k(bitsets, k, rows=None, block_size=None, max_block_entries=1 << 24):
+    """Top-k neighbours of many racks with blocked matrix products.
+
+    Memory is bounded by block_size x number of racks similarity values
+    (max_block_entries when block_size is not given). Yields
+    (rack, [(neighbour, similarity), ...]) with the same ordering as
+    DeviceBitsetIndex.most_similar().
+    """
+    num_racks = len(bitsets.membership)
+    if rows is None:
+        rows = np.arange(num_racks)
+    rows = np.asarray(rows, dtype=np.int64)
+    if num_racks == 0 or k <= 0:
+        for rack in rows:
+            yield int(rack), []
+        return
+
+    membership = bitsets.membership.astype(np.float32)
+    # Distinct Jaccard values over T types differ by at least 1/T^2, so this
+    # offset breaks ties by lower rack index without reordering real scores.
+    num_types = max(membership.shape[1], 1)
+    tiebreak = np.arange(num_racks) * (0.5 / (num_types * num_types * (num_racks + 1)))
+    kk = min(k, num_racks)
+
+    block = _block_rows(num_racks, block_size, max_block_entries)
+    for start in range(0, len(rows), block):
+        batch = rows[start:start + block]
+        similarity = _block_similarity(bitsets, membership, batch)
+        keys = np.where(similarity > 0, similarity - tiebreak, -1.0)
+        best = np.argpartition(-keys, kk - 1, axis=1)[:, :kk]
+        order = np.argsort(-np.take_along_axis(keys, best, axis=1), axis=1, kind='stable')
+        best = np.take_along_axis(best, order, axis=1)
+        for i, rack in enumerate(batch):
+            yield int(rack), [(int(j), float(similarity[i, j])) for j in best[i] if keys[i, j] > 0]
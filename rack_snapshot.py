@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Rack Snapshot - Packed, memory-mappable snapshot of a rack JSON folder
+
+The whole corpus is written once to a single file next to the JSON folder
+(alltheracks_analysis -> alltheracks_analysis.racksnap) and memory-mapped on
+later runs, so RackAnalyzer, RackRecommendationEngine and RackDatabase don't
+have to re-open and re-parse every *_analysis.json file.
+
+File layout:
+
+    magic (8 bytes) | header length (uint64) | JSON header | sections...
+
+The header holds the manifest of source files (name, size, mtime) used for
+invalidation, and the offset/dtype/length of every section. Sections are
+64-byte aligned raw arrays: the RackCorpus columns, NUL-joined UTF-8 string
+tables, and the compact JSON of every rack (decoded lazily on access).
+"""
+
+import fnmatch
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+
+from rack_corpus import RackCorpus
+from rack_loader import load_json_folder, loads
+
+MAGIC = b"RACKSNP1"
+FORMAT_VERSION = 1
+SNAPSHOT_SUFFIX = ".racksnap"
+_PREAMBLE = struct.Struct("<8sQ")
+_ALIGN = 64
+
+
+def default_snapshot_path(json_folder):
+    """Snapshot file that sits next to the JSON folder"""
+    json_folder = Path(json_folder).resolve()
+    return json_folder.with_name(json_folder.name + SNAPSHOT_SUFFIX)
+
+
+def scan_folder(json_folder, pattern="*_analysis.json"):
+    """Sorted (name, size, mtime_ns) manifest of the source JSON files (empty if the folder is missing)"""
+    matches = re.compile(fnmatch.translate(pattern)).match
+    manifest = []
+    try:
+        entries = os.scandir(json_folder)
+    except (FileNotFoundError, NotADirectoryError):
+        return manifest  # like the glob it replaces: no files, no error
+    with entries:
+        for entry in entries:
+            if matches(entry.name) and entry.is_file():
+                stat = entry.stat()
+                manifest.append([entry.name, stat.st_size, stat.st_mtime_ns])
+    manifest.sort()
+    return manifest
+
+
+class SnapshotRacks(Sequence):
+    """Read-only list of rack dicts, decoded from the snapshot on first access"""
+
+    def __init__(self, buffer, offsets):
+        self._buffer = buffer
+        self._offsets = offsets
+        self._cache = [None] * (len(offsets) - 1)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        rack = self._cache[index]
+        if rack is None:
+            if index < 0:
+                index += len(self)
+            start, end = self._offsets[index], self._offsets[index + 1]
+            rack = self._cache[index] = loads(self._buffer[start:end])
+        return rack
+
+
+class RackSnapshot:
+    def __init__(self, racks, corpus, manifest, errors=(), path=None, from_snapshot=False):
+        self.racks = racks
+        self.corpus = corpus
+        self.manifest = manifest
+        self.errors = list(errors)   # list of (file name, message) from the original load
+        self.path = path
+        self.from_snapshot = from_snapshot  # False when the JSON folder had to be re-read
+
+    def is_current(self, json_folder, pattern="*_analysis.json"):
+        """True if no source JSON file was added, removed or modified since the snapshot"""
+        return scan_folder(json_folder, pattern) == self.manifest
+
+
+def write_snapshot(path, racks, corpus, manifest, errors=()):
+    """Write racks and their corpus to a snapshot file (atomically replaced)"""
+    sections = []   # (name, dtype, length, bytes)
+
+    for field in RackCorpus.ARRAY_FIELDS:
+        array = np.ascontiguousarray(getattr(corpus, field))
+        sections.append((field, array.dtype.str, len(array), array.tobytes()))
+
+    for field in RackCorpus.STRING_FIELDS:
+        blob = "\0".join(getattr(corpus, field)).encode("utf-8")
+        sections.append((field, "str", len(getattr(corpus, field)), blob))
+
+    blobs = [json.dumps(rack, separators=(",", ":")).encode("utf-8") for rack in racks]
+    rack_offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    np.cumsum([len(blob) for blob in blobs], out=rack_offsets[1:])
+    sections.append(("rack_offsets", rack_offsets.dtype.str, len(rack_offsets), rack_offsets.tobytes()))
+    sections.append(("rack_json", "|u1", int(rack_offsets[-1]), b"".join(blobs)))
+
+    # Section offsets are absolute, so they depend on the header's own length:
+    # grow the data start until the encoded header fits in front of it.
+    relative = {}
+    position = 0
+    for name, dtype, length, data in sections:
+        relative[name] = position
+        position += len(data) + (-len(data) % _ALIGN)
+
+    header = {
+        "version": FORMAT_VERSION,
+        "created": time.time(),
+        "manifest": manifest,
+        "errors": [[str(name), str(message)] for name, message in errors],
+        "sections": {},
+    }
+    data_start = 0
+    while True:
+        header["sections"] = {
+            name: {"dtype": dtype, "length": length, "nbytes": len(data),
+                   "offset": data_start + relative[name]}
+            for name, dtype, length, data in sections
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+        needed = _PREAMBLE.size + len(header_bytes)
+        needed += -needed % _ALIGN
+        if needed <= data_start:
+            break
+        data_start = needed
+
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")  # processes may write at once
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (data_start - f.tell()))
+        for name, dtype, length, data in sections:
+            f.write(data)
+            f.write(b"\0" * (-len(data) % _ALIGN))
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_snapshot(path):
+    """Memory-map a snapshot file; corpus arrays are zero-copy views into it"""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, header_length = _PREAMBLE.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a rack snapshot")
+    header = json.loads(buffer[_PREAMBLE.size:_PREAMBLE.size + header_length])
+    if header["version"] != FORMAT_VERSION:
+        raise ValueError(f"{path} has unsupported snapshot version {header['version']}")
+    end = max((info["offset"] + info["nbytes"] for info in header["sections"].values()), default=0)
+    if end > len(buffer):
+        raise ValueError(f"{path} is truncated ({len(buffer)} of {end} bytes)")
+
+    def section(name):
+        info = header["sections"][name]
+        if info["dtype"] == "str":
+            if info["length"] == 0:
+                return []
+            raw = buffer[info["offset"]:info["offset"] + info["nbytes"]]
+            return raw.decode("utf-8").split("\0")
+        return np.frombuffer(buffer, dtype=np.dtype(info["dtype"]),
+                             count=info["length"], offset=info["offset"])
+
+    fields = {name: section(name) for name in RackCorpus.ARRAY_FIELDS + RackCorpus.STRING_FIELDS}
+    corpus = RackCorpus(**fields)
+
+    rack_json = header["sections"]["rack_json"]["offset"]
+    rack_offsets = (section("rack_offsets") + rack_json).tolist()
+    racks = SnapshotRacks(buffer, rack_offsets)
+    return RackSnapshot(racks, corpus, header["manifest"], header["errors"],
+                        path=path, from_snapshot=True)
+
+
+def load_corpus(json_folder, snapshot_path=None, use_snapshot=True, **load_kwargs):
+    """Load racks and their corpus, going through the snapshot when possible.
+
+    The snapshot is reused if its manifest matches the folder; otherwise the
+    folder is re-read with load_json_folder() and the snapshot rewritten.
+
+    Returns:
+        RackSnapshot: racks, corpus and load errors (check .from_snapshot)
+    """
+    if not use_snapshot:
+        result = load_json_folder(json_folder, **load_kwargs)
+        corpus = RackCorpus.from_racks(result.racks)
+        errors = [(path.name, error) for path, error in result.errors]
+        return RackSnapshot(result.racks, corpus, None, errors)
+
+    snapshot_path = Path(snapshot_path) if snapshot_path else default_snapshot_path(json_folder)
+    manifest = scan_folder(json_folder)
+
+    if snapshot_path.exists():
+        try:
+            snapshot = read_snapshot(snapshot_path)
+            if snapshot.manifest == manifest:
+                return snapshot
+        except (ValueError, KeyError, OSError, struct.error) as e:  # struct.error: truncated preamble
+            print(f"Ignoring unreadable snapshot {snapshot_path}: {e}")
+
+    result = load_json_folder(json_folder, **load_kwargs)
+    corpus = RackCorpus.from_racks(result.racks)
+    errors = [(path.name, error) for path, error in result.errors]
+    if not Path(json_folder).is_dir():
+        # Nothing to snapshot; don't leave an empty snapshot next to a missing folder
+        return RackSnapshot(result.racks, corpus, manifest, errors)
+    try:
+        write_snapshot(snapshot_path, result.racks, corpus, manifest, errors)
+    except OSError as e:
+        print(f"Could not write snapshot {snapshot_path}: {e}")
+    return RackSnapshot(result.racks, corpus, manifest, errors, path=snapshot_path)
+
+
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else "alltheracks_analysis"
+
+    for attempt in ("First load", "Second load"):
+        start = time.perf_counter()
+        snapshot = load_corpus(folder)
+        source = "snapshot" if snapshot.from_snapshot else "JSON folder"
+        print(f"{attempt}: {len(snapshot.racks)} racks from {source} "
+              f"in {(time.perf_counter() - start) * 1000:.1f} ms")
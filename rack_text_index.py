@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Rack Text Index - Token inverted index with prefix lookups over rack names
+
+use_case names, chain names and macro names are lowercased and split into
+word tokens. Every field keeps a sorted token vocabulary and CSR postings
+(token id -> sorted rack ids). Because the vocabulary is sorted, all tokens
+sharing a prefix are a contiguous id range, found by walking a character
+trie, and their postings are one contiguous slice.
+
+Substring lookups ("drum" in "kickdrum", as find_racks_for_genre has always
+matched) use a sorted array of token suffixes: the suffixes starting with the
+keyword are again one contiguous range, found by binary search.
+
+    index.search("tape sat", mode='and', prefix=True)   # racks matching tape* AND sat*
+"""
+
+import bisect
+import re
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+
+FIELDS = ('use_case', 'chain', 'macro')
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+class PrefixTrie:
+    """Character trie over a sorted vocabulary; each node knows its id range"""
+
+    def __init__(self, sorted_terms):
+        self.root = {'': [0, len(sorted_terms)]}
+        for term_id, term in enumerate(sorted_terms):
+            node = self.root
+            for char in term:
+                node = node.setdefault(char, {})
+                node.setdefault('', [term_id, term_id])[1] = term_id + 1
+
+    def range(self, prefix):
+        """(lo, hi) ids of the terms starting with prefix"""
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return 0, 0
+        return tuple(node[''])
+
+
+class FieldIndex:
+    def __init__(self, rack_ids, texts):
+        token_lists = [tokenize(text) for text in texts]
+        self.vocabulary = sorted({token for tokens in token_lists for token in tokens})
+        token_ids = {token: i for i, token in enumerate(self.vocabulary)}
+
+        pairs = {(token_ids[token], rack) for rack, tokens in zip(rack_ids, token_lists) for token in tokens}
+        pairs = np.array(sorted(pairs), dtype=np.int64).reshape(-1, 2)
+        self.postings = pairs[:, 1]
+        self.offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs[:, 0], minlength=len(self.vocabulary)), out=self.offsets[1:])
+
+        self.trie = PrefixTrie(self.vocabulary)
+        suffixes = sorted((token[i:], token_id) for token_id, token in enumerate(self.vocabulary)
+                          for i in range(len(token)))
+        self._suffixes = [suffix for suffix, _ in suffixes]
+        self._suffix_tokens = np.array([token_id for _, token_id in suffixes], dtype=np.int64)
+
+    def _union(self, token_ids):
+        slices = [self.postings[self.offsets[t]:self.offsets[t + 1]] for t in token_ids]
+        return np.unique(np.concatenate(slices)) if slices else np.empty(0, dtype=np.int64)
+
+    def exact(self, token):
+        i = bisect.bisect_left(self.vocabulary, token)
+        if i < len(self.vocabulary) and self.vocabulary[i] == token:
+            return self.postings[self.offsets[i]:self.offsets[i + 1]]
+        return np.empty(0, dtype=np.int64)
+
+    def prefix(self, prefix):
+        """Racks with a token starting with prefix"""
+        lo, hi = self.trie.range(prefix)
+        return np.unique(self.postings[self.offsets[lo]:self.offsets[hi]])
+
+    def substring(self, fragment):
+        """Racks with a token containing fragment"""
+        lo = bisect.bisect_left(self._suffixes, fragment)
+        hi = bisect.bisect_left(self._suffixes, fragment + '\U0010ffff', lo)
+        return self._union(np.unique(self._suffix_tokens[lo:hi]))
+
+
+class RackTextIndex:
+    def __init__(self, corpus):
+        self.corpus = corpus
+        num_racks = corpus.num_racks
+        macro_rack = np.repeat(np.arange(num_racks), np.diff(corpus.macro_offsets))
+        named = corpus.macro_name >= 0
+        self.fields = {
+            'use_case': FieldIndex(range(num_racks), corpus.use_cases),
+            'chain': FieldIndex(corpus.chain_rack.tolist(), corpus.chain_names),
+            'macro': FieldIndex(macro_rack[named].tolist(),
+                                [corpus.macro_names[code] for code in corpus.macro_name[named]]),
+        }
+
+    def lookup(self, token, fields=FIELDS, match='prefix'):
+        """Sorted rack ids where any of the fields has a token matching ('exact', 'prefix', 'substring')"""
+        found = [getattr(self.fields[field], match)(token) for field in fields]
+        return np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+
+    def search(self, query, mode='and', fields=FIELDS, prefix=True):
+        """Sorted rack ids matching all (mode='and') or any (mode='or') of the query's tokens"""
+        tokens = tokenize(query) if isinstance(query, str) else [t for q in query for t in tokenize(q)]
+        if not tokens:
+            return np.empty(0, dtype=np.int64)
+        match = 'prefix' if prefix else 'exact'
+        combine = np.intersect1d if mode == 'and' else np.union1d
+        result = self.lookup(tokens[0], fields, match)
+        for token in tokens[1:]:
+            result = combine(result, self.lookup(token, fields, match))
+        return result
+
+    def contains(self, keyword):
+        """Sorted rack ids whose use_case contains keyword (case-insensitive substring)"""
+        keyword = keyword.lower()
+        pieces = tokenize(keyword)
+        if len(pieces) == 1 and pieces[0] == keyword:
+            return self.fields['use_case'].substring(keyword)
+
+        # Keywords spanning separators: narrow by each piece, then verify the text
+        candidates = np.arange(self.corpus.num_racks)
+        for piece in pieces:
+            candidates = np.intersect1d(candidates, self.fields['use_case'].substring(piece))
+        return np.array([r for r in candidates if keyword in self.corpus.use_cases[r].lower()],
+                        dtype=np.int64)
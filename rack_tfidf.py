@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Rack TF-IDF - Weighted, order-aware similarity over sparse term vectors
+
+Each rack (or chain) becomes a sparse vector over two kinds of terms: device
+types ("Reverb") and in-chain device bigrams ("EQ8 → Compressor2"), so chain
+order counts and not only which devices are present. Terms are weighted
+
+    tf-idf = (1 + log tf) * (1 + log((1 + N) / (1 + df)))
+
+and rows are L2-normalised, so a device found in nearly every rack (e.g.
+AudioBranchMixerDevice) contributes little while rare devices and rare
+orderings dominate. Cosine similarity is then a sparse matrix product: the
+matrix is kept in CSR (row -> terms) and CSC (term -> rows) form and a block
+of query rows is multiplied against the CSC postings.
+
+level='rack' uses each rack's top-level chains (like the Jaccard scorer);
+level='chain' gives one vector per chain, nested chains included.
+"""
+
+import numpy as np
+
+from rack_similarity import top_k
+
+
+def _compress(major, minor, values, num_major):
+    """CSR arrays (indptr, indices, data) from coordinates, duplicates summed"""
+    num_minor = int(minor.max()) + 1 if len(minor) else 1
+    keys, inverse = np.unique(major.astype(np.int64) * num_minor + minor, return_inverse=True)
+    data = np.bincount(inverse.ravel(), weights=values, minlength=len(keys))
+    indptr = np.zeros(num_major + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // num_minor, minlength=num_major), out=indptr[1:])
+    return indptr, keys % num_minor, data
+
+
+def _ranges(starts, lengths):
+    """Concatenation of arange(start, start + length) for each pair"""
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+
+
+class TfidfIndex:
+    def __init__(self, corpus, level='rack', bigrams=True):
+        if level not in ('rack', 'chain'):
+            raise ValueError(f"Unknown level: {level}")
+        self.corpus = corpus
+        self.level = level
+        num_types = len(corpus.device_types)
+
+        if level == 'rack':
+            devices = corpus.top_level_devices()
+            self.num_rows = corpus.num_racks
+        else:
+            devices = np.arange(corpus.num_devices)
+            self.num_rows = corpus.num_chains
+        types = corpus.device_type[devices].astype(np.int64)
+        chains = corpus.device_chain[devices]
+        owner = corpus.chain_rack[chains] if level == 'rack' else chains
+
+        # Term ids: device types first, then bigram a*T + b offset past them
+        row_terms = [owner, types]
+        if bigrams:
+            same_chain = chains[:-1] == chains[1:]
+            row_terms = [np.concatenate([owner, owner[:-1][same_chain]]),
+                         np.concatenate([types, num_types + types[:-1][same_chain] * num_types
+                                         + types[1:][same_chain]])]
+        rows, raw_terms = row_terms
+
+        # Compact the vocabulary to terms that occur
+        self.term_codes, terms = np.unique(raw_terms, return_inverse=True)
+        terms = terms.ravel()
+        self._num_types = num_types
+        num_terms = len(self.term_codes)
+
+        indptr, indices, counts = _compress(rows, terms, np.ones(len(rows)), self.num_rows)
+        document_frequency = np.bincount(indices, minlength=num_terms)
+        self.idf = 1.0 + np.log((1.0 + self.num_rows) / (1.0 + document_frequency))
+
+        data = (1.0 + np.log(counts)) * self.idf[indices]
+        row_of = np.repeat(np.arange(self.num_rows), np.diff(indptr))
+        norms = np.sqrt(np.bincount(row_of, weights=data * data, minlength=self.num_rows))
+        data /= np.maximum(norms, 1e-12)[row_of]
+
+        # CSR (row -> terms) and CSC (term -> rows) views of the same matrix
+        self.indptr, self.indices, self.data = indptr, indices, data
+        self.col_indptr, self.col_rows, self.col_data = _compress(indices, row_of, data, num_terms)
+
+    def term(self, term):
+        """Readable label of a term id"""
+        code = int(self.term_codes[term])
+        types = self.corpus.device_types
+        if code < self._num_types:
+            return types[code]
+        code -= self._num_types
+        return f"{types[code // self._num_types]} → {types[code % self._num_types]}"
+
+    def vector(self, row):
+        """(term ids, weights) of one row"""
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def top_terms(self, row, limit=5):
+        """The highest-weighted terms of a row: [(label, weight), ...]"""
+        terms, weights = self.vector(row)
+        order = np.argsort(-weights, kind='stable')[:limit]
+        return [(self.term(terms[i]), float(weights[i])) for i in order]
+
+    def cosine(self, rows):
+        """Dense (len(rows), num_rows) cosine similarities: sparse rows x CSC product"""
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.int64))
+        row_lengths = self.indptr[rows + 1] - self.indptr[rows]
+        query_of = np.repeat(np.arange(len(rows)), row_lengths)
+        positions = _ranges(self.indptr[rows], row_lengths)
+        terms, weights = self.indices[positions], self.data[positions]
+
+        # Expand every query term into its posting list and accumulate
+        lengths = self.col_indptr[terms + 1] - self.col_indptr[terms]
+        posting = _ranges(self.col_indptr[terms], lengths)
+        targets = np.repeat(query_of, lengths) * self.num_rows + self.col_rows[posting]
+        products = np.repeat(weights, lengths) * self.col_data[posting]
+        scores = np.bincount(targets, weights=products, minlength=len(rows) * self.num_rows)
+        return np.minimum(scores.reshape(len(rows), self.num_rows), 1.0)
+
+    def most_similar(self, row, limit=5, exclude=None):
+        """(row, cosine) pairs most similar to row, ties by lower row; exclude is a boolean mask"""
+        if self.indptr[row] == self.indptr[row + 1]:
+            return []
+        scores = self.cosine(row)[0]
+        keep = scores > 0
+        keep[row] = False
+        if exclude is not None:
+            keep &= ~exclude
+        candidates = np.flatnonzero(keep)
+        return [(int(r), float(scores[r])) for r in top_k(scores, candidates, limit)]
@@ -0,0 +1,18 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from synthetic import make_racks, write_racks
+
+
+@pytest.fixture
+def racks():
+    return make_racks(150)
+
+
+@pytest.fixture
+def rack_folder(tmp_path, racks):
+    return write_racks(tmp_path / 'racks', racks)
@@ -0,0 +1,47 @@
+"""Synthetic rack analyses in the abletonRackAnalyzer JSON format"""
+
+import json
+import random
+from pathlib import Path
+
+DEVICE_TYPES = ['Compressor2', 'AutoFilter', 'Reverb', 'Delay', 'Gate', 'Eq8', 'Saturator',
+                'Limiter', 'GlueCompressor', 'Utility', 'Chorus', 'Phaser']
+CATEGORIES = ['Channel Strip', 'Drum Bus', 'Vocal', 'Bass', 'Master']
+MACRO_NAMES = ['Dry/Wet', 'Drive', 'Tone', 'Width', '', 'Cutoff']
+
+
+def make_chain(rng, depth=0):
+    devices = []
+    for _ in range(rng.randint(0, 6)):
+        if depth < 2 and rng.random() < 0.1:
+            devices.append({'type': 'AudioEffectGroupDevice', 'name': 'Rack', 'is_on': True,
+                            'chains': [make_chain(rng, depth + 1) for _ in range(rng.randint(1, 3))]})
+        else:
+            device_type = rng.choice(DEVICE_TYPES)
+            devices.append({'type': device_type, 'name': device_type, 'is_on': rng.random() > 0.1})
+    return {'name': rng.choice(['Main Chain', 'Low', 'High', '']), 'is_soloed': False, 'devices': devices}
+
+
+def make_rack(rng, index):
+    """Synthetic rack analysis dict in the abletonRackAnalyzer JSON format"""
+    use_case = f"{rng.choice(CATEGORIES)} - Rack {index}"
+    return {
+        'rack_name': use_case,
+        'use_case': use_case,
+        'macro_controls': [{'name': rng.choice(MACRO_NAMES), 'value': rng.random() * 127, 'index': i}
+                           for i in range(rng.randint(0, 8))],
+        'chains': [make_chain(rng) for _ in range(rng.randint(1, 4))]
+    }
+
+
+def make_racks(count, seed=0):
+    rng = random.Random(seed)
+    return [make_rack(rng, i) for i in range(count)]
+
+
+def write_racks(folder, racks):
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    for i, rack in enumerate(racks):
+        (folder / f"r{i:05d}_analysis.json").write_text(json.dumps(rack))
+    return folder
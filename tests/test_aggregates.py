@@ -0,0 +1,37 @@
+from collections import Counter
+
+from rack_analyzer import RackAnalyzer
+
+
+def racks_per_category(p):
+    return Counter(p.corpus.categories[code] for code in p.corpus.rack_category)
+
+
+def distinct_types(p):
+    return {p.corpus.device_types[code] for code in p.top_types}  # a set: not mergeable
+
+
+def test_custom_aggregate(rack_folder, racks):
+    analyzer = RackAnalyzer(rack_folder)
+    analyzer.register_aggregate('racks_per_category', racks_per_category,
+                                finalize=lambda state: sorted(state.items()))
+    assert analyzer.aggregate()['racks_per_category'] == \
+        sorted(Counter(r['use_case'].split(' - ')[0] for r in racks).items())
+
+    analyzer.add_rack(dict(racks[0], use_case='Fresh - One'))
+    analyzer.remove_rack(racks[1]['use_case'])
+    merged = analyzer.aggregate()
+    assert merged.states['racks_per_category']['Fresh'] == 1
+    assert merged.states == analyzer.aggregator.run(analyzer.corpus).states
+
+
+def test_unmergeable_aggregate_is_recomputed(rack_folder, racks):
+    analyzer = RackAnalyzer(rack_folder)
+    analyzer.register_aggregate('distinct_types', distinct_types)
+    assert 'distinct_types' in analyzer.aggregate()
+
+    analyzer.add_rack({'use_case': 'Odd - One', 'chains': [{'name': 'A', 'devices': [{'type': 'Oddity'}]}]})
+    assert analyzer._aggregates is None  # dropped instead of merged
+    assert 'Oddity' in analyzer.aggregate()['distinct_types']
+    analyzer.remove_rack('Odd - One')
+    assert 'Oddity' not in analyzer.aggregate()['distinct_types']
@@ -0,0 +1,53 @@
+from rack_cache import LRUCache, cached_method
+from rack_recommendations import RackRecommendationEngine
+
+
+class Owner:
+    def __init__(self):
+        self.cache = LRUCache(maxsize=2)
+        self.analyzer = self
+        self.version = 0
+        self.calls = 0
+
+    @cached_method
+    def result(self, key):
+        self.calls += 1
+        return [{'key': key, 'items': [1, 2]}]
+
+
+def test_cached_method_hands_out_copies():
+    owner = Owner()
+    first = owner.result('a')
+    first[0]['items'].append(3)
+    second = owner.result('a')
+    assert second == [{'key': 'a', 'items': [1, 2]}]
+    second[0]['key'] = 'changed'
+    assert owner.result('a')[0]['key'] == 'a'
+    assert owner.calls == 1
+
+
+def test_cached_method_invalidated_by_version():
+    owner = Owner()
+    owner.result('a')
+    owner.version += 1
+    owner.result('a')
+    assert owner.calls == 2
+
+
+def test_lru_eviction():
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+    assert cache.stats()['evictions'] == 1
+
+
+def test_engine_results_follow_rack_changes(rack_folder, racks):
+    engine = RackRecommendationEngine(rack_folder)
+    target = racks[0]['use_case']
+    before = engine.recommend_similar_racks(target, limit=3)
+    engine.remove_rack(before[0]['use_case'])
+    after = engine.recommend_similar_racks(target, limit=3)
+    assert before[0]['use_case'] not in [r['use_case'] for r in after]
@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from rack_analyzer import RackAnalyzer
+from rack_chain_search import ChainSearchIndex, banded_edit_distance
+from rack_corpus import RackCorpus
+
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        current = [i]
+        for j, y in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (x != y)))
+        previous = current
+    return previous[-1]
+
+
+def test_banded_edit_distance():
+    rng = random.Random(1)
+    for _ in range(500):
+        a = [rng.randrange(4) for _ in range(rng.randint(0, 8))]
+        b = [rng.randrange(4) for _ in range(rng.randint(0, 8))]
+        exact = edit_distance(a, b)
+        for max_distance in range(0, 10):
+            expected = exact if exact <= max_distance else max_distance + 1
+            assert banded_edit_distance(a, b, max_distance) == expected
+
+
+@pytest.mark.parametrize('include_nested', [True, False])
+def test_chain_search_matches_brute_force(racks, include_nested):
+    corpus = RackCorpus.from_racks(racks)
+    index = ChainSearchIndex(corpus)
+    chains = range(corpus.num_chains)
+    if not include_nested:
+        chains = [c for c in chains if corpus.chain_parent[c] < 0]
+
+    for query in (['Eq8', 'Compressor2'], ['Reverb', 'Delay', 'Reverb', 'Utility'], ['Unknown', 'Gate'], []):
+        codes = index.encode(query)
+        distances = sorted((edit_distance(codes, index.sequence(c)), c) for c in chains)
+        found = index.search(query, k=7, include_nested=include_nested)
+        assert found == [(c, d) for d, c in distances[:7]]
+        bounded = index.search(query, k=50, max_distance=1, include_nested=include_nested)
+        assert bounded == [(c, d) for d, c in distances if d <= 1][:50]
+
+
+def test_find_similar_chains_after_add_rack(rack_folder):
+    analyzer = RackAnalyzer(rack_folder)
+    query = ['Phaser', 'Chorus', 'Phaser', 'Limiter', 'Gate']
+    analyzer.find_similar_chains(query)
+    analyzer.add_rack({'use_case': 'Odd - Chain', 'chains': [
+        {'name': 'Outer', 'devices': [{'type': 'AudioEffectGroupDevice', 'chains': [
+            {'name': 'Exact', 'devices': [{'type': t} for t in query]}]}]}]})
+    best = analyzer.find_similar_chains(query, k=1)[0]
+    assert (best['use_case'], best['chain_name'], best['chain_path'], best['distance']) == \
+        ('Odd - Chain', 'Exact', (0, 0, 0), 0)
+    assert best['devices'] == query
+    assert all(match['distance'] > 0 for match in
+               analyzer.find_similar_chains(query, k=3, include_nested=False))
@@ -0,0 +1,46 @@
+import json
+import sqlite3
+
+from rack_database import RackDatabase
+
+from synthetic import make_racks
+
+
+def labels(db):
+    with sqlite3.connect(db.db_path) as conn:
+        return dict(conn.execute("SELECT use_case, cluster FROM rack_clusters").fetchall())
+
+
+def test_cluster_racks_on_an_empty_library(tmp_path):
+    (tmp_path / 'empty').mkdir()
+    db = RackDatabase(db_path=str(tmp_path / 'racks.db'), json_folder=str(tmp_path / 'empty'))
+    assert db.cluster_racks() is None
+    assert labels(db) == {}
+
+
+def test_cluster_racks_labels_only_new_racks(tmp_path, rack_folder, racks):
+    db_path = str(tmp_path / 'racks.db')
+    db = RackDatabase(db_path=db_path, json_folder=str(rack_folder))
+    model = db.cluster_racks(n_clusters=4)
+    first = labels(db)
+    assert set(first) == {rack['use_case'] for rack in racks}
+
+    # Pretend a label was edited: a reused model must leave existing labels alone
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE rack_clusters SET cluster = -1 WHERE use_case = ?", (racks[0]['use_case'],))
+    assert db.cluster_racks().to_json() == model.to_json()
+    assert labels(db)[racks[0]['use_case']] == -1
+
+    # New racks get labels and removed ones lose theirs when the database is refreshed
+    (rack_folder / 'r00001_analysis.json').unlink()
+    for i, rack in enumerate(make_racks(5, seed=3)):
+        rack['use_case'] = f"New {i}"
+        (rack_folder / f"new{i}_analysis.json").write_text(json.dumps(rack))
+    db = RackDatabase(db_path=db_path, json_folder=str(rack_folder))
+    current = labels(db)
+    assert racks[1]['use_case'] not in current
+    assert {f"New {i}" for i in range(5)} <= set(current)
+    assert current[racks[0]['use_case']] == -1
+
+    db.cluster_racks(refit=True)
+    assert labels(db)[racks[0]['use_case']] != -1
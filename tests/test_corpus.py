@@ -0,0 +1,60 @@
+import json
+
+from rack_analyzer import RackAnalyzer
+from rack_corpus import RackCorpus, rack_category
+from rack_database import RackDatabase
+from rack_recommendations import RackRecommendationEngine
+
+from synthetic import write_racks
+
+NESTED = {
+    'use_case': 'Drum Bus - Glue',
+    'macro_controls': [{'name': 'Drive', 'value': 10.0}, {'name': ' ', 'value': 0.0}],
+    'chains': [
+        {'name': 'Main', 'devices': [
+            {'type': 'Eq8'},
+            {'type': 'AudioEffectGroupDevice', 'chains': [
+                {'name': 'Inner', 'devices': [{'type': 'Reverb', 'is_on': False}]}]},
+            {'type': 'Compressor2'}]},
+        {'name': 'Side', 'devices': []},
+    ]
+}
+
+
+def test_rack_category():
+    assert rack_category('Drum Bus - Glue') == 'Drum Bus'
+    assert rack_category('Loose thing') == 'Loose'
+    assert rack_category('') == 'Unknown'
+    assert rack_category('   ') == 'Unknown'
+
+
+def test_from_racks_layout():
+    corpus = RackCorpus.from_racks([NESTED, {'use_case': 'Bass - Sub', 'chains': []}])
+    assert corpus.num_racks == 2 and corpus.num_chains == 3 and corpus.num_devices == 4
+    assert corpus.categories == ['Drum Bus', 'Bass']
+    assert corpus.chain_names == ['Main', 'Side', 'Inner']  # nested chains after the top level
+    assert corpus.rack_chain_offsets.tolist() == [0, 3, 3]
+    assert corpus.chain_offsets.tolist() == [0, 3, 3, 4]
+    assert corpus.chain_parent.tolist() == [-1, -1, 1]  # the group device's id
+    assert corpus.chain_depth.tolist() == [0, 0, 1]
+    assert [corpus.device_types[t] for t in corpus.device_type] == \
+        ['Eq8', 'AudioEffectGroupDevice', 'Compressor2', 'Reverb']
+    assert corpus.device_is_on.tolist() == [True, True, True, False]
+    assert corpus.macro_name.tolist() == [0, -1] and corpus.macro_names == ['Drive']
+    assert corpus.devices_per_rack().tolist() == [3, 0]
+
+
+def test_blank_use_case_loads(tmp_path, racks):
+    blank = dict(racks[0], use_case='')
+    spaces = dict(racks[1], use_case='   ')
+    folder = write_racks(tmp_path / 'racks', racks[2:20] + [blank, spaces])
+
+    analyzer = RackAnalyzer(folder)
+    assert len(analyzer.racks) == 20
+    assert 'Unknown' in analyzer.analyze_complexity_by_category()
+    engine = RackRecommendationEngine(folder)
+    assert engine.recommend_similar_racks(racks[2]['use_case']) is not None
+    db = RackDatabase(db_path=str(tmp_path / 'racks.db'), json_folder=str(folder))
+    assert db.count_racks() == 20
+    assert db.count_racks(category='Unknown') == 2
+    assert json.loads(json.dumps(db.get_statistics()))['total_racks'] == 20
@@ -0,0 +1,62 @@
+from rack_analyzer import RackAnalyzer
+from rack_corpus import RackCorpus
+from rack_index import DeviceIndex
+
+
+def walk(chains, path=()):
+    """(chain path, chain, position, device) for every device, nested chains included"""
+    for ordinal, chain in enumerate(chains):
+        for position, device in enumerate(chain.get('devices', [])):
+            yield path + (ordinal,), chain, position, device
+            yield from walk(device.get('chains', []), path + (ordinal, position))
+
+
+def rack_types(rack):
+    return {device['type'] for _, _, _, device in walk(rack['chains'])}
+
+
+def test_query_matches_brute_force(racks):
+    index = DeviceIndex(RackCorpus.from_racks(racks))
+    types = [rack_types(rack) for rack in racks]
+    queries = [
+        dict(all_of=['Reverb']),
+        dict(all_of=['Gate', 'Delay']),
+        dict(any_of=['Chorus', 'Phaser']),
+        dict(all_of=['Eq8'], any_of=['Limiter', 'Utility'], none_of=['Saturator']),
+        dict(none_of=['Compressor2', 'AudioEffectGroupDevice']),
+        dict(all_of=['Missing']),
+    ]
+    for query in queries:
+        expected = [i for i, found in enumerate(types)
+                    if set(query.get('all_of', ())) <= found
+                    and (not query.get('any_of') or found & set(query['any_of']))
+                    and not found & set(query.get('none_of', ()))]
+        assert index.query(**query).tolist() == expected, query
+
+
+def test_locations_follow_nested_paths(racks):
+    index = DeviceIndex(RackCorpus.from_racks(racks))
+    for device_type in ('Reverb', 'AudioEffectGroupDevice'):
+        expected = sorted((rack, path, position)
+                          for rack, data in enumerate(racks)
+                          for path, _, position, device in walk(data['chains'])
+                          if device['type'] == device_type)
+        assert sorted(index.locations(device_type)) == expected
+    assert any(len(path) > 1 for _, path, _ in index.locations('Reverb'))  # inside a nested rack
+
+
+def test_find_racks_with_device(rack_folder, racks):
+    analyzer = RackAnalyzer(rack_folder)
+    expected = {}
+    for data in analyzer.racks:
+        for path, chain, position, device in walk(data['chains']):
+            if device['type'] == 'Delay':
+                expected.setdefault((data['use_case'], path), (chain, position))
+    found = analyzer.find_racks_with_device('Delay')
+    assert len(found) == len(expected)
+    for match in found:
+        chain, position = expected[match['use_case'], match['chain_path']]
+        assert match['chain_name'] == chain['name']
+        assert match['total_devices'] == len(chain['devices'])
+        assert match['position'] == position
+    assert analyzer.find_racks_with_device('Missing') == []
@@ -0,0 +1,53 @@
+import numpy as np
+
+from rack_analyzer import RackAnalyzer
+from rack_corpus import RackCorpus
+
+from synthetic import make_racks, write_racks
+
+
+def assert_same_corpus(corpus, expected):
+    for field in RackCorpus.ARRAY_FIELDS:
+        a, b = getattr(corpus, field), getattr(expected, field)
+        if field in ('device_type', 'rack_category', 'macro_name'):
+            continue  # vocabulary codes depend on insertion order; compared by name below
+        assert np.array_equal(a, b), field
+    assert list(corpus.use_cases) == list(expected.use_cases)
+    assert [corpus.device_types[t] for t in corpus.device_type] == \
+        [expected.device_types[t] for t in expected.device_type]
+    assert [corpus.categories[c] for c in corpus.rack_category] == \
+        [expected.categories[c] for c in expected.rack_category]
+    assert [corpus.macro_names[m] for m in corpus.macro_name] == \
+        [expected.macro_names[m] for m in expected.macro_name]
+
+
+def assert_same_reports(analyzer, expected):
+    # Compare the mergeable states: the finalized top-N views may break ties differently
+    states, expected_states = analyzer.aggregate().states, expected.aggregate().states
+    assert states.keys() == expected_states.keys()
+    for name in states:
+        assert states[name] == expected_states[name], name
+
+
+def test_add_and_remove_match_a_fresh_load(tmp_path, rack_folder, racks):
+    analyzer = RackAnalyzer(rack_folder)
+    analyzer.aggregate()  # aggregates are then kept up to date incrementally
+    extra = make_racks(20, seed=7)
+    for i, rack in enumerate(extra):
+        rack['use_case'] = f"Extra {i}"
+        analyzer.add_rack(rack)
+    removed = [racks[i]['use_case'] for i in range(0, 150, 9)] + ['Extra 3', 'Extra 11']
+    for use_case in removed:
+        assert analyzer.remove_rack(use_case) is not None
+    assert analyzer.remove_rack('No such rack') is None
+
+    remaining = list(analyzer.racks)
+    assert sorted(r['use_case'] for r in remaining) == \
+        sorted(r['use_case'] for r in racks + extra if r['use_case'] not in removed)
+    assert_same_corpus(analyzer.corpus, RackCorpus.from_racks(remaining))
+
+    fresh = RackAnalyzer(write_racks(tmp_path / 'fresh', remaining))
+    assert_same_reports(analyzer, fresh)
+    for use_case in removed:
+        assert not analyzer.has_rack(use_case)
+
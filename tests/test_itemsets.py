@@ -0,0 +1,36 @@
+from collections import Counter
+from itertools import combinations
+
+from rack_corpus import RackCorpus
+from rack_itemsets import mine_device_sets, mine_frequent_itemsets, rack_device_sets
+
+
+def test_fp_growth_matches_brute_force():
+    transactions = [{'a', 'b', 'c'}, {'a', 'b'}, {'a', 'c', 'd'}, {'b', 'c'}, {'a', 'b', 'c', 'd'}, {'d'}, set()]
+    expected = Counter()
+    for items in transactions:
+        for size in range(1, len(items) + 1):
+            for subset in combinations(sorted(items), size):
+                expected[frozenset(subset)] += 1
+
+    for min_count in (1, 2, 3):
+        itemsets = mine_frequent_itemsets(transactions, min_count)
+        assert itemsets == {items: count for items, count in expected.items() if count >= min_count}
+    limited = mine_frequent_itemsets(transactions, 1, max_len=2)
+    assert limited == {items: count for items, count in expected.items() if len(items) <= 2}
+
+
+def test_device_sets_support_and_rules(racks):
+    corpus = RackCorpus.from_racks(racks)
+    sets = [set(types) for types in rack_device_sets(corpus)]
+    result = mine_device_sets(corpus, min_support=0.1, min_confidence=0.5)
+
+    for itemset in result['itemsets']:
+        codes = {corpus.type_ids[name] for name in itemset['devices']}
+        assert itemset['racks'] == sum(codes <= s for s in sets)
+        assert itemset['support'] >= 0.1
+    assert all(rule['confidence'] >= 0.5 for rule in result['rules'])
+
+
+def test_empty_corpus():
+    assert mine_device_sets(RackCorpus.from_racks([])) == {'itemsets': [], 'rules': []}
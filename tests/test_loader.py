@@ -0,0 +1,28 @@
+import json
+
+from rack_loader import load_json_folder
+
+
+def test_errors_are_collected(rack_folder, racks):
+    (rack_folder / 'broken_analysis.json').write_text('{"use_case": ')
+    (rack_folder / 'empty_analysis.json').write_text('')
+    (rack_folder / 'notes.txt').write_text('not matched by the pattern')
+
+    for workers in (1, 4):
+        result = load_json_folder(rack_folder, max_workers=workers, batch_size=16)
+        assert len(result.racks) == len(racks)
+        assert sorted(path.name for path, _ in result.errors) == \
+            ['broken_analysis.json', 'empty_analysis.json']
+        assert all(isinstance(error, ValueError) for _, error in result.errors)
+        assert [path.name for path in result.paths] == \
+            [path.name for path in rack_folder.glob('*_analysis.json')
+             if path.name not in ('broken_analysis.json', 'empty_analysis.json')]
+        assert [json.loads(path.read_bytes()) for path in result.paths] == result.racks
+
+
+def test_progress_reports_every_file(rack_folder, racks):
+    calls = []
+    load_json_folder(rack_folder, max_workers=2, batch_size=32,
+                     progress=lambda done, total: calls.append((done, total)))
+    assert calls[-1] == (len(racks), len(racks))
+    assert [done for done, _ in calls] == sorted(done for done, _ in calls)
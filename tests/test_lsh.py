@@ -0,0 +1,67 @@
+import random
+
+from rack_corpus import RackCorpus
+from rack_lsh import MinHashLSHIndex
+from rack_recommendations import RackRecommendationEngine
+from rack_similarity import DeviceBitsetIndex
+
+from synthetic import DEVICE_TYPES
+
+
+def near_duplicates(racks, variants=6, seed=2):
+    """Each rack plus variants with one device swapped, the kind of family LSH is meant to find"""
+    rng = random.Random(seed)
+    family = []
+    for rack in racks:
+        family.append(rack)
+        for v in range(variants):
+            chains = [dict(chain, devices=list(chain['devices'])) for chain in rack['chains']]
+            chain = rng.choice(chains)
+            if chain['devices']:
+                chain['devices'][rng.randrange(len(chain['devices']))] = {'type': rng.choice(DEVICE_TYPES)}
+            family.append(dict(rack, use_case=f"{rack['use_case']} v{v}", chains=chains))
+    return family
+
+
+def test_lsh_recall(racks):
+    racks = near_duplicates(racks[:40])
+    bitsets = DeviceBitsetIndex(RackCorpus.from_racks(racks))
+    index = MinHashLSHIndex.from_racks(racks)
+    hits = total = 0
+    for rack in racks[::7]:
+        expected = bitsets.most_similar(rack['use_case'], 5)
+        if not expected:
+            continue
+        # Ties at the cut-off are interchangeable: count by similarity, as rack_lsh.benchmark() does
+        cutoff = expected[-1][1]
+        hits += sum(similarity >= cutoff for _, similarity in index.query(rack['use_case'], limit=5))
+        total += len(expected)
+    assert total > 0
+    assert hits / total >= 0.8
+
+
+def test_lsh_remove_and_compact_match_fresh_index(racks):
+    index = MinHashLSHIndex.from_racks(racks)
+    removed = {rack['use_case'] for rack in racks[1:120:2]}
+    for use_case in removed:
+        index.remove(use_case)
+    fresh = MinHashLSHIndex.from_racks([rack for rack in racks if rack['use_case'] not in removed])
+
+    assert len(index) == len(fresh)
+    for rack in racks[::10]:
+        assert index.query(rack['use_case'], limit=10) == fresh.query(rack['use_case'], limit=10)
+    index.compact()
+    assert index.keys == fresh.keys
+
+
+def test_engine_keeps_the_lsh_index_in_step(rack_folder, racks):
+    engine = RackRecommendationEngine(rack_folder)
+    target = racks[0]['use_case']
+    engine.recommend_similar_racks(target, scorer='lsh')
+    for rack in racks[1:40]:
+        engine.remove_rack(rack['use_case'])
+    engine.add_rack(racks[5])
+
+    fresh = MinHashLSHIndex.from_racks(list(engine.analyzer.racks))
+    found = engine.recommend_similar_racks(target, limit=10, scorer='lsh')
+    assert [(r['use_case'], r['similarity']) for r in found] == fresh.query(target, limit=10)
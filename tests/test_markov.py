@@ -0,0 +1,91 @@
+from collections import Counter
+
+import pytest
+
+from rack_corpus import RackCorpus
+from rack_markov import DeviceTransitionModel
+from rack_recommendations import RackRecommendationEngine
+
+
+def sequences(corpus):
+    for chain in range(corpus.num_chains):
+        start, end = corpus.chain_offsets[chain], corpus.chain_offsets[chain + 1]
+        yield [corpus.device_types[t] for t in corpus.device_type[start:end]]
+
+
+def brute_force_counts(corpus, max_order=3):
+    """context tuple -> Counter of next devices, plus chain starts under ()"""
+    counts = {}
+    for devices in sequences(corpus):
+        if devices:
+            counts.setdefault((), Counter())[devices[0]] += 1
+        for n in range(1, max_order + 1):
+            for i in range(len(devices) - n):
+                counts.setdefault(tuple(devices[i:i + n]), Counter())[devices[i + n]] += 1
+    return counts
+
+
+def expected(counts, previous, limit):
+    """The backed-off distribution the model should return"""
+    for n in range(min(3, len(previous)), -1, -1):
+        context = tuple(previous[len(previous) - n:])
+        if context in counts and (n > 0 or not previous):
+            counter = counts[context]
+            total = sum(counter.values())
+            ranked = sorted(counter.items(), key=lambda item: (-item[1], item[0]))
+            return ranked[:limit], total, n
+    return None
+
+
+@pytest.fixture
+def corpus(racks):
+    return RackCorpus.from_racks(racks)
+
+
+def test_next_devices_match_brute_force(corpus):
+    model = DeviceTransitionModel(corpus)
+    counts = brute_force_counts(corpus)
+    contexts = [()] + [context for context in counts if context][:200]
+    for context in contexts:
+        ranked, total, order = expected(counts, list(context), 5)
+        suggestions, used = model.next_devices(list(context), limit=5)
+        assert used == order == len(context)
+        # Same counts in the same order; ties between device types follow type codes, not names
+        assert [round(p * total) for _, p in suggestions] == [c for _, c in ranked]
+        assert all(counts[context][device] == round(p * total) for device, p in suggestions)
+        for device, p in suggestions:
+            assert model.probability(list(context), device) == pytest.approx(p)
+
+
+def test_back_off_to_shorter_contexts(corpus):
+    model = DeviceTransitionModel(corpus)
+    counts = brute_force_counts(corpus)
+    last = next(context for context in counts if len(context) == 1)
+
+    # Unknown devices in front of a known one back off to the order-1 context
+    suggestions, order = model.next_devices(['Unknown', 'Nope', *last])
+    assert order == 1
+    assert [device for device, _ in suggestions] == [d for d, _ in model.next_devices(list(last))[0]]
+
+    # A context of known devices never seen together backs off until one is
+    small = DeviceTransitionModel(RackCorpus.from_racks([{'use_case': 'A - B', 'chains': [
+        {'devices': [{'type': t} for t in ('Eq8', 'Gate', 'Reverb')]},
+        {'devices': [{'type': t} for t in ('Delay', 'Reverb', 'Eq8')]}]}]))
+    assert small.next_devices(['Eq8', 'Gate']) == ([('Reverb', 1.0)], 2)
+    assert small.next_devices(['Delay', 'Gate']) == ([('Reverb', 1.0)], 1)
+    assert small.next_devices(['Gate', 'Delay', 'Reverb']) == ([('Eq8', 1.0)], 2)
+
+    # Nothing known: overall device frequency
+    suggestions, order = model.next_devices(['Unknown'], limit=3)
+    frequency = Counter(d for devices in sequences(corpus) for d in devices)
+    assert order == -1
+    assert [p for _, p in suggestions] == \
+        pytest.approx([c / sum(frequency.values()) for _, c in frequency.most_common(3)])
+    assert model.probability(['Unknown'], 'Missing') == 0.0
+
+
+def test_suggest_next_devices(rack_folder):
+    engine = RackRecommendationEngine(rack_folder)
+    suggestions = engine.suggest_next_devices(['Unknown', 'Eq8'], limit=3)
+    assert len(suggestions) <= 3 and all(s['context'] == ['Eq8'] for s in suggestions)
+    assert sum(s['probability'] for s in engine.suggest_next_devices([], limit=100)) == pytest.approx(1.0)
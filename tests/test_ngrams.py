@@ -0,0 +1,37 @@
+from collections import Counter, defaultdict
+
+import pytest
+
+from rack_corpus import RackCorpus
+from rack_ngrams import mine_device_ngrams
+
+
+def chain_sequences(corpus):
+    """(rack, [device type, ...]) for every chain, nested ones included"""
+    for chain in range(corpus.num_chains):
+        start, end = corpus.chain_offsets[chain], corpus.chain_offsets[chain + 1]
+        yield int(corpus.chain_rack[chain]), [corpus.device_types[t] for t in corpus.device_type[start:end]]
+
+
+@pytest.mark.parametrize('min_support', [2, 5])
+def test_ngrams_match_brute_force_counts(racks, min_support):
+    corpus = RackCorpus.from_racks(racks)
+    occurrences, rack_sets = Counter(), defaultdict(set)
+    for rack, devices in chain_sequences(corpus):
+        for n in range(2, 5):
+            for start in range(len(devices) - n + 1):
+                gram = tuple(devices[start:start + n])
+                occurrences[gram] += 1
+                rack_sets[gram].add(rack)
+
+    mined = mine_device_ngrams(corpus, min_n=2, max_n=4, min_support=min_support)
+    found = {(tuple(g['devices']), g['occurrences'], g['racks']) for grams in mined.values() for g in grams}
+    expected = {(gram, count, len(rack_sets[gram])) for gram, count in occurrences.items() if count >= min_support}
+    assert found == expected
+    for grams in mined.values():
+        counts = [g['occurrences'] for g in grams]
+        assert counts == sorted(counts, reverse=True)
+
+
+def test_empty_corpus():
+    assert mine_device_ngrams(RackCorpus.from_racks([])) == {}
@@ -0,0 +1,13 @@
+from rack_recommendations import RackRecommendationEngine
+
+
+def test_indexes_are_built_once(rack_folder, racks):
+    engine = RackRecommendationEngine(rack_folder)
+    built = engine.build_indexes()
+    assert engine.build_indexes() == built
+    assert engine.bitsets is built[2] and engine.text_index is built[3] and engine.lsh_index is built[-1]
+
+    engine.remove_rack(racks[0]['use_case'])
+    rebuilt = engine.build_indexes()
+    assert rebuilt[2] is not built[2] and rebuilt[3] is not built[3]
+    assert engine.bitsets.corpus.num_racks == len(racks) - 1
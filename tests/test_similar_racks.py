@@ -0,0 +1,55 @@
+import json
+import sqlite3
+
+import numpy as np
+
+from rack_corpus import RackCorpus
+from rack_database import RackDatabase
+from rack_similarity import DeviceBitsetIndex, blocked_top_k
+
+from synthetic import make_racks
+
+
+def test_blocked_top_k_matches_most_similar(racks):
+    racks = racks + [dict(racks[3])]  # a duplicated use case is never its own neighbour
+    bitsets = DeviceBitsetIndex(RackCorpus.from_racks(racks))
+    for block_size in (1, 7, None):
+        for rack, neighbours in blocked_top_k(bitsets, 5, block_size=block_size):
+            use_case = bitsets.corpus.use_cases[rack]
+            if bitsets.rack_ids[use_case] != rack:
+                continue
+            expected = bitsets.most_similar(use_case, 5)
+            assert [r for r, _ in neighbours] == [r for r, _ in expected]
+            assert np.allclose([s for _, s in neighbours], [s for _, s in expected])
+
+
+def neighbours(db):
+    """use_case -> [(neighbour, similarity), ...] in rank order"""
+    table = {}
+    with sqlite3.connect(db.db_path) as conn:
+        for use_case, neighbour, similarity in conn.execute(
+                "SELECT use_case, neighbor_use_case, similarity FROM similar_racks ORDER BY use_case, rank"):
+            table.setdefault(use_case, []).append((neighbour, round(similarity, 9)))
+    return table
+
+
+def test_incremental_refresh_matches_full(tmp_path, rack_folder, racks):
+    db_path = str(tmp_path / 'racks.db')
+    db = RackDatabase(db_path=db_path, json_folder=str(rack_folder))
+    db.refresh_similar_racks(k=5, block_size=16)
+    assert [r['use_case'] for r in db.get_similar_racks(racks[4]['use_case'], limit=3)] == \
+        [u for u, _ in neighbours(db)[racks[4]['use_case']][:3]]
+
+    # Change one rack's devices, remove one and add a few; the database refreshes on reload
+    changed = dict(racks[10], chains=racks[20]['chains'])
+    (rack_folder / 'r00010_analysis.json').write_text(json.dumps(changed))
+    (rack_folder / 'r00011_analysis.json').unlink()
+    for i, rack in enumerate(make_racks(4, seed=5)):
+        rack['use_case'] = f"New {i}"
+        (rack_folder / f"new{i}_analysis.json").write_text(json.dumps(rack))
+    incremental = RackDatabase(db_path=db_path, json_folder=str(rack_folder))
+
+    fresh = RackDatabase(db_path=str(tmp_path / 'fresh.db'), json_folder=str(rack_folder))
+    fresh.refresh_similar_racks(k=5, full=True)
+    assert racks[11]['use_case'] not in neighbours(incremental)
+    assert neighbours(incremental) == neighbours(fresh)
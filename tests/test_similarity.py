@@ -0,0 +1,41 @@
+import numpy as np
+
+from rack_corpus import RackCorpus
+from rack_recommendations import RackRecommendationEngine
+from rack_similarity import DeviceBitsetIndex
+
+
+def top_level_types(rack):
+    return {device['type'] for chain in rack['chains'] for device in chain['devices']}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a | b else 0.0
+
+
+def test_jaccard_matches_brute_force(racks):
+    bitsets = DeviceBitsetIndex(RackCorpus.from_racks(racks))
+    sets = [top_level_types(rack) for rack in racks]
+    for rack in (0, 7, 42, 149):
+        expected = [jaccard(sets[rack], other) for other in sets]
+        assert np.allclose(bitsets.jaccard(rack), expected)
+
+        ranked = sorted(((r, s) for r, s in enumerate(expected) if s > 0 and r != rack),
+                        key=lambda pair: (-pair[1], pair[0]))
+        found = bitsets.most_similar(racks[rack]['use_case'], limit=8)
+        assert [(r, round(s, 9)) for r, s in found] == [(r, round(s, 9)) for r, s in ranked[:8]]
+    assert bitsets.most_similar('No such rack') is None
+
+
+def test_engine_recommendations(rack_folder, racks):
+    engine = RackRecommendationEngine(rack_folder)
+    assert engine.recommend_similar_racks(racks[3]['use_case']) == []  # no devices
+    target = racks[4]
+    found = engine.recommend_similar_racks(target['use_case'], limit=5)
+    assert 0 < len(found) <= 5
+    by_use_case = {rack['use_case']: top_level_types(rack) for rack in racks}
+    for match in found:
+        other = by_use_case[match['use_case']]
+        assert match['similarity'] == jaccard(top_level_types(target), other)
+        assert set(match['shared_devices']) == top_level_types(target) & other
+    assert engine.recommend_similar_racks('No such rack') == "Rack 'No such rack' not found"
@@ -0,0 +1,78 @@
+import json
+import os
+
+import numpy as np
+
+from rack_analyzer import RackAnalyzer
+from rack_corpus import RackCorpus
+from rack_snapshot import SNAPSHOT_SUFFIX, default_snapshot_path, load_corpus, scan_folder
+
+
+def test_snapshot_round_trip(rack_folder, racks):
+    first = load_corpus(rack_folder)
+    assert not first.from_snapshot
+    assert default_snapshot_path(rack_folder).exists()
+
+    second = load_corpus(rack_folder)
+    assert second.from_snapshot
+    assert list(second.racks) == list(first.racks)
+    assert sorted(r['use_case'] for r in second.racks) == sorted(r['use_case'] for r in racks)
+    expected = RackCorpus.from_racks(list(first.racks))
+    for field in RackCorpus.ARRAY_FIELDS:
+        assert np.array_equal(getattr(second.corpus, field), getattr(expected, field)), field
+    for field in RackCorpus.STRING_FIELDS:
+        assert list(getattr(second.corpus, field)) == list(getattr(expected, field)), field
+
+
+def test_snapshot_invalidated_by_folder_changes(rack_folder, racks):
+    load_corpus(rack_folder)
+    path = rack_folder / 'r00003_analysis.json'
+
+    changed = dict(racks[3], use_case='Changed')
+    path.write_text(json.dumps(changed))
+    os.utime(path, ns=(1, 1))  # a different mtime even on coarse clocks
+    snapshot = load_corpus(rack_folder)
+    assert not snapshot.from_snapshot
+    assert 'Changed' in snapshot.corpus.use_cases
+    assert load_corpus(rack_folder).from_snapshot
+
+    path.unlink()
+    snapshot = load_corpus(rack_folder)
+    assert not snapshot.from_snapshot and len(snapshot.racks) == len(racks) - 1
+
+    (rack_folder / 'new_analysis.json').write_text(json.dumps(racks[0]))
+    snapshot = load_corpus(rack_folder)
+    assert not snapshot.from_snapshot and len(snapshot.racks) == len(racks)
+    assert snapshot.is_current(rack_folder)
+
+
+def test_unreadable_snapshot_is_rebuilt(rack_folder, racks):
+    load_corpus(rack_folder)
+    snapshot_path = default_snapshot_path(rack_folder)
+    data = snapshot_path.read_bytes()
+    for truncated in (data[:10], data[:len(data) // 2], b'garbage'):
+        snapshot_path.write_bytes(truncated)
+        snapshot = load_corpus(rack_folder)
+        assert not snapshot.from_snapshot
+        assert len(snapshot.racks) == len(racks)
+
+
+def test_missing_folder_is_empty(tmp_path):
+    missing = tmp_path / 'missing'
+    assert scan_folder(missing) == []
+    snapshot = load_corpus(missing)
+    assert len(snapshot.racks) == 0 and snapshot.corpus.num_racks == 0
+    assert not default_snapshot_path(missing).exists()
+
+
+
+def test_relative_folders(rack_folder, racks, monkeypatch):
+    monkeypatch.chdir(rack_folder)
+    assert default_snapshot_path('.') == rack_folder.with_name('racks' + SNAPSHOT_SUFFIX)
+    assert len(RackAnalyzer('.').racks) == len(racks)
+    assert default_snapshot_path('.').exists()
+
+    (rack_folder / 'sub').mkdir()
+    monkeypatch.chdir(rack_folder / 'sub')
+    assert default_snapshot_path('..') == default_snapshot_path(rack_folder)
+    assert len(RackAnalyzer('..').racks) == len(racks)
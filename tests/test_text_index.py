@@ -0,0 +1,79 @@
+import re
+
+import pytest
+
+from rack_corpus import RackCorpus
+from rack_recommendations import RackRecommendationEngine
+from rack_text_index import RackTextIndex, tokenize
+
+from synthetic import make_racks, write_racks
+
+NAMES = ['Drum Bus - Kickdrum Glue', 'Drum Bus - Snare Crush', 'Vocal - Tape-Sat Lead', 'Bass - Sub Tape',
+         'Master - Glue Comp', 'Vocal - Airy Delay', 'Bass - Reese', 'Channel Strip - Tape Saturation',
+         'Drum Bus - drum room', 'Master - TAPE 2']
+
+
+@pytest.fixture
+def named_racks():
+    racks = make_racks(len(NAMES), seed=4)
+    for rack, name in zip(racks, NAMES):
+        rack['use_case'] = name
+    return racks
+
+
+def rack_words(rack, fields):
+    texts = []
+    if 'use_case' in fields:
+        texts.append(rack['use_case'])
+
+    def walk(chains):
+        for chain in chains:
+            texts.append(chain['name'])
+            for device in chain['devices']:
+                walk(device.get('chains', []))
+    if 'chain' in fields:
+        walk(rack['chains'])
+    if 'macro' in fields:
+        texts.extend(macro['name'] for macro in rack['macro_controls'])
+    return {word for text in texts for word in re.findall(r"\w+", text.lower())}
+
+
+@pytest.mark.parametrize('keyword', ['drum', 'DRUM', 'glue', 'ape', 'tape-sat', 'bus - k', 'e s', 'zzz', 'a'])
+def test_contains_matches_substring_scan(named_racks, keyword):
+    index = RackTextIndex(RackCorpus.from_racks(named_racks))
+    expected = [i for i, rack in enumerate(named_racks) if keyword.lower() in rack['use_case'].lower()]
+    assert index.contains(keyword).tolist() == expected
+
+
+@pytest.mark.parametrize('fields', [('use_case',), ('chain', 'macro'), ('use_case', 'chain', 'macro')])
+@pytest.mark.parametrize('query', ['tape', 'tape sat', 'dr glue', 'main', 'dry wet', 'cut', 'nothing'])
+def test_search_modes_match_brute_force(named_racks, query, fields):
+    index = RackTextIndex(RackCorpus.from_racks(named_racks))
+    words = [rack_words(rack, fields) for rack in named_racks]
+    tokens = tokenize(query)
+
+    def matches(rack_words, token, prefix):
+        return any(word.startswith(token) if prefix else word == token for word in rack_words)
+
+    for prefix in (True, False):
+        for mode, combine in (('and', all), ('or', any)):
+            expected = [i for i, found in enumerate(words)
+                        if combine(matches(found, token, prefix) for token in tokens)]
+            assert index.search(query, mode=mode, fields=fields, prefix=prefix).tolist() == expected, \
+                (mode, prefix)
+
+
+def test_engine_builds_the_text_index_lazily(tmp_path, named_racks):
+    engine = RackRecommendationEngine(write_racks(tmp_path / 'racks', named_racks))
+    assert 'text' not in engine._indexes
+    before = engine.find_racks_for_genre(['drum'])
+    assert sorted(r['use_case'] for r in before) == \
+        sorted(name for name in NAMES if 'drum' in name.lower())
+    assert {r['use_case'] for r in engine.search('tape', fields=('use_case',))} == \
+        {'Vocal - Tape-Sat Lead', 'Bass - Sub Tape', 'Channel Strip - Tape Saturation', 'Master - TAPE 2'}
+
+    built = engine.text_index
+    assert engine.text_index is built
+    engine.add_rack(dict(named_racks[0], use_case='Drum Bus - Drumline'))
+    assert engine.text_index is not built
+    assert 'Drum Bus - Drumline' in {r['use_case'] for r in engine.find_racks_for_genre(['drum'])}
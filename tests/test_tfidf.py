@@ -0,0 +1,86 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from rack_corpus import RackCorpus
+from rack_recommendations import RackRecommendationEngine
+from rack_tfidf import TfidfIndex
+
+
+def chain_terms(devices, bigrams=True):
+    types = [device['type'] for device in devices]
+    return types + ([f"{a} → {b}" for a, b in zip(types, types[1:])] if bigrams else [])
+
+
+def all_chains(chains):
+    for chain in chains:
+        yield chain
+        for device in chain['devices']:
+            yield from all_chains(device.get('chains', []))
+
+
+def brute_force_vectors(documents):
+    """L2-normalised tf-idf vectors, one {term: weight} per document of terms"""
+    counts = [Counter(terms) for terms in documents]
+    df = Counter(term for count in counts for term in count)
+    vectors = []
+    for count in counts:
+        vector = {term: (1 + math.log(tf)) * (1 + math.log((1 + len(documents)) / (1 + df[term])))
+                  for term, tf in count.items()}
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        vectors.append({term: w / norm for term, w in vector.items()})
+    return vectors
+
+
+def dot(a, b):
+    return sum(w * b.get(term, 0.0) for term, w in a.items())
+
+
+@pytest.mark.parametrize('level,bigrams', [('rack', True), ('rack', False), ('chain', True)])
+def test_cosine_matches_brute_force(racks, level, bigrams):
+    corpus = RackCorpus.from_racks(racks)
+    index = TfidfIndex(corpus, level=level, bigrams=bigrams)
+    if level == 'rack':
+        documents = [[term for chain in rack['chains'] for term in chain_terms(chain['devices'], bigrams)]
+                     for rack in racks]
+    else:
+        documents = [chain_terms([{'type': corpus.device_types[t]} for t in
+                                  corpus.device_type[corpus.chain_offsets[c]:corpus.chain_offsets[c + 1]]],
+                                 bigrams)
+                     for c in range(corpus.num_chains)]
+        assert sorted(map(tuple, documents)) == \
+            sorted(tuple(chain_terms(chain['devices'], bigrams))
+                   for rack in racks for chain in all_chains(rack['chains']))
+    vectors = brute_force_vectors(documents)
+
+    for row in (0, 4, 17, 88):
+        terms, weights = index.vector(row)
+        assert dict(zip((index.term(t) for t in terms), np.round(weights, 9))) == \
+            {term: round(w, 9) for term, w in vectors[row].items()}
+        assert np.allclose(index.cosine(row)[0], [min(dot(vectors[row], v), 1.0) for v in vectors])
+
+
+def test_chain_order_matters():
+    forward = {'use_case': 'A - Forward', 'chains': [{'devices': [{'type': 'Eq8'}, {'type': 'Compressor2'}]}]}
+    backward = {'use_case': 'A - Backward', 'chains': [{'devices': [{'type': 'Compressor2'}, {'type': 'Eq8'}]}]}
+    same = dict(forward, use_case='A - Same')
+    index = TfidfIndex(RackCorpus.from_racks([forward, backward, same]))
+    scores = index.cosine(0)[0]
+    assert scores[2] == pytest.approx(1.0)
+    assert 0 < scores[1] < 1
+    assert TfidfIndex(RackCorpus.from_racks([forward, backward]), bigrams=False).cosine(0)[0][1] == \
+        pytest.approx(1.0)
+
+
+def test_engine_tfidf_scorer(rack_folder, racks):
+    engine = RackRecommendationEngine(rack_folder)
+    index = engine.tfidf('rack')
+    target = racks[4]['use_case']
+    row = engine.bitsets.rack_ids[target]
+    found = engine.recommend_similar_racks(target, limit=5, scorer='tfidf')
+    assert [(r['use_case'], r['similarity']) for r in found] == \
+        [(engine.analyzer.corpus.use_cases[r], s) for r, s in index.most_similar(row, 5)]
+    scores = [r['similarity'] for r in found]
+    assert scores == sorted(scores, reverse=True) and all(0 < s <= 1 for s in scores)
@@ -19,6 +19,14 @@ def decompress_and_parse_ableton_file(file_path):
         print(f"❌ Error: {e}")
         return None
 
+def decompress_and_parse_ableton_bytes(data):
+    """Decompresses the bytes of an Ableton .adg or .adv file and parses its XML content, in memory."""
+    try:
+        return ET.fromstring(gzip.decompress(data))
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return None
+
 def parse_chains_and_devices(xml_root, filename=None, verbose=False):
     """Parse the main rack structure based on actual Ableton XML format"""
     # Always use filename as rack name
@@ -235,6 +243,16 @@ def export_xml_to_file(xml_root, original_file_path, output_folder="."):
         print(f"❌ Error exporting XML: {e}")
         return None
 
+def write_xml(xml_root, f):
+    """Write the pretty-printed XML document, as exported by export_xml_to_file, to a binary file"""
+    ET.indent(xml_root, space="  ", level=0)
+    ET.ElementTree(xml_root).write(f, encoding='utf-8', xml_declaration=True)
+
+def write_analysis_json(rack_info, f):
+    """Write the analysis JSON, as exported by export_analysis_to_json, to a binary file"""
+    for chunk in json.JSONEncoder(indent=2).iterencode(rack_info):
+        f.write(chunk.encode('utf-8'))
+
 def export_analysis_to_json(rack_info, original_file_path, output_folder="."):
     """Export analysis to JSON"""
     try:
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Upload analysis helpers shared by the single and batch analyze endpoints
+
+analyze_upload() is a plain top-level function returning plain data, so it
+can run in a process pool worker as well as on a request or job thread.
+Stage durations (decompress, parse) are returned as data too, since metrics
+recorded in a pool worker would stay in that process.
+"""
+
+import io
+import os
+import time
+import zipfile
+
+from werkzeug.utils import secure_filename
+
+from abletonRackAnalyzer import decompress_and_parse_ableton_bytes, parse_chains_and_devices
+
+ALLOWED_EXTENSIONS = {'adg', 'adv'}
+
+
+class BatchLimitError(Exception):
+    pass
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def analyze_upload(data, filename, stages=None):
+    """Decompress and parse one rack upload: (rack_info, None) or (None, error message)
+
+    When given, the stages dict receives the seconds spent per stage.
+    """
+    stages = {} if stages is None else stages
+    start = time.perf_counter()
+    xml_root = decompress_and_parse_ableton_bytes(data)
+    stages['decompress'] = time.perf_counter() - start
+    if xml_root is None:
+        return None, 'Failed to decompress or parse the file'
+    start = time.perf_counter()
+    try:
+        rack_info = parse_chains_and_devices(xml_root, filename, verbose=False)
+    except Exception as e:
+        return None, f'Analysis failed: {str(e)}'
+    finally:
+        stages['parse'] = time.perf_counter() - start
+    if rack_info is None:
+        return None, 'Failed to analyze the rack structure'
+    return rack_info, None
+
+
+def analyze_upload_with_stages(data, filename):
+    """analyze_upload for a process pool: (rack_info, error, stage durations)"""
+    stages = {}
+    rack_info, error = analyze_upload(data, filename, stages)
+    return rack_info, error, stages
+
+
+def expand_uploads(files, max_files, max_bytes):
+    """(filename, bytes) for every rack in the uploaded files, zip archives expanded
+
+    Raises BatchLimitError when the racks exceed max_files or max_bytes in total
+    (archive members are checked before they are decompressed). Uploads that are
+    not racks are returned with data None so they can be reported per file.
+    """
+    members = []
+    total = 0
+
+    def add(filename, data):
+        nonlocal total
+        if len(members) >= max_files:
+            raise BatchLimitError(f'Too many files (limit {max_files})')
+        total += len(data) if data is not None else 0
+        if total > max_bytes:
+            raise BatchLimitError(f'Upload too large (limit {max_bytes} bytes)')
+        members.append((filename, data))
+
+    for upload in files:
+        name = upload.filename or ''
+        if name.lower().endswith('.zip'):
+            try:
+                archive = zipfile.ZipFile(io.BytesIO(upload.read()))
+            except zipfile.BadZipFile:
+                add(secure_filename(name), None)
+                continue
+            with archive:
+                for info in archive.infolist():
+                    base = os.path.basename(info.filename)
+                    if info.is_dir() or base.startswith('.') or '__MACOSX' in info.filename:
+                        continue
+                    if not allowed_file(base):
+                        continue  # archives of rack folders carry other files too
+                    if total + info.file_size > max_bytes:
+                        raise BatchLimitError(f'Upload too large (limit {max_bytes} bytes)')
+                    with archive.open(info) as member:
+                        # Read one byte past the limit: the declared size may lie
+                        data = member.read(max_bytes - total + 1)
+                    add(secure_filename(base), data)
+        elif allowed_file(name):
+            add(secure_filename(name), upload.read())
+        else:
+            add(secure_filename(name), None)
+    return members
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of rack analyses for the Flask backend
+
+Uploads are keyed by the SHA-256 of their bytes, so re-uploading a rack
+(under any file name) skips decompressing and parsing it. Results live in an
+in-process LRU (rack_cache.LRUCache) and, when a cache directory is
+configured, in one JSON file per hash that survives restarts and is shared
+by all workers.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from rack_cache import LRUCache
+
+
+def content_key(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class AnalysisCache:
+    def __init__(self, maxsize=256, disk_dir=None):
+        self.memory = LRUCache(maxsize=maxsize)
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        self.disk_misses = 0
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    def _disk_path(self, key):
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def get(self, key):
+        """Cached rack_info for a content key, or None"""
+        rack_info = self.memory.get(key)
+        if rack_info is not None or self.disk_dir is None:
+            return rack_info
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                rack_info = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.disk_misses += 1
+            return None
+        with self._lock:
+            self.disk_hits += 1
+        self.memory.put(key, rack_info)
+        return rack_info
+
+    def put(self, key, rack_info):
+        self.memory.put(key, rack_info)
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(rack_info, f)
+            os.replace(tmp_path, path)  # atomic, so concurrent readers never see a partial file
+        except OSError:
+            pass  # the disk tier is best-effort
+
+    def stats(self):
+        memory = self.memory.stats()
+        hits = memory['hits'] + self.disk_hits
+        lookups = memory['hits'] + memory['misses']
+        return {
+            'memory': memory,
+            'disk': {'enabled': self.disk_dir is not None, 'hits': self.disk_hits, 'misses': self.disk_misses},
+            'hits': hits,
+            'misses': lookups - hits,
+            'hit_rate': hits / lookups if lookups else 0.0
+        }
@@ -4,29 +4,190 @@ Flask backend for Ableton Rack Analyzer Web App
 """
 
 import os
-import sys
 import json
-import tempfile
-import shutil
-from pathlib import Path
-from flask import Flask, request, jsonify, send_file
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from flask import Flask, request, jsonify, send_file, Response, g
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 
-# Add parent directory to path to import the analyzer modules
-sys.path.append(str(Path(__file__).parent.parent.parent))
-from abletonRackAnalyzer import decompress_and_parse_ableton_file, parse_chains_and_devices, export_xml_to_file, export_analysis_to_json
+from abletonRackAnalyzer import decompress_and_parse_ableton_bytes, write_xml, write_analysis_json
+from analysis import allowed_file, analyze_upload, analyze_upload_with_stages, expand_uploads, BatchLimitError
+from analysis_cache import AnalysisCache, content_key
+from artifacts import ArtifactStore
+from jobs import JobQueue, QueueFull
+from library import LibraryUnavailable, RackLibrary
+from metrics import Registry, CONTENT_TYPE, exponential_buckets
 
 app = Flask(__name__, static_folder='..', static_url_path='')
 CORS(app)  # Enable CORS for all routes
 
 # Configuration
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-app.config['UPLOAD_FOLDER'] = tempfile.mkdtemp()
-ALLOWED_EXTENSIONS = {'adg', 'adv'}
+app.config['JOB_WORKERS'] = int(os.environ.get('RACK_ANALYZER_JOB_WORKERS', 2))
+app.config['JOB_QUEUE_DEPTH'] = int(os.environ.get('RACK_ANALYZER_JOB_QUEUE_DEPTH', 16))
+app.config['CACHE_SIZE'] = int(os.environ.get('RACK_ANALYZER_CACHE_SIZE', 256))
+app.config['CACHE_DIR'] = os.environ.get('RACK_ANALYZER_CACHE_DIR')  # optional on-disk tier
+app.config['BATCH_WORKERS'] = int(os.environ.get('RACK_ANALYZER_BATCH_WORKERS', os.cpu_count() or 1))
+app.config['BATCH_MAX_FILES'] = int(os.environ.get('RACK_ANALYZER_BATCH_MAX_FILES', 100))
+app.config['BATCH_MAX_BYTES'] = int(os.environ.get('RACK_ANALYZER_BATCH_MAX_BYTES', 64 * 1024 * 1024))
+app.config['ARTIFACT_DIR'] = os.environ.get('RACK_ANALYZER_ARTIFACT_DIR')  # default: a fresh temp dir
+app.config['ARTIFACT_TTL'] = int(os.environ.get('RACK_ANALYZER_ARTIFACT_TTL', 3600))
+app.config['ARTIFACT_QUOTA'] = int(os.environ.get('RACK_ANALYZER_ARTIFACT_QUOTA', 512 * 1024 * 1024))
+app.config['ARTIFACT_MAX'] = int(os.environ.get('RACK_ANALYZER_ARTIFACT_MAX', 1000))
+app.config['ARTIFACT_MEMORY'] = int(os.environ.get('RACK_ANALYZER_ARTIFACT_MEMORY', 64 * 1024 * 1024))
+app.config['LIBRARY_DIR'] = os.environ.get('RACK_ANALYZER_LIBRARY_DIR')  # unset: library API answers 503
+app.config['LIBRARY_DB'] = os.environ.get('RACK_ANALYZER_LIBRARY_DB')  # default: a file in the temp dir
+app.config['API_CACHE_SIZE'] = int(os.environ.get('RACK_ANALYZER_API_CACHE_SIZE', 1024))
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+# Analyzed uploads, kept compressed (in memory up to ARTIFACT_MEMORY); XML/JSON downloads are rendered on request
+artifacts = ArtifactStore(root=app.config['ARTIFACT_DIR'], ttl=app.config['ARTIFACT_TTL'],
+                          max_bytes=app.config['ARTIFACT_QUOTA'], max_artifacts=app.config['ARTIFACT_MAX'],
+                          max_memory_bytes=app.config['ARTIFACT_MEMORY'])
+
+# Analyses of previously seen uploads, keyed by content hash
+analysis_cache = AnalysisCache(maxsize=app.config['CACHE_SIZE'], disk_dir=app.config['CACHE_DIR'])
+
+# Background analysis for POST /api/analyze?async=1
+job_queue = JobQueue(workers=app.config['JOB_WORKERS'], max_queued=app.config['JOB_QUEUE_DEPTH'])
+
+# Rack library behind the read API (/api/racks, /api/stats), loaded on first use
+library = RackLibrary(app.config['LIBRARY_DIR'], app.config['LIBRARY_DB'], cache_size=app.config['API_CACHE_SIZE'])
+
+# Prometheus metrics, served at /metrics
+metrics = Registry()
+REQUESTS = metrics.counter('rack_analyzer_http_requests_total', 'HTTP requests by route, method and status',
+                           ('route', 'method', 'status'))
+REQUEST_SECONDS = metrics.histogram('rack_analyzer_http_request_duration_seconds',
+                                    'Time to produce a response (streamed bodies excluded), by route',
+                                    ('route', 'method'))
+STAGE_SECONDS = metrics.histogram('rack_analyzer_stage_duration_seconds',
+                                  'Analysis and export time by stage: decompress (gunzip + XML parse), '
+                                  'parse (rack structure), export (XML), json_encode', ('stage',))
+UPLOAD_BYTES = metrics.histogram('rack_analyzer_upload_size_bytes', 'Size of analyzed rack uploads',
+                                 buckets=exponential_buckets(1024, 4, 10))  # 1 KB - 256 MB
+metrics.gauge('rack_analyzer_jobs', 'Async analysis jobs by state', ('state',)).set_function(
+    lambda: {(state,): count for state, count in job_queue.stats().items() if state in ('queued', 'running')})
+metrics.counter('rack_analyzer_cache_hits_total', 'Cache hits by cache', ('cache',)).set_function(
+    lambda: {('analysis',): analysis_cache.stats()['hits'], ('library',): library.responses.stats()['hits']})
+metrics.counter('rack_analyzer_cache_misses_total', 'Cache misses by cache', ('cache',)).set_function(
+    lambda: {('analysis',): analysis_cache.stats()['misses'], ('library',): library.responses.stats()['misses']})
+metrics.gauge('rack_analyzer_cache_hit_ratio', 'Cache hit ratio since start, by cache', ('cache',)).set_function(
+    lambda: {('analysis',): analysis_cache.stats()['hit_rate'], ('library',): library.responses.stats()['hit_rate']})
+metrics.gauge('rack_analyzer_artifacts', 'Stored artifacts').set_function(lambda: artifacts.stats()['artifacts'])
+metrics.gauge('rack_analyzer_artifact_bytes', 'Bytes of stored artifacts').set_function(
+    lambda: artifacts.stats()['bytes'])
+
+def observe_stages(stages):
+    for stage, seconds in stages.items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    # The route template, not the path, keeps label cardinality bounded
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+    if 'request_start' in g:
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, route=route, method=request.method)
+    return response
+
+class AnalysisError(Exception):
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.status = status
+
+# Process pool for /api/analyze/batch, started on first use
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+def batch_pool():
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ProcessPoolExecutor(max_workers=app.config['BATCH_WORKERS'])
+        return _batch_pool
+
+def cached_analysis(data, filename):
+    """(content key, rack_info) from the cache, or (content key, None)"""
+    key = content_key(data)
+    cached = analysis_cache.get(key)
+    if cached is None:
+        return key, None
+    # Same bytes seen before: only the file-derived names differ
+    base_name = os.path.splitext(filename)[0]
+    return key, dict(cached, rack_name=base_name, use_case=base_name)
+
+def run_analysis(data, filename):
+    """Analyze the bytes of an uploaded rack in memory; returns the response data"""
+    key, rack_info = cached_analysis(data, filename)
+    if rack_info is not None:
+        return analysis_response(data, filename, rack_info, cached=True)
+    
+    stages = {}
+    rack_info, error = analyze_upload(data, filename, stages)
+    observe_stages(stages)
+    if error:
+        raise AnalysisError(error)
+    analysis_cache.put(key, rack_info)
+    return analysis_response(data, filename, rack_info, cached=False)
+
+def analysis_response(data, filename, rack_info, cached):
+    """Response data for an analyzed upload; also registers it for download"""
+    base_name = os.path.splitext(filename)[0]
+    
+    # Prepare response data
+    response_data = {
+        'success': True,
+        'analysis': rack_info,
+        'filename': filename,
+        'cached': cached,
+        'stats': {
+            'total_chains': len(rack_info.get('chains', [])),
+            'total_devices': sum(len(chain.get('devices', [])) for chain in rack_info.get('chains', [])),
+            'macro_controls': len(rack_info.get('macro_controls', []))
+        }
+    }
+    
+    # Downloads are generated from the stored upload when requested
+    artifact_id = artifacts.put({'upload': data}, meta={'base_name': base_name, 'rack_info': rack_info})
+    response_data['artifact_id'] = artifact_id
+    response_data['download_ids'] = {
+        'xml': artifact_id,
+        'json': artifact_id
+    }
+    
+    return response_data
+
+DOWNLOADS = {
+    'xml': ('{}.xml', 'application/xml'),
+    'json': ('{}_analysis.json', 'application/json')
+}
+
+# Smaller downloads aren't worth a gzip variant
+GZIP_MIN_SIZE = 1024
+
+def render_download(artifact, file_type):
+    """Writer streaming the XML export or analysis JSON of an artifact to a file"""
+    def write_xml_export(f):
+        with STAGE_SECONDS.time(stage='decompress'):
+            xml_root = decompress_and_parse_ableton_bytes(artifact.read('upload'))
+        with STAGE_SECONDS.time(stage='export'):
+            write_xml(xml_root, f)
+    
+    def write_json_export(f):
+        with STAGE_SECONDS.time(stage='json_encode'):
+            write_analysis_json(artifact.meta['rack_info'], f)
+    
+    return write_xml_export if file_type == 'xml' else write_json_export
+
+def wants_gzip():
+    # Byte ranges always refer to the uncompressed file
+    return request.accept_encodings['gzip'] > 0 and 'Range' not in request.headers
 
 @app.route('/')
 def serve_index():
@@ -36,7 +197,9 @@ def serve_index():
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'message': 'Ableton Rack Analyzer API is running'})
+    return jsonify({'status': 'healthy', 'message': 'Ableton Rack Analyzer API is running',
+                    'jobs': job_queue.stats(), 'cache': analysis_cache.stats(),
+                    'artifacts': artifacts.stats(), 'library': library.stats()})
 
 @app.route('/api/analyze', methods=['POST'])
 def analyze_rack():
@@ -56,101 +219,302 @@ def analyze_rack():
         if not allowed_file(file.filename):
             return jsonify({'error': 'Invalid file type. Only .adg and .adv files are allowed'}), 400
         
-        # Create a temporary directory for this request
-        temp_dir = tempfile.mkdtemp()
+        # Read the upload into memory; nothing is written to disk
+        filename = secure_filename(file.filename)
+        data = file.read()
+        UPLOAD_BYTES.observe(len(data))
         
-        try:
-            # Save the uploaded file
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(temp_dir, filename)
-            file.save(filepath)
-            
-            # Analyze the rack
-            xml_root = decompress_and_parse_ableton_file(filepath)
-            if xml_root is None:
-                return jsonify({'error': 'Failed to decompress or parse the file'}), 500
-            
-            # Parse chains and devices
-            rack_info = parse_chains_and_devices(xml_root, filename, verbose=False)
-            if rack_info is None:
-                return jsonify({'error': 'Failed to analyze the rack structure'}), 500
-            
-            # Export XML and JSON files
-            xml_path = export_xml_to_file(xml_root, filepath, temp_dir)
-            json_path = export_analysis_to_json(rack_info, filepath, temp_dir)
-            
-            # Prepare response data
-            response_data = {
+        # Async mode: hand the analysis to the worker pool and return a job id
+        if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+            try:
+                job = job_queue.submit(run_analysis, data, filename)
+            except QueueFull:
+                return jsonify({'error': 'Analysis queue is full, try again later'}), 503
+            return jsonify({
                 'success': True,
-                'analysis': rack_info,
-                'filename': filename,
-                'stats': {
-                    'total_chains': len(rack_info.get('chains', [])),
-                    'total_devices': sum(len(chain.get('devices', [])) for chain in rack_info.get('chains', [])),
-                    'macro_controls': len(rack_info.get('macro_controls', []))
-                }
-            }
-            
-            # Store paths for download endpoints
-            response_data['download_ids'] = {
-                'xml': os.path.basename(xml_path) if xml_path else None,
-                'json': os.path.basename(json_path) if json_path else None
-            }
-            
-            # Store temp directory in app context for cleanup
-            if not hasattr(app, 'temp_dirs'):
-                app.temp_dirs = {}
-            app.temp_dirs[filename] = temp_dir
-            
-            return jsonify(response_data), 200
-            
-        except Exception as e:
-            # Cleanup on error
-            shutil.rmtree(temp_dir, ignore_errors=True)
-            return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': f'/api/jobs/{job.id}',
+                'events_url': f'/api/jobs/{job.id}/events'
+            }), 202
+        
+        try:
+            response_data = run_analysis(data, filename)
+            with STAGE_SECONDS.time(stage='json_encode'):
+                response = jsonify(response_data)
+            return response, 200
+        except AnalysisError as e:
+            return jsonify({'error': str(e)}), e.status
             
     except Exception as e:
         return jsonify({'error': f'Request failed: {str(e)}'}), 500
 
-@app.route('/api/download/<file_type>/<filename>', methods=['GET'])
-def download_file(file_type, filename):
-    """Download generated XML or JSON files"""
+@app.route('/api/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Analyze several uploaded racks (or a .zip of them) in parallel, streaming NDJSON
+    
+    One line per rack as it finishes ({"index", "filename", ...analysis response or "error"}),
+    then a summary line {"done": true, "total", "succeeded", "failed"}.
+    """
+    uploads = request.files.getlist('files') + request.files.getlist('file')
+    if not uploads:
+        return jsonify({'error': 'No file provided'}), 400
     try:
-        # Security check
-        filename = secure_filename(filename)
-        
-        # Find the temp directory
-        base_filename = filename.replace('.xml', '').replace('_analysis.json', '')
-        for key in getattr(app, 'temp_dirs', {}):
-            if base_filename in key:
-                temp_dir = app.temp_dirs[key]
-                filepath = os.path.join(temp_dir, filename)
-                
-                if os.path.exists(filepath):
-                    return send_file(filepath, as_attachment=True, download_name=filename)
+        members = expand_uploads(uploads, app.config['BATCH_MAX_FILES'], app.config['BATCH_MAX_BYTES'])
+    except BatchLimitError as e:
+        return jsonify({'error': str(e)}), 413
+    
+    def line(index, filename, response=None, error=None):
+        data = {'index': index, 'filename': filename}
+        data.update(response if response is not None else {'success': False, 'error': error})
+        return json.dumps(data) + '\n'
+    
+    def stream():
+        succeeded = 0
+        pending = {}
+        for index, (filename, data) in enumerate(members):
+            if data is None:
+                yield line(index, filename, error='Invalid file type. Only .adg and .adv files are allowed')
+                continue
+            UPLOAD_BYTES.observe(len(data))
+            key, rack_info = cached_analysis(data, filename)
+            if rack_info is not None:
+                succeeded += 1
+                yield line(index, filename, analysis_response(data, filename, rack_info, cached=True))
+            else:
+                pending[batch_pool().submit(analyze_upload_with_stages, data, filename)] = (index, filename, data, key)
         
-        return jsonify({'error': 'File not found'}), 404
+        for future in as_completed(pending):
+            index, filename, data, key = pending[future]
+            try:
+                rack_info, error, stages = future.result()
+                observe_stages(stages)
+            except Exception as e:
+                rack_info, error = None, f'Analysis failed: {str(e)}'
+            if error:
+                yield line(index, filename, error=error)
+                continue
+            analysis_cache.put(key, rack_info)
+            succeeded += 1
+            yield line(index, filename, analysis_response(data, filename, rack_info, cached=False))
+        
+        yield json.dumps({'done': True, 'total': len(members), 'succeeded': succeeded,
+                          'failed': len(members) - succeeded}) + '\n'
+    
+    return Response(stream(), mimetype='application/x-ndjson')
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status of an async analysis job (with the analysis once it is done)"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-sent events: one 'status' event per job state change, ending when the job finishes"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    def stream():
+        revision = None
+        while True:
+            current = job.revision
+            if current != revision:
+                revision = current
+                yield f"event: status\ndata: {json.dumps(job.to_dict())}\n\n"
+                if job.done:
+                    return
+            elif job.wait(revision, timeout=15) == revision:
+                yield ": keep-alive\n\n"
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+SEARCH_FILTERS = {
+    'category': str,
+    'min_devices': int,
+    'max_devices': int,
+    'device_type': str,
+    'macro_name': str,
+    'cluster': int
+}
+SIMILARITY_SCORERS = ('jaccard', 'lsh', 'tfidf')
+MAX_PAGE_SIZE = 200
+
+def library_response(key, compute):
+    """Cached JSON response with an ETag (If-None-Match -> 304); 404 when compute() returns None
+
+    503 when the library folder isn't configured or doesn't exist.
+    """
+    try:
+        body, etag = library.cached(key, compute)
+    except LibraryUnavailable as e:
+        return jsonify({'error': str(e)}), 503
+    if body is None:
+        return jsonify({'error': 'Rack not found'}), 404
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True  # clients may keep it, but revalidate
+    return response.make_conditional(request)
+
+def page_args(default_limit):
+    """(limit, offset) from the query string, limit capped at MAX_PAGE_SIZE"""
+    limit = request.args.get('limit', default_limit, type=int)
+    offset = request.args.get('offset', 0, type=int)
+    return min(max(limit, 1), MAX_PAGE_SIZE), max(offset, 0)
+
+@app.route('/api/racks', methods=['GET'])
+def list_racks():
+    """Search the rack library: search_racks filters as query parameters, paginated with limit/offset"""
+    try:
+        filters = {}
+        for name, kind in SEARCH_FILTERS.items():
+            value = request.args.get(name, '')
+            if value:
+                try:
+                    filters[name] = kind(value)
+                except ValueError:
+                    return jsonify({'error': f'Invalid {name}: {value}'}), 400
+        limit, offset = page_args(50)
+        
+        def compute():
+            return {
+                'racks': library.db.search_racks(limit=limit, offset=offset, **filters),
+                'total': library.db.count_racks(**filters),
+                'limit': limit,
+                'offset': offset
+            }
         
+        return library_response(('racks', tuple(sorted(filters.items())), limit, offset), compute)
+        
+    except Exception as e:
+        return jsonify({'error': f'Search failed: {str(e)}'}), 500
+
+def rack_details(rack_id):
+    details = library.db.get_rack_details(rack_id)
+    if details is None:
+        return None
+    rack_columns = ['id', 'use_case', 'category', 'total_devices', 'total_chains', 'active_macros', 'complexity_score', 'created_at']
+    device_columns = ['chain_name', 'device_type', 'device_name', 'is_on', 'position']
+    macro_columns = ['name', 'value', 'index']
+    return dict(
+        zip(rack_columns, details['rack']),
+        devices=[dict(zip(device_columns, device)) for device in details['devices']],
+        macro_controls=[dict(zip(macro_columns, macro)) for macro in details['macros']]
+    )
+
+@app.route('/api/racks/<int:rack_id>', methods=['GET'])
+def get_rack(rack_id):
+    """Full details of one rack: devices per chain and macro controls"""
+    try:
+        return library_response(('rack', rack_id), lambda: rack_details(rack_id))
+    except Exception as e:
+        return jsonify({'error': f'Lookup failed: {str(e)}'}), 500
+
+@app.route('/api/racks/<int:rack_id>/similar', methods=['GET'])
+def similar_racks(rack_id):
+    """Racks similar to a rack (?scorer=jaccard|lsh|tfidf, ?limit=)"""
+    try:
+        scorer = request.args.get('scorer', 'jaccard')
+        if scorer not in SIMILARITY_SCORERS:
+            return jsonify({'error': f'Unknown scorer: {scorer}'}), 400
+        limit, _ = page_args(10)
+        
+        def compute():
+            details = library.db.get_rack_details(rack_id)
+            if details is None:
+                return None
+            use_case = details['rack'][1]
+            if scorer == 'jaccard':
+                # Precomputed top-k neighbours, one indexed lookup
+                similar = library.db.get_similar_racks(use_case, limit=limit)
+            else:
+                similar = library.engine.recommend_similar_racks(use_case, limit=limit, scorer=scorer)
+                if isinstance(similar, str):  # not in the engine's library
+                    return None
+            return {'rack_id': rack_id, 'use_case': use_case, 'scorer': scorer, 'similar': similar}
+        
+        return library_response(('similar', rack_id, scorer, limit), compute)
+        
+    except Exception as e:
+        return jsonify({'error': f'Similarity lookup failed: {str(e)}'}), 500
+
+@app.route('/api/stats', methods=['GET'])
+def library_stats():
+    """Library statistics: totals, popular devices, categories, complexity and clusters"""
+    try:
+        def compute():
+            stats = library.db.get_statistics()
+            stats['popular_devices'] = [{'device_type': device_type, 'count': count}
+                                        for device_type, count in stats['popular_devices']]
+            stats['category_distribution'] = [{'category': category, 'count': count}
+                                              for category, count in stats['category_distribution']]
+            stats['clusters'] = library.db.get_clusters()
+            return stats
+        
+        return library_response(('stats',), compute)
+        
+    except Exception as e:
+        return jsonify({'error': f'Statistics failed: {str(e)}'}), 500
+
+@app.route('/api/download/<file_type>/<artifact_id>', methods=['GET'])
+def download_file(file_type, artifact_id):
+    """Download the XML export or analysis JSON of an analyzed upload (rendered on first request)
+
+    The file is streamed from disk in chunks, gzip-encoded when the client accepts it,
+    with a content-hash ETag (If-None-Match -> 304) and byte ranges (Range -> 206).
+    """
+    try:
+        artifact = artifacts.get(artifact_id)
+        if artifact is None or file_type not in DOWNLOADS:
+            return jsonify({'error': 'File not found'}), 404
+        
+        name_format, mimetype = DOWNLOADS[file_type]
+        filename = name_format.format(artifact.meta['base_name'])
+        if filename not in artifact.files and \
+                artifacts.add_file(artifact_id, filename, render_download(artifact, file_type)) is None:
+            return jsonify({'error': 'File not found'}), 404
+        
+        stored = filename
+        if wants_gzip() and artifact.files[filename] >= GZIP_MIN_SIZE:
+            gzip_name = f"{filename}.gz"
+            if gzip_name in artifact.files or artifacts.add_gzip_variant(artifact_id, filename) is not None:
+                stored = gzip_name
+        
+        response = send_file(artifact.path(stored), as_attachment=True, download_name=filename,
+                             mimetype=mimetype, etag=artifact.digests[stored], conditional=True)
+        if stored != filename:
+            response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
+        
+    except FileNotFoundError:  # evicted while being served
+        return jsonify({'error': 'File not found'}), 404
     except Exception as e:
         return jsonify({'error': f'Download failed: {str(e)}'}), 500
 
 @app.route('/api/cleanup', methods=['POST'])
 def cleanup():
-    """Clean up temporary files"""
+    """Delete the given artifacts now instead of waiting for them to expire"""
     try:
-        # Clean up all temp directories
-        for temp_dir in getattr(app, 'temp_dirs', {}).values():
-            shutil.rmtree(temp_dir, ignore_errors=True)
-        app.temp_dirs = {}
+        artifact_ids = (request.get_json(silent=True) or {}).get('artifact_ids') or request.args.getlist('artifact_id')
+        if not artifact_ids:
+            return jsonify({'error': 'No artifact ids provided'}), 400
         
-        return jsonify({'success': True, 'message': 'Cleanup completed'}), 200
+        removed = sum(artifacts.remove(artifact_id) for artifact_id in artifact_ids)
+        return jsonify({'success': True, 'message': 'Cleanup completed', 'removed': removed}), 200
         
     except Exception as e:
         return jsonify({'error': f'Cleanup failed: {str(e)}'}), 500
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Metrics in the Prometheus text exposition format"""
+    return Response(metrics.expose(), content_type=CONTENT_TYPE)
+
 if __name__ == '__main__':
-    # Create upload folder if it doesn't exist
-    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-    
     # Run the app
     app.run(debug=False, port=5001)
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Artifact store for analyzed uploads and their exports
+
+Each analyzed upload becomes an artifact: the upload plus any exports
+rendered from it, addressed by an unguessable id (secrets.token_urlsafe).
+Artifacts expire after their TTL, and the store keeps their total size
+under a quota (and the number of artifacts under a cap) by evicting the
+least recently used ones. A daemon thread reaps expired artifacts in the
+background, so a long-running process doesn't grow without bound and
+nobody's files depend on a global cleanup.
+
+Uploads stay in memory, as the bytes they arrived as, while the uploads of
+all artifacts fit in max_memory_bytes; past that the least recently used
+ones are spilled to the artifact's directory. Most uploads are analyzed
+and never downloaded, so they never touch the disk.
+
+Rendered exports are written to disk through a callable taking a binary
+file object, so large exports are streamed rather than built in memory,
+and each file's SHA-256 is recorded for use as a strong ETag.
+add_gzip_variant() stores a gzip-compressed copy of a file for clients
+that accept gzip.
+"""
+
+import gzip
+import hashlib
+import io
+import os
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+CHUNK_SIZE = 64 * 1024
+
+
+class Artifact:
+    def __init__(self, artifact_id, directory, meta, ttl):
+        self.id = artifact_id
+        self.directory = directory
+        self.meta = meta
+        self.files = {}  # name -> size in bytes
+        self.blobs = {}  # name -> contents, for files held in memory rather than on disk
+        self.digests = {}  # name -> SHA-256 of the contents
+        self.created_at = time.time()
+        self.expires_at = self.created_at + ttl
+        self.last_access = self.created_at
+
+    @property
+    def size(self):
+        return sum(self.files.values())
+
+    @property
+    def expired(self):
+        return time.time() >= self.expires_at
+
+    @property
+    def memory_size(self):
+        return sum(len(data) for data in self.blobs.values())
+
+    def path(self, name):
+        return self.directory / name
+
+    def read(self, name):
+        """Contents of a file, from memory or disk"""
+        data = self.blobs.get(name)
+        if data is not None:
+            return data
+        return self.path(name).read_bytes()
+
+    def open(self, name):
+        """Binary file object over a file, from memory or disk"""
+        data = self.blobs.get(name)
+        if data is not None:
+            return io.BytesIO(data)
+        return open(self.path(name), 'rb')
+
+
+class ArtifactStore:
+    def __init__(self, root=None, ttl=3600, max_bytes=512 * 1024 * 1024, max_artifacts=1000,
+                 max_memory_bytes=64 * 1024 * 1024, reap_interval=60):
+        self.root = Path(root) if root else Path(tempfile.mkdtemp(prefix='rack-artifacts-'))
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_artifacts = max_artifacts
+        self.max_memory_bytes = max_memory_bytes
+        self.reap_interval = reap_interval
+        self._artifacts = OrderedDict()  # least recently used first
+        self._bytes = 0
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()  # one spiller at a time
+        self._reaper = None
+        self._stop = threading.Event()
+        self.evictions = 0
+        self.expirations = 0
+        self.spills = 0
+
+    def _start_reaper(self):
+        # Started on first use so importing the app spawns nothing
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=self._reap_loop, name='artifact-reaper', daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while not self._stop.wait(self.reap_interval):
+            self.reap()
+
+    def stop(self):
+        self._stop.set()
+
+    def put(self, files, meta=None, ttl=None):
+        """Store {name: bytes} as a new artifact, held in memory; returns its id"""
+        artifact_id = secrets.token_urlsafe(16)
+        artifact = Artifact(artifact_id, self.root / artifact_id, meta or {}, self.ttl if ttl is None else ttl)
+        for name, data in files.items():
+            artifact.blobs[name] = bytes(data)
+            artifact.files[name] = len(data)
+            artifact.digests[name] = hashlib.sha256(data).hexdigest()
+
+        with self._lock:
+            self._start_reaper()
+            self._artifacts[artifact_id] = artifact
+            self._bytes += artifact.size
+            self._memory_bytes += artifact.memory_size
+            evicted = self._evict(keep=artifact_id)
+            over_memory = self._memory_bytes > self.max_memory_bytes
+        self._delete(evicted)
+        if over_memory:
+            self._spill()
+        return artifact_id
+
+    def add_file(self, artifact_id, name, write):
+        """Add a file (e.g. a rendered export) to an existing artifact; returns its path or None
+
+        write(f) writes the contents to a binary file object.
+        """
+        artifact = self.get(artifact_id)
+        if artifact is None:
+            return None
+        path = artifact.path(name)
+        tmp_path = path.with_name(f".{name}.{secrets.token_hex(4)}.tmp")
+        try:
+            artifact.directory.mkdir(exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                write(f)
+            size, digest = _size_and_digest(tmp_path)
+            os.replace(tmp_path, path)  # concurrent renders of the same file are harmless
+        except OSError:  # evicted meanwhile
+            return None
+        with self._lock:
+            live = self._artifacts.get(artifact_id) is artifact
+            if live:
+                self._bytes += size - artifact.files.get(name, 0)
+                artifact.files[name] = size
+                artifact.digests[name] = digest
+                evicted = self._evict(keep=artifact_id)
+            else:  # the mkdir above may have recreated its deleted directory
+                evicted = [artifact]
+        self._delete(evicted)
+        return path if live else None
+
+    def add_gzip_variant(self, artifact_id, name):
+        """Store name + '.gz', a gzip copy of an artifact file; returns its path or None"""
+        artifact = self.get(artifact_id)
+        if artifact is None or name not in artifact.files:
+            return None
+
+        def write(f):
+            # mtime=0 keeps the output (and so its digest) a function of the contents
+            with artifact.open(name) as source, \
+                    gzip.GzipFile(fileobj=f, mode='wb', compresslevel=6, mtime=0) as compressed:
+                shutil.copyfileobj(source, compressed, CHUNK_SIZE)
+
+        return self.add_file(artifact_id, f"{name}.gz", write)
+
+    def get(self, artifact_id):
+        """The live artifact with this id (marked as recently used), or None"""
+        with self._lock:
+            artifact = self._artifacts.get(artifact_id)
+            if artifact is None:
+                return None
+            if artifact.expired:
+                self._pop(artifact_id)
+                self.expirations += 1
+                expired = [artifact]
+            else:
+                artifact.last_access = time.time()
+                self._artifacts.move_to_end(artifact_id)
+                return artifact
+        self._delete(expired)
+        return None
+
+    def remove(self, artifact_id):
+        with self._lock:
+            artifact = self._pop(artifact_id)
+        self._delete([artifact] if artifact else [])
+        return artifact is not None
+
+    def reap(self):
+        """Delete every expired artifact; returns how many were removed"""
+        with self._lock:
+            expired = [self._pop(a.id) for a in list(self._artifacts.values()) if a.expired]
+            self.expirations += len(expired)
+        self._delete(expired)
+        return len(expired)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'artifacts': len(self._artifacts),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'memory_bytes': self._memory_bytes,
+                'max_memory_bytes': self.max_memory_bytes,
+                'max_artifacts': self.max_artifacts,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'spills': self.spills
+            }
+
+    def _pop(self, artifact_id):
+        artifact = self._artifacts.pop(artifact_id, None)
+        if artifact is not None:
+            self._bytes -= artifact.size
+            self._memory_bytes -= artifact.memory_size
+        return artifact
+
+    def _spill(self):
+        """Move the in-memory files of least recently used artifacts to disk until within max_memory_bytes"""
+        with self._spill_lock:
+            with self._lock:
+                excess = self._memory_bytes - self.max_memory_bytes
+                victims = []
+                for artifact in self._artifacts.values():
+                    if excess <= 0:
+                        break
+                    if artifact.blobs:
+                        victims.append((artifact, dict(artifact.blobs)))
+                        excess -= artifact.memory_size
+            for artifact, blobs in victims:
+                # Written while still readable from memory, then dropped from memory
+                try:
+                    artifact.directory.mkdir(exist_ok=True)
+                    for name, data in blobs.items():
+                        tmp_path = artifact.path(f".{name}.tmp")
+                        tmp_path.write_bytes(data)
+                        os.replace(tmp_path, artifact.path(name))
+                except OSError:  # evicted meanwhile
+                    continue
+                with self._lock:
+                    live = self._artifacts.get(artifact.id) is artifact
+                    if live:
+                        for name in blobs:
+                            self._memory_bytes -= len(artifact.blobs.pop(name))
+                        self.spills += 1
+                if not live:
+                    self._delete([artifact])
+
+    def _evict(self, keep=None):
+        """Pop least recently used artifacts until within quota (caller holds the lock)"""
+        evicted = []
+        while (self._bytes > self.max_bytes or len(self._artifacts) > self.max_artifacts) and \
+                len(self._artifacts) > (1 if keep else 0):
+            oldest = next(iter(self._artifacts))
+            if oldest == keep:
+                self._artifacts.move_to_end(oldest)
+                continue
+            evicted.append(self._pop(oldest))
+            self.evictions += 1
+        return evicted
+
+    def _delete(self, artifacts):
+        for artifact in artifacts:
+            shutil.rmtree(artifact.directory, ignore_errors=True)
+
+
+def _size_and_digest(path):
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
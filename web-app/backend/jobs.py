@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Background job queue for the Flask backend
+
+A fixed pool of worker threads pulls analysis jobs from a bounded queue, so
+a large upload no longer holds a request thread for the whole analysis:
+the request enqueues the work and returns a job id, and clients poll
+/api/jobs/<id> or follow /api/jobs/<id>/events (server-sent events).
+
+submit() raises QueueFull when the queue is at capacity; the API turns that
+into 503 so clients back off instead of piling up work.
+"""
+
+import itertools
+import queue
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+QueueFull = queue.Full
+
+
+class Job:
+    def __init__(self, job_id, func, args, kwargs):
+        self.id = job_id
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.changed = threading.Condition()
+        self.revision = 0  # bumped on every status change, for event streams
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed')
+
+    def _set(self, **fields):
+        with self.changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.revision += 1
+            self.changed.notify_all()
+
+    def wait(self, revision, timeout=None):
+        """Block until the job changes after the given revision (or timeout); returns the new revision"""
+        with self.changed:
+            self.changed.wait_for(lambda: self.revision != revision, timeout=timeout)
+            return self.revision
+
+    def to_dict(self, include_result=True):
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.status == 'failed':
+            data['error'] = self.error
+        if self.status == 'done' and include_result:
+            data['result'] = self.result
+        return data
+
+
+class JobQueue:
+    def __init__(self, workers=2, max_queued=16, max_finished=256):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._counter = itertools.count(1)
+
+    def _start(self):
+        # Workers start lazily so importing the app (e.g. under gunicorn's preload) spawns nothing
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(*args, **kwargs); returns the Job, or raises QueueFull"""
+        job = Job(f"{next(self._counter)}-{secrets.token_urlsafe(8)}", func, args, kwargs)
+        with self._lock:
+            self._start()
+            self._queue.put_nowait(job)
+            self._jobs[job.id] = job
+            self._prune()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            'workers': self.workers,
+            'max_queued': self.max_queued,
+            'queued': statuses.count('queued'),
+            'running': statuses.count('running'),
+            'finished': statuses.count('done') + statuses.count('failed')
+        }
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_finished"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job._set(status='running', started_at=time.time())
+            try:
+                result = job.func(*job.args, **job.kwargs)
+            except Exception as e:
+                job._set(status='failed', error=str(e), finished_at=time.time())
+            else:
+                job._set(status='done', result=result, finished_at=time.time())
+            finally:
+                job.args = job.kwargs = None
+                self._queue.task_done()
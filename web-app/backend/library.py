@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Shared rack library for the read API
+
+One RackDatabase and one RackRecommendationEngine per process, built on
+first use (loading the library takes a while, and importing the app
+shouldn't) and then shared by every request thread; the engine's indexes
+are all built up front so request threads only read them. Responses are
+cached as encoded JSON with a content-hash ETag, so repeated queries skip
+both the database and the encoding, and clients revalidate with
+If-None-Match.
+
+The database, with its similar-racks table and cluster labels, is built
+from the library folder by whichever worker process gets there first, under
+an exclusive lock on db_path + '.lock'; the others wait and then find it up
+to date. Without a db_path it goes in the temp
+directory, named after the folder, never next to the code.
+"""
+
+import hashlib
+import json
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single development process, nothing to lock against
+    fcntl = None
+
+from rack_cache import LRUCache
+from rack_database import RackDatabase
+from rack_recommendations import RackRecommendationEngine
+
+
+def default_db_path(json_folder):
+    """Database for a library folder, in the temp directory"""
+    key = hashlib.sha1(str(Path(json_folder).resolve()).encode('utf-8')).hexdigest()[:12]
+    return Path(tempfile.gettempdir()) / f"rack-library-{key}.db"
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock on a file shared by every process using it"""
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class LibraryUnavailable(Exception):
+    """The library folder isn't configured or doesn't exist"""
+
+
+class RackLibrary:
+    def __init__(self, json_folder, db_path=None, cache_size=1024):
+        self.json_folder = Path(json_folder) if json_folder else None
+        if db_path:
+            self.db_path = Path(db_path)
+        else:
+            self.db_path = default_db_path(json_folder) if json_folder else None
+        self.responses = LRUCache(maxsize=cache_size)
+        self._db = None
+        self._engine = None
+        self._lock = threading.Lock()
+
+    @property
+    def unavailable(self):
+        """Why the library can't be served, or None"""
+        if self.json_folder is None:
+            return 'Rack library not configured: set RACK_ANALYZER_LIBRARY_DIR'
+        if not self.json_folder.is_dir():
+            return f'Rack library folder not found: {self.json_folder}'
+        return None
+
+    def _check(self):
+        reason = self.unavailable
+        if reason:
+            raise LibraryUnavailable(reason)
+
+    @property
+    def db(self):
+        with self._lock:
+            if self._db is None:
+                self._check()
+                with file_lock(f"{self.db_path}.lock"):
+                    db = RackDatabase(db_path=str(self.db_path), json_folder=str(self.json_folder))
+                    db.build_derived_tables()  # similar racks (scorer=jaccard) and clusters
+                    self._db = db
+            return self._db
+
+    @property
+    def engine(self):
+        with self._lock:
+            if self._engine is None:
+                self._check()
+                engine = RackRecommendationEngine(str(self.json_folder))
+                engine.build_indexes()
+                self._engine = engine
+            return self._engine
+
+    def cached(self, key, compute):
+        """(JSON body, ETag) for a hashable key, computing the data with compute() on a miss
+
+        (None, None) when compute() returns None; that isn't cached.
+        Raises LibraryUnavailable when the library folder is missing.
+        """
+        self._check()
+        entry = self.responses.get(key)
+        if entry is None:
+            data = compute()
+            if data is None:
+                return None, None
+            body = json.dumps(data).encode('utf-8')
+            entry = (body, hashlib.sha256(body).hexdigest())
+            self.responses.put(key, entry)
+        return entry
+
+    def stats(self):
+        return {'configured': self.json_folder is not None, 'db_loaded': self._db is not None,
+                'engine_loaded': self._engine is not None, 'responses': self.responses.stats()}
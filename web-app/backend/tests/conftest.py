@@ -0,0 +1,36 @@
+import os
+import sys
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND))
+sys.path.insert(1, str(BACKEND.parent.parent))  # the library modules (rack_*.py), as in the Procfile
+
+os.environ.pop('RACK_ANALYZER_LIBRARY_DIR', None)
+os.environ['RACK_ANALYZER_BATCH_WORKERS'] = '2'
+
+
+@pytest.fixture(scope='session')
+def backend():
+    import app
+    yield app
+    app.artifacts.stop()
+
+
+@pytest.fixture
+def client(backend):
+    return backend.app.test_client()
+
+
+@pytest.fixture
+def upload(client):
+    """Analyze an upload and return its artifact id"""
+    def upload(data, filename='Test Rack.adg'):
+        response = client.post('/api/analyze', data={'file': (BytesIO(data), filename)},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200, response.json
+        return response.json['artifact_id']
+    return upload
@@ -0,0 +1,36 @@
+from io import BytesIO
+
+from analysis_cache import AnalysisCache, content_key
+from uploads import make_adg
+
+
+def post(client, data, filename):
+    return client.post('/api/analyze', data={'file': (BytesIO(data), filename)},
+                       content_type='multipart/form-data')
+
+
+def test_repeated_upload_is_a_cache_hit(backend, client, monkeypatch):
+    data = make_adg(chains=2, seed=31)
+    first = post(client, data, 'First.adg').json
+    assert first['cached'] is False
+
+    def not_again(*args, **kwargs):
+        raise AssertionError('a cached upload is not analyzed again')
+    monkeypatch.setattr(backend, 'analyze_upload', not_again)
+    hits = backend.analysis_cache.stats()['hits']
+    second = post(client, data, 'Second Name.adg').json
+    assert second['cached'] is True
+    assert backend.analysis_cache.stats()['hits'] == hits + 1
+    assert second['analysis']['use_case'] == second['analysis']['rack_name'] == 'Second_Name'
+    assert {k: v for k, v in second['analysis'].items() if k not in ('use_case', 'rack_name')} == \
+        {k: v for k, v in first['analysis'].items() if k not in ('use_case', 'rack_name')}
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    key = content_key(b'rack bytes')
+    AnalysisCache(disk_dir=tmp_path).put(key, {'chains': []})
+    cache = AnalysisCache(disk_dir=tmp_path)
+    assert cache.get(key) == {'chains': []}
+    assert cache.get(content_key(b'other')) is None
+    assert cache.stats()['disk'] == {'enabled': True, 'hits': 1, 'misses': 1}
+    assert cache.get(key) == {'chains': []} and cache.stats()['memory']['hits'] == 1
@@ -0,0 +1,43 @@
+import json
+import tempfile
+import xml.etree.ElementTree as ET
+from io import BytesIO
+
+from uploads import make_adg
+
+
+def post(client, data, filename='Test Rack.adg'):
+    return client.post('/api/analyze', data={'file': (BytesIO(data), filename)},
+                       content_type='multipart/form-data')
+
+
+def test_analysis_writes_no_temp_files(client, monkeypatch):
+    def no_temp_files(*args, **kwargs):
+        raise AssertionError('uploads are analyzed in memory')
+    for name in ('mkdtemp', 'mkstemp', 'NamedTemporaryFile', 'TemporaryDirectory'):
+        monkeypatch.setattr(tempfile, name, no_temp_files)
+
+    response = post(client, make_adg(chains=4, seed=21), 'Bass Rack.adg')
+    assert response.status_code == 200
+    body = response.json
+    assert body['success'] and body['filename'] == 'Bass_Rack.adg'
+    assert body['stats']['total_chains'] == 4 and body['stats']['total_devices'] == 12
+    assert [chain['name'] for chain in body['analysis']['chains']] == [f'Chain {i}' for i in range(4)]
+
+    xml = client.get(f"/api/download/xml/{body['artifact_id']}")
+    assert xml.status_code == 200
+    assert 'filename=Bass_Rack.xml' in xml.headers['Content-Disposition']
+    assert ET.fromstring(xml.data).find('.//AudioEffectGroupDevice') is not None
+    analysis = client.get(f"/api/download/json/{body['download_ids']['json']}")
+    assert json.loads(analysis.data) == body['analysis']
+
+    assert client.get('/api/download/xml/unknown').status_code == 404
+    assert client.get(f"/api/download/zip/{body['artifact_id']}").status_code == 404
+
+
+def test_rejected_uploads(client):
+    assert client.post('/api/analyze', data={}, content_type='multipart/form-data').status_code == 400
+    assert post(client, make_adg(), '').status_code == 400
+    assert post(client, make_adg(), 'rack.txt').status_code == 400
+    broken = post(client, b'not gzip at all')
+    assert broken.status_code >= 400 and broken.json['error']
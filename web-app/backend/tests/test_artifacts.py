@@ -0,0 +1,83 @@
+import gzip
+import os
+import time
+
+from artifacts import ArtifactStore
+from uploads import make_adg
+
+
+def store(tmp_path, **kwargs):
+    return ArtifactStore(root=tmp_path / 'artifacts', reap_interval=3600, **kwargs)
+
+
+def test_artifacts_expire_after_their_ttl(tmp_path):
+    artifacts = store(tmp_path, ttl=0.05)
+    kept = artifacts.put({'upload': b'x'}, ttl=60)
+    expired = artifacts.put({'upload': b'y'})
+    time.sleep(0.1)
+    assert artifacts.get(expired) is None
+    assert artifacts.get(kept) is not None
+    assert artifacts.reap() == 0
+    assert artifacts.stats()['expirations'] == 1
+
+
+def test_reap_removes_expired_files(tmp_path):
+    artifacts = store(tmp_path, ttl=0.05)
+    artifact_id = artifacts.put({'upload': b'x'})
+    artifacts.add_file(artifact_id, 'export.xml', lambda f: f.write(b'<xml/>'))
+    time.sleep(0.1)
+    assert artifacts.reap() == 1
+    assert os.listdir(artifacts.root) == []
+    assert artifacts.stats()['bytes'] == 0
+
+
+def test_quota_evicts_least_recently_used(tmp_path):
+    artifacts = store(tmp_path, max_bytes=250, max_artifacts=10)
+    first = artifacts.put({'upload': b'a' * 100})
+    second = artifacts.put({'upload': b'b' * 100})
+    artifacts.get(first)
+    third = artifacts.put({'upload': b'c' * 100})
+    assert artifacts.get(second) is None
+    assert artifacts.get(first) is not None and artifacts.get(third) is not None
+    assert artifacts.stats()['bytes'] == 200
+
+    # Rendered files count towards the quota too
+    artifacts.add_file(third, 'export.xml', lambda f: f.write(b'x' * 100))
+    assert artifacts.get(first) is None
+    assert artifacts.stats()['evictions'] == 2
+
+
+def test_artifact_count_cap(tmp_path):
+    artifacts = store(tmp_path, max_artifacts=2)
+    ids = [artifacts.put({'upload': b'x'}) for _ in range(3)]
+    assert artifacts.get(ids[0]) is None
+    assert artifacts.stats()['artifacts'] == 2
+
+
+def test_uploads_stay_in_memory_until_the_budget(tmp_path):
+    artifacts = store(tmp_path, max_memory_bytes=250)
+    ids = [artifacts.put({'upload': bytes([i]) * 100}) for i in range(4)]
+    stats = artifacts.stats()
+    assert stats['memory_bytes'] == 200 and stats['spills'] == 2
+    assert sorted(os.listdir(artifacts.root)) == sorted(ids[:2])  # least recently used spilled
+    for i, artifact_id in enumerate(ids):
+        assert artifacts.get(artifact_id).read('upload') == bytes([i]) * 100
+    assert stats['bytes'] == 400
+
+
+def test_gzip_variant(tmp_path):
+    artifacts = store(tmp_path)
+    artifact_id = artifacts.put({'upload': b'rack ' * 1000})
+    path = artifacts.add_gzip_variant(artifact_id, 'upload')
+    assert gzip.decompress(path.read_bytes()) == b'rack ' * 1000
+    artifact = artifacts.get(artifact_id)
+    assert artifact.files['upload.gz'] == path.stat().st_size
+    assert artifacts.remove(artifact_id)
+    assert not path.exists()
+
+
+def test_cleanup(client, upload):
+    artifact_id = upload(make_adg(seed=4))
+    assert client.post('/api/cleanup').status_code == 400
+    assert client.post('/api/cleanup', json={'artifact_ids': [artifact_id]}).json['removed'] == 1
+    assert client.get(f'/api/download/xml/{artifact_id}').status_code == 404
@@ -0,0 +1,50 @@
+import io
+import json
+import zipfile
+
+from uploads import make_adg
+
+
+def post_batch(client, files):
+    response = client.post('/api/analyze/batch', data=files, content_type='multipart/form-data')
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    return response, lines
+
+
+def test_batch_streams_one_line_per_file_then_a_summary(client):
+    files = {'files': [(io.BytesIO(make_adg(chains=2, seed=10)), 'a.adg'),
+                       (io.BytesIO(make_adg(chains=3, seed=11)), 'b.adg'),
+                       (io.BytesIO(b'not gzip'), 'broken.adg'),
+                       (io.BytesIO(b'x'), 'notes.txt')]}
+    response, lines = post_batch(client, files)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+
+    results, summary = lines[:-1], lines[-1]
+    assert summary == {'done': True, 'total': 4, 'succeeded': 2, 'failed': 2}
+    by_name = {line['filename']: line for line in results}
+    assert sorted(line['index'] for line in results) == [0, 1, 2, 3]
+    assert by_name['a.adg']['success'] and by_name['a.adg']['stats']['total_chains'] == 2
+    assert by_name['b.adg']['stats']['total_chains'] == 3
+    assert not by_name['broken.adg']['success']
+    assert 'Invalid file type' in by_name['notes.txt']['error']
+
+
+def test_batch_expands_zip_archives(client):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('folder/c.adg', make_adg(seed=12))
+        zf.writestr('folder/readme.txt', 'hi')
+        zf.writestr('__MACOSX/folder/._c.adg', 'junk')
+    data = archive.getvalue()
+    response, lines = post_batch(client, {'file': (io.BytesIO(data), 'racks.zip')})
+    assert [line['filename'] for line in lines[:-1] if line.get('success')] == ['c.adg']
+    assert lines[-1]['succeeded'] == 1
+
+    # The same bytes again come from the analysis cache
+    response, lines = post_batch(client, {'file': (io.BytesIO(data), 'racks.zip')})
+    assert [line.get('cached') for line in lines[:-1] if line.get('success')] == [True]
+
+
+def test_batch_without_files(client):
+    assert client.post('/api/analyze/batch').status_code == 400
@@ -0,0 +1,34 @@
+import gzip
+
+from uploads import make_adg
+
+
+def test_etag_revalidation(client, upload):
+    artifact_id = upload(make_adg(seed=1))
+    first = client.get(f'/api/download/xml/{artifact_id}')
+    etag = first.headers['ETag']
+    assert etag
+    again = client.get(f'/api/download/xml/{artifact_id}', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.data == b''
+    assert client.get(f'/api/download/xml/{artifact_id}', headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_range_requests(client, upload):
+    artifact_id = upload(make_adg(seed=2))
+    full = client.get(f'/api/download/xml/{artifact_id}').data
+    part = client.get(f'/api/download/xml/{artifact_id}', headers={'Range': 'bytes=10-99', 'Accept-Encoding': 'gzip'})
+    assert part.status_code == 206
+    assert part.headers['Content-Range'] == f'bytes 10-99/{len(full)}'
+    assert part.data == full[10:100]
+    assert 'Content-Encoding' not in part.headers  # ranges are of the uncompressed file
+
+
+def test_gzip_downloads(client, upload):
+    artifact_id = upload(make_adg(chains=20, seed=3, padding=50))
+    plain = client.get(f'/api/download/xml/{artifact_id}')
+    compressed = client.get(f'/api/download/xml/{artifact_id}', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert len(compressed.data) < len(plain.data)
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers['ETag'] != plain.headers['ETag']
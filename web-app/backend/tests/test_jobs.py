@@ -0,0 +1,83 @@
+import json
+import threading
+from io import BytesIO
+
+import pytest
+
+from jobs import JobQueue, QueueFull
+from uploads import make_adg
+
+
+def submit(client, data, filename='Test Rack.adg'):
+    return client.post('/api/analyze?async=1', data={'file': (BytesIO(data), filename)},
+                       content_type='multipart/form-data')
+
+
+def wait_done(job):
+    revision = job.revision
+    while not job.done:
+        revision = job.wait(revision, timeout=10)
+    return job
+
+
+def events(response):
+    """Parsed 'status' events of a server-sent event stream"""
+    parsed = []
+    for message in response.get_data(as_text=True).split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in message.splitlines() if not line.startswith(':'))
+        if lines.get('event') == 'status':
+            parsed.append(json.loads(lines['data']))
+    return parsed
+
+
+def test_async_analysis(backend, client):
+    data = make_adg(seed=11)
+    response = submit(client, data)
+    assert response.status_code == 202
+    job_id = response.json['job_id']
+    assert response.json['status_url'] == f'/api/jobs/{job_id}'
+
+    wait_done(backend.job_queue.get(job_id))
+    status = client.get(f'/api/jobs/{job_id}').json
+    assert status['status'] == 'done'
+    sync = client.post('/api/analyze', data={'file': (BytesIO(data), 'Test Rack.adg')},
+                       content_type='multipart/form-data').json
+    assert status['result']['analysis'] == sync['analysis']
+    assert client.get('/api/jobs/no-such-job').status_code == 404
+
+
+def test_event_stream_ends_with_the_result(backend, client):
+    job_id = submit(client, make_adg(seed=12)).json['job_id']
+    response = client.get(f'/api/jobs/{job_id}/events')
+    assert response.mimetype == 'text/event-stream'
+    statuses = events(response)
+    assert statuses[-1]['status'] == 'done' and 'result' in statuses[-1]
+    assert all(s['status'] in ('queued', 'running') for s in statuses[:-1])
+    assert client.get('/api/jobs/no-such-job/events').status_code == 404
+
+
+def test_failed_job(backend, client):
+    job_id = submit(client, b'not a rack').json['job_id']
+    statuses = events(client.get(f'/api/jobs/{job_id}/events'))
+    assert statuses[-1]['status'] == 'failed' and statuses[-1]['error']
+
+
+def test_full_queue_answers_503(backend, client, monkeypatch):
+    queue = JobQueue(workers=1, max_queued=1)
+    release = threading.Event()
+    running = queue.submit(release.wait)
+    revision = running.revision
+    while running.status != 'running':  # the worker has taken it, so the queue is empty again
+        revision = running.wait(revision, timeout=10)
+    queued = queue.submit(lambda: None)
+    with pytest.raises(QueueFull):
+        queue.submit(lambda: None)
+
+    monkeypatch.setattr(backend, 'job_queue', queue)
+    response = submit(client, make_adg(seed=13))
+    assert response.status_code == 503
+    assert 'queue is full' in response.json['error']
+
+    release.set()
+    assert wait_done(running).status == 'done' and wait_done(queued).status == 'done'
+    assert submit(client, make_adg(seed=13)).status_code == 202
@@ -0,0 +1,173 @@
+import json
+import random
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from library import LibraryUnavailable, RackLibrary
+from uploads import DEVICE_TYPES
+
+REPO = Path(__file__).resolve().parents[3]
+
+
+def test_library_unconfigured(client):
+    for path in ('/api/racks', '/api/racks/1', '/api/racks/1/similar', '/api/stats'):
+        response = client.get(path)
+        assert response.status_code == 503
+        assert 'RACK_ANALYZER_LIBRARY_DIR' in response.json['error']
+
+
+def test_library_folder_missing(tmp_path):
+    library = RackLibrary(tmp_path / 'missing')
+    assert 'not found' in library.unavailable
+    with pytest.raises(LibraryUnavailable):
+        library.cached('key', lambda: {})
+    assert not library.stats()['db_loaded']
+
+
+def test_library_database_is_built_once(tmp_path):
+    folder = tmp_path / 'racks'
+    folder.mkdir()
+    for i in range(3):
+        rack = {'use_case': f"Bass - Rack {i}", 'macro_controls': [],
+                'chains': [{'name': 'Main', 'devices': [{'type': 'Eq8', 'name': 'Eq8'}]}]}
+        (folder / f"r{i}_analysis.json").write_text(json.dumps(rack))
+
+    library = RackLibrary(folder)
+    assert library.db_path.parent != REPO
+    body, etag = library.cached('count', lambda: library.db.count_racks())
+    assert json.loads(body) == 3 and etag
+    assert Path(f"{library.db_path}.lock").exists()
+    with sqlite3.connect(library.db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM racks").fetchone()[0] == 3
+    library.db_path.unlink()
+    Path(f"{library.db_path}.lock").unlink()
+
+
+CATEGORIES = ['Bass', 'Drum Bus', 'Vocal']
+
+
+def make_library(folder, count=60, seed=0):
+    """Flat synthetic racks in the analysis JSON format, written to folder"""
+    rng = random.Random(seed)
+    folder.mkdir()
+    racks = []
+    for i in range(count):
+        rack = {
+            'use_case': f"{rng.choice(CATEGORIES)} - Rack {i}",
+            'macro_controls': [{'name': rng.choice(['Drive', 'Tone', 'Dry/Wet']), 'value': float(m), 'index': m}
+                               for m in range(rng.randint(0, 4))],
+            'chains': [{'name': f'Chain {c}', 'devices': [
+                {'type': t, 'name': t, 'is_on': True} for t in rng.sample(DEVICE_TYPES, rng.randint(1, 5))]}
+                for c in range(rng.randint(1, 3))]
+        }
+        (folder / f"r{i:03d}_analysis.json").write_text(json.dumps(rack))
+        racks.append(rack)
+    return racks
+
+
+@pytest.fixture(scope='module')
+def library_racks(tmp_path_factory):
+    root = tmp_path_factory.mktemp('library')
+    racks = make_library(root / 'racks')
+    return RackLibrary(root / 'racks', db_path=root / 'racks.db'), racks
+
+
+@pytest.fixture
+def library(backend, library_racks, monkeypatch):
+    library, racks = library_racks
+    monkeypatch.setattr(backend, 'library', library)
+    return library, racks
+
+
+def all_pages(client, query, limit):
+    racks, offset = [], 0
+    while True:
+        page = client.get(f'/api/racks?{query}&limit={limit}&offset={offset}').json
+        assert page['limit'] == limit and page['offset'] == offset
+        racks += page['racks']
+        if len(page['racks']) < limit:
+            return racks, page['total']
+        offset += limit
+
+
+def devices(rack):
+    return [device for chain in rack['chains'] for device in chain['devices']]
+
+
+def test_search_filters_and_pagination(client, library):
+    _, racks = library
+    queries = {
+        'category=Bass': lambda r: r['use_case'].startswith('Bass'),
+        'min_devices=6&max_devices=9': lambda r: 6 <= len(devices(r)) <= 9,
+        'device_type=Reverb': lambda r: any(d['type'] == 'Reverb' for d in devices(r)),
+        'macro_name=drive': lambda r: any(m['name'] == 'Drive' for m in r['macro_controls']),
+        'category=Vocal&device_type=Eq8': lambda r: r['use_case'].startswith('Vocal')
+        and any(d['type'] == 'Eq8' for d in devices(r)),
+    }
+    for query, keep in queries.items():
+        found, total = all_pages(client, query, limit=7)
+        expected = sorted(r['use_case'] for r in racks if keep(r))
+        assert total == len(expected) and sorted(r['use_case'] for r in found) == expected, query
+        scores = [r['complexity_score'] for r in found]
+        assert scores == sorted(scores, reverse=True)
+
+    everything = client.get('/api/racks?limit=1000').json
+    assert everything['limit'] == 200 and everything['total'] == len(racks)
+    assert client.get('/api/racks?min_devices=lots').status_code == 400
+
+
+def test_rack_details(client, library):
+    _, racks = library
+    by_use_case = {rack['use_case']: rack for rack in racks}
+    for summary in client.get('/api/racks?limit=5').json['racks']:
+        details = client.get(f"/api/racks/{summary['id']}").json
+        rack = by_use_case[details['use_case']]
+        assert sorted((d['chain_name'], d['position'], d['device_type']) for d in details['devices']) == \
+            sorted((chain['name'], position, device['type']) for chain in rack['chains']
+                   for position, device in enumerate(chain['devices']))
+        assert [m['name'] for m in details['macro_controls']] == [m['name'] for m in rack['macro_controls']]
+    assert client.get('/api/racks/100000').status_code == 404
+
+
+@pytest.mark.parametrize('scorer', ['jaccard', 'lsh', 'tfidf'])
+def test_similar_racks(client, library, scorer):
+    library, _ = library
+    rack = client.get('/api/racks?limit=1&offset=3').json['racks'][0]
+    response = client.get(f"/api/racks/{rack['id']}/similar?scorer={scorer}&limit=5")
+    assert response.status_code == 200
+    body = response.json
+    assert body['use_case'] == rack['use_case'] and body['scorer'] == scorer
+
+    expected = library.engine.recommend_similar_racks(rack['use_case'], limit=5, scorer=scorer)
+    assert [(r['use_case'], round(r['similarity'], 9)) for r in body['similar']] == \
+        [(r['use_case'], round(r['similarity'], 9)) for r in expected]
+    assert client.get(f'/api/racks/100000/similar?scorer={scorer}').status_code == 404
+
+
+def test_similar_racks_unknown_scorer(client, library):
+    assert client.get('/api/racks/1/similar?scorer=cosine').status_code == 400
+
+
+def test_stats_and_clusters(client, library):
+    _, racks = library
+    stats = client.get('/api/stats').json
+    assert stats['total_racks'] == len(racks)
+    assert stats['total_devices'] == sum(len(devices(rack)) for rack in racks)
+    assert sorted(c['category'] for c in stats['category_distribution']) == \
+        sorted({rack['use_case'].split(' - ')[0] for rack in racks})
+    clusters = stats['clusters']
+    assert clusters and sum(c['rack_count'] for c in clusters) == len(racks)
+    for cluster in clusters:
+        page = client.get(f"/api/racks?cluster={cluster['cluster']}&limit=200").json
+        assert page['total'] == cluster['rack_count'] == len(page['racks'])
+
+
+def test_responses_revalidate_with_etags(client, library):
+    for path in ('/api/racks?category=Bass', '/api/racks/1', '/api/racks/1/similar', '/api/stats'):
+        first = client.get(path)
+        etag = first.headers['ETag']
+        again = client.get(path, headers={'If-None-Match': etag})
+        assert again.status_code == 304 and again.data == b''
+        assert client.get(path, headers={'If-None-Match': '"stale"'}).data == first.data
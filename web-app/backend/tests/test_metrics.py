@@ -0,0 +1,49 @@
+import re
+
+from metrics import CONTENT_TYPE, Registry
+
+from uploads import make_adg
+
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="(\\.|[^"\\])*",?)*\})? \S+$')
+
+
+def test_exposition_format():
+    registry = Registry()
+    requests = registry.counter('requests_total', 'Requests', ('route',))
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    registry.gauge('queued', 'Queued jobs').set_function(lambda: 3)
+    requests.inc(route='/a')
+    requests.inc(2, route='/b "quoted"')
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    lines = registry.expose().splitlines()
+    assert lines[:2] == ['# HELP requests_total Requests', '# TYPE requests_total counter']
+    assert 'requests_total{route="/a"} 1' in lines
+    assert 'requests_total{route="/b \\"quoted\\""} 2' in lines
+    assert [line for line in lines if line.startswith('latency_seconds')] == [
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1.0"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+        'latency_seconds_sum 5.55',
+        'latency_seconds_count 3',
+    ]
+    assert 'queued 3' in lines
+    assert all(line.startswith('#') or SAMPLE.match(line) for line in lines)
+
+
+def test_metrics_endpoint(client, upload):
+    upload(make_adg(seed=20))
+    client.get('/api/racks')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == CONTENT_TYPE
+
+    text = response.get_data(as_text=True)
+    assert text.endswith('\n')
+    assert all(line.startswith('#') or SAMPLE.match(line) for line in text.splitlines())
+    assert 'rack_analyzer_http_requests_total{route="/api/analyze",method="POST",status="200"}' in text
+    assert 'rack_analyzer_stage_duration_seconds_count{stage="decompress"}' in text
+    assert '# TYPE rack_analyzer_upload_size_bytes histogram' in text
+    assert re.search(r'^rack_analyzer_artifacts [1-9]', text, re.M)
@@ -0,0 +1,25 @@
+"""Synthetic rack uploads"""
+
+import gzip
+import random
+
+DEVICE_TYPES = ['Eq8', 'Compressor2', 'Reverb', 'Delay', 'Saturator', 'Utility', 'AutoFilter', 'Limiter']
+
+
+def make_adg(chains=3, seed=0, padding=0):
+    """Gzipped XML of an Audio Effect Rack, the structure abletonRackAnalyzer parses"""
+    rng = random.Random(seed)
+    macros = ''.join(f'<MacroDisplayNames.{i} Value="Macro {i + 1}"/>'
+                     f'<MacroControls.{i}><Manual Value="{i * 3.5}"/></MacroControls.{i}>' for i in range(8))
+    branches = []
+    for chain in range(chains):
+        devices = ''.join(
+            f'<AbletonDevicePreset><Device><{t}><On><Manual Value="true"/></On><UserName Value=""/>'
+            + '<Pad Value="x"/>' * padding + f'</{t}></Device></AbletonDevicePreset>'
+            for t in rng.sample(DEVICE_TYPES, 3))
+        branches.append(f'<AudioEffectBranchPreset><Name Value="Chain {chain}"/><IsSoloed Value="false"/>'
+                        f'<DevicePresets>{devices}</DevicePresets></AudioEffectBranchPreset>')
+    xml = ('<?xml version="1.0" encoding="UTF-8"?><Ableton><GroupDevicePreset><Device><AudioEffectGroupDevice>'
+           + macros + '</AudioEffectGroupDevice></Device><BranchPresets>' + ''.join(branches)
+           + '</BranchPresets></GroupDevicePreset></Ableton>')
+    return gzip.compress(xml.encode('utf-8'))
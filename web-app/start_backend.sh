@@ -16,4 +16,6 @@ source venv/bin/activate
 pip install -r requirements.txt
 
 echo "✅ Starting backend server..."
+# The library modules (rack_*.py) live at the repo root
+export PYTHONPATH="$(cd ../.. && pwd)${PYTHONPATH:+:$PYTHONPATH}"
 python app.py